@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+# EpochHead upload-path benchmarks
+# - Times parse_savedvars, _normalize_inplace, JSON (single and sharded) vs compact columnar encode/decode and
+#   post_upload in both formats (against StubServer), and tray-mode cold start in a fresh interpreter
+#   on synthetic fixtures from epoch_fixtures.py
+# - Writes machine-readable JSON; `--compare old.json` prints per-case ratios
+#
+#   python epoch_bench.py --sizes 1000,10000,50000 --out bench.json
+#   python epoch_bench.py --quick --compare bench.json
+
+import os, sys, json, time, copy, platform, argparse, statistics, tempfile
+
+import epoch_uploader as core
+import epoch_fixtures as fx
+import epoch_wire
+import epoch_encode
+
+def _timeit(fn, repeat, setup=None):
+    """Run ``fn(setup())`` ``repeat`` times; returns the list of wall times in seconds."""
+    times = []
+    for _ in range(repeat):
+        arg = setup() if setup else None
+        t0 = time.perf_counter()
+        fn(arg)
+        times.append(time.perf_counter() - t0)
+    return times
+
+def _case(name, size, times, *, events=0, nbytes=0, **extra):
+    med = statistics.median(times)
+    out = {"name": name, "size": size, "repeat": len(times),
+           "min_s": round(min(times), 6), "median_s": round(med, 6), "max_s": round(max(times), 6)}
+    if events:
+        out["events_per_s"] = round(events / med, 1) if med else None
+    if nbytes:
+        out["bytes"] = nbytes
+        out["mb_per_s"] = round(nbytes / med / 1e6, 3) if med else None
+    out.update(extra)
+    return out
+
+def bench_size(n_events, repeat, server_url, tmpdir, n_market_items=0):
+    paths = fx.write_fixtures(os.path.join(tmpdir, f"n{n_events}"), n_events, n_market_items)
+    with open(paths["epochhead.lua"], "r", encoding="utf-8") as f:
+        lua = f.read()
+    nbytes = len(lua.encode("utf-8"))
+    results = []
+
+    results.append(_case("parse_savedvars", n_events, _timeit(lambda _: core.parse_savedvars(lua, core.VAR_NAME), repeat),
+                         events=n_events, nbytes=nbytes))
+
+    sv = core.parse_savedvars(lua, core.VAR_NAME)
+    events, meta = sv.get("events") or [], sv.get("meta") or {}
+    results.append(_case("normalize", n_events,
+                         _timeit(lambda evs: core._normalize_inplace(evs), repeat, lambda: copy.deepcopy(events)),
+                         events=n_events))
+
+    core._normalize_inplace(events)
+    payload = {"events": events, "meta": meta}
+    body = core.encode_upload_body(core.TOKEN, payload)
+    results.append(_case("json_encode", n_events, _timeit(lambda _: core.encode_upload_body(core.TOKEN, payload), repeat),
+                         events=n_events, nbytes=len(body)))
+
+    enc = epoch_encode.ShardedEncoder(min_events=0)
+    if enc.workers > 1:
+        sbody = enc.encode_body(core.TOKEN, payload)  # also starts the pool outside the timing
+        results.append(_case("json_encode_sharded", n_events,
+                             _timeit(lambda _: enc.encode_body(core.TOKEN, payload), repeat),
+                             events=n_events, nbytes=len(sbody), workers=enc.workers, identical=sbody == body))
+    enc.close()
+
+    cbody = epoch_wire.encode_body(core.TOKEN, payload)
+    results.append(_case("columnar_encode", n_events, _timeit(lambda _: epoch_wire.encode_body(core.TOKEN, payload), repeat),
+                         events=n_events, nbytes=len(cbody), size_ratio=round(len(cbody) / len(body), 3)))
+    results.append(_case("json_decode", n_events, _timeit(lambda _: epoch_wire.decode_body(body), repeat),
+                         events=n_events, nbytes=len(body)))
+    results.append(_case("columnar_decode", n_events, _timeit(lambda _: epoch_wire.decode_body(cbody), repeat),
+                         events=n_events, nbytes=len(cbody)))
+
+    for name, data, ctype in (("post_upload", body, None),
+                              ("post_upload_columnar", cbody, epoch_wire.CONTENT_TYPE_COLUMNAR)):
+        codes = []
+        def _post(_):
+            code, _resp = core.post_upload(server_url, core.TOKEN, payload, body=data, content_type=ctype)
+            codes.append(code)
+        results.append(_case(name, n_events, _timeit(_post, repeat), events=n_events, nbytes=len(data),
+                             status_codes=sorted(set(codes))))
+
+    for name in ("aux-addon.lua", "Auctionator.lua"):
+        p = paths.get(name)
+        if not p:
+            continue
+        with open(p, "r", encoding="utf-8") as f:
+            text = f.read()
+        var = "aux" if name.startswith("aux") else "AUCTIONATOR_PRICE_DATABASE"
+        results.append(_case(f"parse_{var}", n_market_items,
+                             _timeit(lambda _: core.parse_savedvars(text, var), repeat),
+                             nbytes=len(text.encode("utf-8"))))
+    return results
+
+_COLD_START = ("import epoch_uploader, epoch_tray, json; "
+               "print(json.dumps(epoch_uploader.report_startup('bench', record=False)))")
+
+def bench_cold_start(repeat):
+    """Fresh interpreter importing what tray mode loads; reports process-start-to-ready
+    time, peak memory and whether Tk got pulled in (it must not)."""
+    import subprocess
+    here = os.path.dirname(os.path.abspath(__file__))
+    times, recs = [], []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = subprocess.run([sys.executable, "-c", _COLD_START], cwd=here, capture_output=True,
+                             text=True, check=True).stdout
+        times.append(time.perf_counter() - t0)
+        recs.append(json.loads(out.strip().splitlines()[-1]))
+    peaks = [r["peak_rss"] for r in recs if r.get("peak_rss")]
+    return _case("cold_start_tray", 0, times, peak_rss=max(peaks) if peaks else None,
+                 ready_s=min(r["since_process_s"] or r["since_import_s"] for r in recs),
+                 tk_loaded=any(r["tk_loaded"] for r in recs))
+
+def run(sizes, repeat=3, market_items=20000):
+    report = {
+        "version": 1,
+        "app_version": core.APP_VERSION,
+        "ts": int(time.time()),
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "repeat": repeat,
+        "results": [],
+    }
+    with tempfile.TemporaryDirectory(prefix="epoch_bench_") as tmp, fx.StubServer() as stub:
+        r = bench_cold_start(repeat)
+        report["results"].append(r)
+        print(f"{r['name']:<34} {'':<9} median {r['median_s'] * 1000:9.1f} ms  ready {r['ready_s'] * 1000:.0f} ms"
+              f"  peak {core._fmt_bytes(r['peak_rss'] or 0)}  tk {'LOADED' if r['tk_loaded'] else 'no'}",
+              file=sys.stderr)
+        for i, n in enumerate(sizes):
+            # Market files are size-independent; only generate them with the largest run.
+            mk = market_items if i == len(sizes) - 1 else 0
+            for r in bench_size(n, repeat, stub.url, tmp, mk):
+                report["results"].append(r)
+                print(f"{r['name']:<34} n={r['size']:<7} median {r['median_s'] * 1000:9.1f} ms"
+                      + (f"  {r['events_per_s']:>12,.0f} ev/s" if r.get("events_per_s") else "")
+                      + (f"  {r['mb_per_s']:>8.2f} MB/s" if r.get("mb_per_s") else ""), file=sys.stderr)
+    return report
+
+def compare(new, old):
+    """Print median ratios new/old per (name, size); >1.0 means slower."""
+    old_by = {(r["name"], r["size"]): r for r in old.get("results") or []}
+    lines = []
+    for r in new.get("results") or []:
+        o = old_by.get((r["name"], r["size"]))
+        if not o or not o.get("median_s"):
+            continue
+        ratio = r["median_s"] / o["median_s"]
+        flag = "  <-- slower" if ratio > 1.10 else ("  faster" if ratio < 0.90 else "")
+        lines.append(f"{r['name']:<34} n={r['size']:<7} {o['median_s'] * 1000:9.1f} -> {r['median_s'] * 1000:9.1f} ms"
+                     f"  x{ratio:.2f}{flag}")
+    return "\n".join(lines)
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Benchmark the upload path on synthetic fixtures.")
+    ap.add_argument("--sizes", default="1000,10000,50000", help="comma-separated event counts (default: %(default)s)")
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--market-items", type=int, default=20000, help="aux/Auctionator items; 0 to skip")
+    ap.add_argument("--quick", action="store_true", help="sizes 1000,5000, repeat 2, 2000 market items")
+    ap.add_argument("--out", help="write the JSON report here (default: stdout)")
+    ap.add_argument("--compare", help="previous JSON report to compare against")
+    args = ap.parse_args(argv)
+    if args.quick:
+        args.sizes, args.repeat, args.market_items = "1000,5000", 2, 2000
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+
+    report = run(sizes, args.repeat, args.market_items)
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            print(compare(report, json.load(f)), file=sys.stderr)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,327 @@
+#!/usr/bin/env python3
+# EpochHead bulk ingest — backfill archived SavedVariables
+# - `epoch_uploader.py bulk DIR|GLOB|FILE ...`
+# - Parses files in a process pool, drops events the server would reject (epoch_schema)
+#   and events already seen in earlier files
+# - Uploads through a bounded number of concurrent connections, all on the network loop (epoch_net)
+# - Resumable: a manifest records finished files, a sidecar keeps event fingerprints; an event
+#   counts as seen only once the upload carrying it succeeded
+
+import os, sys, json, time, glob, argparse, threading, logging, asyncio, hashlib
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED, ALL_COMPLETED
+
+import epoch_uploader as core
+import epoch_net
+import epoch_schema
+from epoch_table import EventTable
+
+DEFAULT_PATTERN = "epochhead*.lua"
+MANIFEST_NAME   = "bulk_manifest.json"
+FLUSH_SECS      = 2.0   # manifest rewrites are batched to at most one per interval
+
+def expand_inputs(inputs, pattern=DEFAULT_PATTERN):
+    """Directories are searched recursively for ``pattern``; other inputs are globs or files."""
+    seen, out = set(), []
+    for spec in inputs:
+        if os.path.isdir(spec):
+            found = glob.glob(os.path.join(spec, "**", pattern), recursive=True)
+        else:
+            found = glob.glob(spec, recursive=True) or ([spec] if os.path.isfile(spec) else [])
+        for p in found:
+            ap = os.path.abspath(p)
+            if os.path.isfile(ap) and ap not in seen:
+                seen.add(ap); out.append(ap)
+    out.sort()
+    return out
+
+def _file_sig(path):
+    st = os.stat(path)
+    return [getattr(st, "st_mtime_ns", int(st.st_mtime * 1e9)), st.st_size]
+
+def _parse_file(path):
+    """Worker: read + parse + normalize one file. Runs in a child process.
+
+    Normalize, validation and dedupe run on an EventTable, which also pickles to far fewer
+    bytes than the dicts; the rows' ``fingerprints()`` come back concatenated in ``fps``
+    (8 bytes per row).
+    """
+    try:
+        with open(path, "r", encoding="utf-8", errors="ignore") as f:
+            lua = f.read()
+        sv = core.parse_savedvars(lua, core.VAR_NAME)
+        table = EventTable.from_dicts([ev for ev in (sv.get("events") or []) if isinstance(ev, dict)])
+        meta = dict(sv.get("meta") or {})
+        del sv
+        table.normalize(); core._normalize_inplace(meta)
+        table, _report = epoch_schema.validate_table(table, meta)
+        # A bulk run has not negotiated WIRE_COLLAPSE with the server, so nothing is collapsed.
+        table, _stats = core.dedupe_table(table)
+        return {"path": path, "size": len(lua), "events": table, "fps": b"".join(table.fingerprints()),
+                "meta": meta, "error": None}
+    except Exception as e:
+        return {"path": path, "size": 0, "events": EventTable(), "fps": b"", "meta": {}, "error": str(e)}
+
+class Manifest:
+    """JSON file of per-file results plus an append-only file of 8-byte event fingerprints."""
+
+    VERSION = 2   # 2: EventTable.fingerprints(); version 1 fingerprint files are discarded
+
+    def __init__(self, path):
+        self.path = path
+        self.fp_path = os.path.splitext(path)[0] + ".fp"
+        self._lock = threading.Lock()
+        self.files = {}
+        version = self.VERSION
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                doc = json.load(f)
+            self.files = doc.get("files") or {}
+            version = doc.get("version") or 1
+        except FileNotFoundError:
+            pass
+        self.fingerprints = set()
+        self._fp_reset = version != self.VERSION
+        try:
+            if not self._fp_reset:
+                with open(self.fp_path, "rb") as f:
+                    data = f.read()
+                self.fingerprints = {data[i:i + 8] for i in range(0, len(data) - len(data) % 8, 8)}
+        except FileNotFoundError:
+            pass
+        self._new_fps, self._dirty, self._flushed = [], False, time.monotonic()
+
+    def is_done(self, path, sig):
+        rec = self.files.get(path)
+        return bool(rec) and rec.get("sig") == sig and rec.get("status") in ("uploaded", "empty")
+
+    def mark(self, path, sig, status, fingerprints=(), **info):
+        """Record a result in memory (called from the network loop too); ``flush()`` writes it out."""
+        with self._lock:
+            if fingerprints:
+                self._new_fps.extend(fingerprints)
+            self.files[path] = dict(info, sig=sig, status=status, ts=int(time.time()))
+            self._dirty = True
+
+    def flush(self, min_interval=0.0):
+        """Append new fingerprints and rewrite the JSON, at most every ``min_interval`` seconds."""
+        with self._lock:
+            now = time.monotonic()
+            if not self._dirty or now - self._flushed < min_interval:
+                return
+            fps, self._new_fps = self._new_fps, []
+            snapshot = json.dumps({"version": self.VERSION, "files": self.files}, indent=1)
+            self._dirty, self._flushed = False, now
+            reset, self._fp_reset = self._fp_reset, False
+        # Fingerprints first: a crash in between leaves their file marked not done, so it is redone.
+        if fps or reset:
+            with open(self.fp_path, "wb" if reset else "ab") as f:
+                f.write(b"".join(fps))
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(snapshot)
+        os.replace(tmp, self.path)
+
+class Progress:
+    def __init__(self, total_files, stream=sys.stderr, interval=1.0):
+        self.total_files = total_files
+        self.stream = stream
+        self.interval = interval
+        self.t0 = time.perf_counter()
+        self._last = 0.0
+        self._lock = threading.Lock()
+        self.parsed = self.skipped = self.uploaded = self.failed = 0
+        self.events_in = self.events_new = self.events_sent = 0
+        self.bytes_in = self.bytes_sent = 0
+
+    def line(self):
+        el = max(1e-6, time.perf_counter() - self.t0)
+        return (f"files {self.parsed + self.skipped}/{self.total_files} "
+                f"(uploaded {self.uploaded}, failed {self.failed}, skipped {self.skipped}) • "
+                f"events {self.events_in} parsed, {self.events_new} new, {self.events_sent} sent • "
+                f"{self.events_in / el:,.0f} ev/s, read {self.bytes_in / el / 1e6:.2f} MB/s, "
+                f"sent {self.bytes_sent / el / 1e6:.2f} MB/s • {el:.0f}s")
+
+    def tick(self, force=False):
+        now = time.perf_counter()
+        with self._lock:
+            if not force and now - self._last < self.interval:
+                return
+            self._last = now
+        tty = getattr(self.stream, "isatty", lambda: False)()
+        self.stream.write(("\r" + self.line() + ("\n" if force else "")) if tty else self.line() + "\n")
+        self.stream.flush()
+
+async def _upload_one(slots, path, sig, n_events, body, fps, manifest, progress, server, token):
+    """Coroutine on the network loop; ``slots`` bounds concurrent uploads."""
+    async with slots:
+        try:
+            # Keyed on the event fingerprints, so a resend after a lost response is recognised.
+            key = hashlib.sha256(b"".join(fps)).hexdigest()[:32]
+            code, resp = await core.send_upload(server, token, body, idempotency_key=key)
+            job_id = None
+            try: job_id = json.loads(resp).get("job_id")
+            except Exception: pass
+            if job_id and 200 <= int(code or 0) < 400:
+                code, resp = await core.wait_for_job_async(server, job_id)
+        except Exception as e:
+            code, resp = 0, str(e)
+    ok = 200 <= int(code or 0) < 300
+    with progress._lock:
+        progress.bytes_sent += len(body)
+        if ok:
+            progress.uploaded += 1; progress.events_sent += n_events
+        else:
+            progress.failed += 1
+    if ok:
+        manifest.mark(path, sig, "uploaded", fps, events=n_events, code=code)
+    else:
+        manifest.mark(path, sig, "failed", events=n_events, code=code,
+                      error=(resp or "")[:300])
+        logging.warning("bulk upload failed for %s: %s %s", path, code, (resp or "")[:200])
+    progress.tick()
+    return ok
+
+async def _semaphore(n):
+    # Created on the loop that will use it (Python 3.9 binds it at construction).
+    return asyncio.Semaphore(n)
+
+def run_bulk(paths, *, manifest_path, jobs=None, connections=4, dry_run=False,
+             server=None, token=None, out=sys.stderr):
+    server = server or core.SERVER
+    token = token or core.TOKEN
+    manifest = Manifest(manifest_path)
+    todo, progress = [], Progress(len(paths), stream=out)
+    for p in paths:
+        try: sig = _file_sig(p)
+        except OSError: continue
+        if manifest.is_done(p, sig):
+            progress.skipped += 1
+        else:
+            todo.append((p, sig))
+    seen = manifest.fingerprints   # uploaded (this run or an earlier one)
+    sending = {}                   # fingerprint -> upload future of the body carrying it
+    depends = {}                   # upload future -> files that skipped events it carries
+    redo = []                      # files that relied on a failed upload
+    jobs = max(1, jobs or (os.cpu_count() or 2))
+    window = jobs * 2  # parsed-but-not-consumed results held in memory
+    connections = max(1, connections)
+    max_inflight = connections * 2  # encoded bodies held while waiting for a connection
+    inflight = {}                   # upload future -> fingerprints in its body
+    all_ok = True
+    net = epoch_net.shared_loop()
+    slots = net.run(_semaphore(connections))
+
+    def _reap(block):
+        nonlocal all_ok
+        if not inflight:
+            return
+        done, _ = wait(list(inflight), return_when=FIRST_COMPLETED if block else ALL_COMPLETED,
+                       timeout=None if block else 0)
+        for f in done:
+            fps = inflight.pop(f)
+            for fp in fps:
+                del sending[fp]
+            if f.result():
+                seen.update(fps)
+            else:
+                all_ok = False
+                redo.extend(depends.get(f, ()))
+            depends.pop(f, None)
+        manifest.flush(FLUSH_SECS)
+
+    with ProcessPoolExecutor(max_workers=jobs) as parse_pool:
+        pending = deque()
+        it = iter(todo)
+        def _fill():
+            while len(pending) < window:
+                nxt = next(it, None)
+                if nxt is None:
+                    return
+                pending.append((nxt[1], parse_pool.submit(_parse_file, nxt[0])))
+        _fill()
+        while pending:
+            sig, fut = pending.popleft()
+            res = fut.result()
+            _fill()
+            _reap(block=False)
+            path = res["path"]
+            progress.parsed += 1
+            progress.bytes_in += res["size"]
+            if res["error"]:
+                manifest.mark(path, sig, "parse_error", error=res["error"][:300])
+                progress.failed += 1
+                progress.tick()
+                continue
+            # Dedupe in input order so the result does not depend on pool scheduling.
+            table = res["events"]
+            fresh, fps, mine, held = [], [], set(), set()
+            blob = res["fps"]
+            for row, fp in enumerate(blob[i:i + 8] for i in range(0, len(blob), 8)):
+                if fp in seen or fp in mine:
+                    continue
+                if fp in sending:
+                    held.add(sending[fp])
+                    continue
+                mine.add(fp); fresh.append(row); fps.append(fp)
+            for f in held:
+                depends.setdefault(f, []).append((path, sig))
+            progress.events_in += len(table)
+            progress.events_new += len(fresh)
+            if not fresh or dry_run:
+                if not dry_run:
+                    manifest.mark(path, sig, "empty", events=0)
+                else:
+                    seen.update(fps)
+                progress.tick()
+                continue
+            if len(fresh) < len(table):
+                table = table.select(fresh)
+            meta = res["meta"]
+            meta["_uploader"] = {"name": core.APP_NAME, "version": core.APP_VERSION,
+                                 "upload_tick": int(time.time()), "bulk": True}
+            # Backpressure: do not encode another body while the connections are saturated.
+            while len(inflight) >= max_inflight:
+                _reap(block=True)
+            body = core.encode_upload_body(token, {"events": table.to_dicts(), "meta": meta})
+            f = net.submit(_upload_one(slots, path, sig, len(table), body, fps,
+                                       manifest, progress, server, token))
+            inflight[f] = fps
+            sending.update(dict.fromkeys(fps, f))
+            progress.tick()
+        while inflight:
+            _reap(block=True)
+    # Done after every upload finished, so a later "uploaded" cannot overwrite it.
+    for path, sig in redo:
+        manifest.mark(path, sig, "failed", error="shares events with a failed upload")
+    manifest.flush()
+    progress.tick(force=True)
+    return all_ok and progress.failed == 0
+
+def main(argv=None, default_manifest=None):
+    ap = argparse.ArgumentParser(prog="epoch_uploader.py bulk",
+                                 description="Parse and upload archived SavedVariables in bulk.")
+    ap.add_argument("inputs", nargs="+", help="directories, globs or files")
+    ap.add_argument("--pattern", default=DEFAULT_PATTERN, help="file pattern inside directories (default: %(default)s)")
+    ap.add_argument("--jobs", type=int, default=None, help="parser processes (default: CPU count)")
+    ap.add_argument("--connections", type=int, default=4, help="concurrent uploads (default: %(default)s)")
+    ap.add_argument("--manifest", default=default_manifest, help="resume manifest (default: %(default)s)")
+    ap.add_argument("--dry-run", action="store_true", help="parse and dedupe only; nothing is uploaded or recorded")
+    args = ap.parse_args(argv)
+    if not args.manifest:
+        ap.error("--manifest is required")
+
+    paths = expand_inputs(args.inputs, args.pattern)
+    if not paths:
+        print("No input files found.", file=sys.stderr)
+        return 1
+    d = os.path.dirname(os.path.abspath(args.manifest))
+    os.makedirs(d, exist_ok=True)
+    ok = run_bulk(paths, manifest_path=args.manifest, jobs=args.jobs,
+                  connections=args.connections, dry_run=args.dry_run)
+    return 0 if ok else 1
+
+if __name__ == "__main__":
+    import multiprocessing
+    multiprocessing.freeze_support()
+    sys.exit(main(default_manifest=os.path.join(core.APPDATA_DIR, MANIFEST_NAME)))
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+# EpochHead sharded JSON encoding
+# - Large event lists are split into shards of SHARD_EVENTS, and each shard is json.dumps'ed in a
+#   process pool; the fragments are spliced into one request body
+# - Output is byte for byte what encode_upload_body() / json.dumps produce: a list is
+#   "[" + ", ".join(items) + "]", so shard fragments (a shard's dump without its brackets) join with ", "
+# - The pool starts on first use and is kept for later uploads (worker start-up is the slow part
+#   on Windows); any pool failure falls back to encoding on the calling thread
+
+import os
+import json
+import logging
+import threading
+import concurrent.futures   # the process pool module loads on first parallel encode
+
+SHARD_EVENTS = 4000          # events per worker task
+PARALLEL_MIN_EVENTS = 20000  # below this a single json.dumps is faster than the pickling round trip
+MAX_WORKERS = 8
+
+def _encode_shard(events):
+    """Worker: the JSON of ``events`` without the enclosing brackets, as bytes."""
+    return json.dumps(events)[1:-1].encode("utf-8")
+
+def default_workers():
+    return max(1, min(MAX_WORKERS, os.cpu_count() or 1))
+
+class ShardedEncoder:
+    """``encode_body(token, payload)`` equal to ``encode_upload_body``, with the events
+    list encoded in parallel when it is large and more than one worker is allowed."""
+
+    def __init__(self, workers=None, shard_events=SHARD_EVENTS, min_events=PARALLEL_MIN_EVENTS):
+        self.workers = default_workers() if not workers else max(1, int(workers))
+        self.shard_events = max(1, int(shard_events))
+        self.min_events = int(min_events)
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def parallel_for(self, events):
+        return self.workers > 1 and isinstance(events, list) and len(events) >= self.min_events
+
+    def _get_pool(self):
+        with self._lock:
+            if self._pool is None:
+                self._pool = concurrent.futures.ProcessPoolExecutor(max_workers=self.workers)
+            return self._pool
+
+    def encode_events(self, events):
+        """``json.dumps(events).encode("utf-8")``, sharded across the pool when worthwhile."""
+        if not self.parallel_for(events):
+            return json.dumps(events).encode("utf-8")
+        n = self.shard_events
+        shards = [events[i:i + n] for i in range(0, len(events), n)]
+        try:
+            parts = list(self._get_pool().map(_encode_shard, shards))
+        except Exception as e:
+            logging.warning("parallel encoding failed, encoding on one core: %s", e)
+            self.close()
+            return json.dumps(events).encode("utf-8")
+        return b"[" + b", ".join(parts) + b"]"
+
+    def encode_body(self, token, payload):
+        """Same bytes as ``json.dumps({"token": token, "payload": payload}).encode("utf-8")``."""
+        events = payload.get("events")
+        if not self.parallel_for(events):
+            return json.dumps({"token": token, "payload": payload}).encode("utf-8")
+        parts = [b'{"token": ', json.dumps(token).encode("utf-8"), b', "payload": {']
+        for i, (k, v) in enumerate(payload.items()):
+            if i:
+                parts.append(b", ")
+            parts.append(json.dumps(k).encode("utf-8") + b": ")
+            parts.append(self.encode_events(v) if k == "events" else json.dumps(v).encode("utf-8"))
+        parts.append(b"}}")
+        return b"".join(parts)
+
+    def close(self):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,377 @@
+#!/usr/bin/env python3
+# EpochHead synthetic fixtures
+# - Realistic epochheadDB SavedVariables shaped like events.lua output (up to 50k events)
+# - Large aux-addon / Auctionator price databases
+# - StubServer: local http.server that speaks the /upload + /upload/status/<job_id> protocol
+#
+#   python epoch_fixtures.py --events 50000 --out ./fixtures
+
+import os, sys, json, time, random, argparse, threading, itertools
+import http.server
+
+import epoch_market
+import epoch_net
+import epoch_wire
+
+ZONES = {
+    "Elwynn Forest": ["Goldshire", "Fargodeep Mine", "Jasperlode Mine", "Northshire Valley", ""],
+    "Westfall": ["Sentinel Hill", "The Jansen Stead", "Moonbrook", "The Dead Acre", ""],
+    "Durotar": ["Razor Hill", "Valley of Trials", "Sen'jin Village", "Drygulch Ravine", ""],
+    "The Barrens": ["The Crossroads", "Ratchet", "The Sludge Fen", "Lushwater Oasis", ""],
+    "Stranglethorn Vale": ["Booty Bay", "Grom'gol Base Camp", "Zul'Gurub", "Nesingwary's Expedition", ""],
+}
+MOBS = [(299, "Young Wolf", 2), (69, "Diseased Timber Wolf", 3), (1922, "Gray Forest Wolf", 8),
+        (454, "Young Goretusk", 10), (3098, "Mottled Boar", 2), (3102, "Felstalker", 4),
+        (2541, "Lord Sakrasis", 45), (681, "Young Stranglethorn Tiger", 32), (3255, "Sunscale Screecher", 13)]
+NODES = [("Mining", 1731, "Copper Vein", [2770, 2835, 774]), ("Mining", 1732, "Tin Vein", [2771, 2836, 1210]),
+         ("Herbalism", 1617, "Silverleaf", [765]), ("Herbalism", 1618, "Peacebloom", [2447]),
+         ("Herbalism", 1619, "Earthroot", [2449])]
+CONTAINERS = [(5523, "Small Barnacled Clam", [5503, 5498]), (20708, "Tightly Sealed Trunk", [4306, 2589])]
+TRANSFORMS = [("disenchant", 2077, "Magician Staff", [10940, 10938]), ("prospecting", 2770, "Copper Ore", [774, 818])]
+FISH = [6291, 6303, 6289, 6358]
+LOOT_ITEMS = [2589, 2592, 4306, 769, 2672, 723, 1015, 3173, 5465, 4865, 4867, 3300, 2934, 117]
+QUALITY = [0, 1, 1, 1, 2, 3]
+
+def _item(rng, iid, qty=None):
+    return {"id": iid, "name": f"Item {iid}", "qty": qty or rng.choice((1, 1, 1, 2, 3, 5)),
+            "quality": rng.choice(QUALITY), "link": f"|cffffffff|Hitem:{iid}:0:0:0:0:0:0:0:0|h[Item {iid}]|h|r"}
+
+def _pos(rng):
+    zone = rng.choice(list(ZONES))
+    return zone, rng.choice(ZONES[zone]), round(rng.random(), 4), round(rng.random(), 4)
+
+def _guid(rng, entry, typ="F130"):
+    return f"0x{typ}00{entry:06X}{rng.randrange(16**6):06X}"
+
+def make_event(rng, t, session):
+    """One event in the shape events.lua PUSHes (kill/loot with mob, gather, container, transform, fishing...)."""
+    roll = rng.random()
+    zone, subzone, x, y = _pos(rng)
+    inst = {"inInstance": False, "type": "none"}
+    if roll < 0.30:
+        mid, name, lvl = rng.choice(MOBS)
+        src = {"kind": "mob", "id": mid, "guid": _guid(rng, mid), "name": name, "level": lvl + rng.randrange(2),
+               "classification": "normal", "creatureType": "Beast", "reaction": 2,
+               "maxHp": lvl * 45, "zone": zone, "subzone": subzone, "x": x, "y": y}
+        return {"type": "kill", "t": t, "session": session, "sourceKey": f"mob:{mid}", "source": src, "instance": inst}
+    if roll < 0.60:
+        mid, name, lvl = rng.choice(MOBS)
+        g = _guid(rng, mid)
+        src = {"kind": "mob", "id": mid, "guid": g, "name": name, "level": lvl,
+               "zone": zone, "subzone": subzone, "x": x, "y": y}
+        items = [_item(rng, iid) for iid in rng.sample(LOOT_ITEMS, rng.randrange(0, 3))]
+        ev = {"type": "loot", "t": t, "session": session, "source": src, "sourceKey": str(mid),
+              "items": items, "instance": inst, "corpseGUID": g, "corpseEntry": mid, "mobSourceKey": str(mid)}
+        if rng.random() < 0.5:
+            ev["money"] = {"copper": rng.randrange(1, 500)}
+        return ev
+    if roll < 0.78:
+        gk, nid, nname, drops = rng.choice(NODES)
+        src = {"kind": "gather", "gatherKind": gk, "nodeId": nid, "nodeName": nname,
+               "guid": _guid(rng, nid, "F110"), "zone": zone, "subzone": subzone, "x": x, "y": y}
+        items = [_item(rng, drops[0], rng.randrange(1, 4))] + \
+                ([_item(rng, rng.choice(drops[1:]), 1)] if len(drops) > 1 and rng.random() < 0.2 else [])
+        return {"type": "loot", "t": t, "session": session, "source": src,
+                "sourceKey": f"node:{nid}", "items": items, "instance": inst, "attempt": 1}
+    if roll < 0.84:
+        cid, cname, drops = rng.choice(CONTAINERS)
+        src = {"kind": "container", "containerKind": "item", "itemId": cid, "itemName": cname}
+        return {"type": "loot", "t": t, "session": session, "source": src, "sourceKey": f"container:item:{cid}",
+                "items": [_item(rng, rng.choice(drops))], "instance": inst, "attempt": 1}
+    if roll < 0.88:
+        tk_, iid, iname, drops = rng.choice(TRANSFORMS)
+        src = {"kind": "transform", "transformKind": tk_, "itemId": iid, "itemName": iname, "itemRarity": 2}
+        return {"type": "loot", "t": t, "session": session, "source": src,
+                "sourceKey": f"transform:{tk_}:item:{iid}", "items": [_item(rng, rng.choice(drops))],
+                "instance": inst, "attempt": 1, "profession": tk_,
+                "transform": {"kind": tk_, "item": {"id": iid, "name": iname, "rarity": 2}}}
+    if roll < 0.94:
+        src = {"kind": "fishing", "type": "fishing", "name": "Fishing", "zone": zone, "subzone": subzone, "x": x, "y": y}
+        skey = f"fishing:{zone}" + (f":{subzone}" if subzone else "")
+        return {"type": "loot", "t": t, "session": session, "source": src, "sourceKey": skey,
+                "items": [_item(rng, rng.choice(FISH))], "instance": inst}
+    if roll < 0.97:
+        qid = rng.randrange(1, 12000)
+        return {"type": "quest", "subtype": rng.choice(("accept", "turnin")), "t": t, "session": session,
+                "id": qid, "title": f"Quest {qid}", "level": rng.randrange(1, 60), "zone": zone}
+    nid = rng.randrange(200, 20000)
+    return {"type": "vendor_snapshot", "t": t, "session": session,
+            "source": {"kind": "vendor", "id": nid, "name": f"Vendor {nid}", "zone": zone, "subzone": subzone, "x": x, "y": y},
+            "items": [dict(_item(rng, iid, 1), price=rng.randrange(1, 5000), stock=-1)
+                      for iid in rng.sample(LOOT_ITEMS, 6)]}
+
+def make_epochhead_db(n_events=10000, seed=1, realm="Kezan", schema_version=2, t0=None):
+    rng = random.Random(seed)
+    t = int(t0 or 1_700_000_000)
+    sessions = [f"2023111{i}120000-{rng.randrange(16**8):08x}" for i in range(max(1, n_events // 2500))]
+    events = []
+    for i in range(n_events):
+        t += rng.randrange(0, 20)
+        events.append(make_event(rng, t, sessions[i * len(sessions) // max(1, n_events)]))
+    return {
+        "events": events,
+        "meta": {
+            "addon": "epochhead", "version": "0.9.43", "schemaVersion": schema_version,
+            "clientVersion": "3.3.5", "clientBuild": "12340", "interface": 30300, "created": int(t0 or 1_700_000_000),
+            "player": {"name": "Fixture", "realm": realm, "class": "WARRIOR", "className": "Warrior",
+                       "race": "Human", "raceName": "Human", "faction": "Alliance", "level": 42},
+            "allowedRealms": ["Kezan", "Gurubashi"], "realmAllowed": realm.lower() in ("kezan", "gurubashi"),
+        },
+        "state": {"sessionId": sessions[-1], "sessionStarted": t, "eventsThisSession": n_events, "debug": False},
+        "seenTooltips": {str(iid): t - rng.randrange(0, 86400 * 7) for iid in range(1000, 1000 + min(n_events, 4000))},
+    }
+
+AUCTIONATOR_DAY_ZERO = 1289779200  # 2010-11-15, Auctionator's scan-history day 0
+
+def make_aux_db(n_items=20000, seed=2, realm="Kezan", faction="Alliance", points=12, t0=None):
+    """aux-addon layout: aux.faction["Realm|Faction"].history[item_key] = "next_push#daily_min#v@t;v@t"."""
+    rng = random.Random(seed)
+    now = int(t0 or 1_700_000_000)
+    history = {}
+    for i in range(n_items):
+        key = f"{1000 + i}:0"
+        base = rng.randrange(10, 200000)
+        pts = ";".join(f"{max(1, int(base * rng.uniform(0.7, 1.3)))}@{now - d * 86400 - rng.randrange(3600)}"
+                       for d in range(rng.randrange(1, points)))
+        history[key] = f"{now + 3600}#{base}#{pts}"
+    return {"faction": {f"{realm}|{faction}": {"history": history, "post": {}}}, "character": {}, "account": {}}
+
+def make_auctionator_db(n_items=20000, seed=3, realm="Kezan", faction="Alliance", days=14, t0=None):
+    """Auctionator layout: AUCTIONATOR_PRICE_DATABASE["Realm_Faction"][item name] = {mr=, cc=, id=, H<day>=}."""
+    rng = random.Random(seed)
+    today = (int(t0 or 1_700_000_000) - AUCTIONATOR_DAY_ZERO) // 86400
+    realm_db = {}
+    for i in range(n_items):
+        base = rng.randrange(10, 200000)
+        rec = {"mr": base, "cc": rng.randrange(0, 16), "id": f"{1000 + i}:0:0"}
+        for d in range(rng.randrange(1, days)):
+            rec[f"H{today - d}"] = max(1, int(base * rng.uniform(0.7, 1.3)))
+        realm_db[f"Item {1000 + i}"] = rec
+    return {"__dbversion": 2, f"{realm}_{faction}": realm_db}
+
+# --------------- Lua serialization (SavedVariables style) ---------------
+def _lua_str(s):
+    return '"' + str(s).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") + '"'
+
+def _lua_key(k):
+    return f"[{k}]" if isinstance(k, int) and not isinstance(k, bool) else f"[{_lua_str(k)}]"
+
+def _lua_value(v, out, depth):
+    if isinstance(v, bool):
+        out.append("true" if v else "false")
+    elif v is None:
+        out.append("nil")
+    elif isinstance(v, (int, float)):
+        out.append(repr(v))
+    elif isinstance(v, str):
+        out.append(_lua_str(v))
+    elif isinstance(v, (list, tuple)):
+        ind = "\t" * (depth + 1)
+        out.append("{\n")
+        for i, item in enumerate(v, 1):
+            out.append(ind); _lua_value(item, out, depth + 1); out.append(f", -- [{i}]\n")
+        out.append("\t" * depth + "}")
+    elif isinstance(v, dict):
+        ind = "\t" * (depth + 1)
+        out.append("{\n")
+        for k, item in v.items():
+            out.append(f"{ind}{_lua_key(k)} = "); _lua_value(item, out, depth + 1); out.append(",\n")
+        out.append("\t" * depth + "}")
+    else:
+        raise TypeError(f"cannot serialize {type(v).__name__}")
+
+def to_lua(tables: dict) -> str:
+    """Serialize ``{varname: value}`` the way the WoW client writes SavedVariables."""
+    out = []
+    for name, value in tables.items():
+        out.append(f"\n{name} = ")
+        _lua_value(value, out, 0)
+        out.append("\n")
+    return "".join(out)
+
+def write_fixtures(out_dir, n_events=10000, n_market_items=20000, seed=1):
+    """Write epochhead.lua, aux-addon.lua and Auctionator.lua; returns {file name: path}."""
+    os.makedirs(out_dir, exist_ok=True)
+    files = {
+        "epochhead.lua": {"epochheadDB": make_epochhead_db(n_events, seed)},
+        "aux-addon.lua": {"aux": make_aux_db(n_market_items, seed + 1)},
+        "Auctionator.lua": {"AUCTIONATOR_SAVEDVARS": {"_50000": 50000, "STARTING_DISCOUNT": 5},
+                            "AUCTIONATOR_PRICE_DATABASE": make_auctionator_db(n_market_items, seed + 2)},
+    }
+    paths = {}
+    for name, tables in files.items():
+        if name != "epochhead.lua" and not n_market_items:
+            continue
+        p = os.path.join(out_dir, name)
+        with open(p, "w", encoding="utf-8", newline="\n") as f:
+            f.write(to_lua(tables))
+        paths[name] = p
+    return paths
+
+# --------------- Stub upload server ---------------
+class _StubHTTPServer(http.server.ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 256  # the default backlog of 5 refuses connections under load-test concurrency
+
+class StubServer:
+    """Local stand-in for the upload backend.
+
+    ``POST /upload`` answers ``202 {"job_id": ...}``; ``GET /upload/status/<id>``
+    answers ``{"finished": false}`` until ``job_delay`` seconds have passed, then
+    ``{"finished": true, "result": {...}}``.  Use as a context manager; ``url``
+    is the base URL to pass as ``server``.
+
+    For load tests, ``latency`` delays every upload response, ``job_delay``
+    can be a ``(min, max)`` range, and ``error_rate`` answers that fraction of
+    uploads with ``503`` (with ``Retry-After: retry_after`` when set).
+    ``wire_formats`` are the upload formats the stub advertises and accepts
+    (pass ``()`` to behave like a JSON-only server). Like the real backend it
+    rejects a body whose ``Content-Digest`` does not match, and answers a
+    repeated ``Idempotency-Key`` with the original job instead of a new one.
+    With ``record``, every upload that passes the digest check (replays and
+    rejected formats included) is kept in ``uploads`` as ``(content_type,
+    payload)``, events decoded to plain dicts (payload None if it does not parse).
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, job_delay=0.0, latency=0.0, error_rate=0.0, seed=None,
+                 wire_formats=(epoch_wire.WIRE_COLUMNAR, epoch_market.MARKET_FORMAT, epoch_wire.WIRE_COLLAPSE),
+                 retry_after=None, record=False):
+        self.job_delay = job_delay
+        self.record = record
+        self.uploads = []
+        self.retry_after = retry_after      # Retry-After seconds sent with injected 503s
+        self.wire_formats = tuple(wire_formats)
+        self.latency = latency
+        self.error_rate = error_rate
+        self._rng = random.Random(seed)
+        self.jobs = {}
+        self.keys = {}          # Idempotency-Key -> job_id
+        self.replayed = 0
+        self.requests = 0
+        self.bytes_received = 0
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        stub = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _send(self, code, obj):
+                data = json.dumps(obj).encode("utf-8")
+                self.send_response(code)
+                self.send_header("Content-Type", "application/json")
+                if code == 503 and stub.retry_after is not None:
+                    self.send_header("Retry-After", str(stub.retry_after))
+                self.send_header("Content-Length", str(len(data)))
+                if stub.wire_formats:
+                    self.send_header(epoch_wire.WIRE_ACCEPT_HEADER, ", ".join(stub.wire_formats))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_POST(self):
+                n = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(n)
+                self._send(*stub.handle_upload(self.path, self.headers, body))
+
+            def do_GET(self):
+                self._send(*stub.handle_status(self.path))
+
+        self._httpd = _StubHTTPServer((host, port), Handler)
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _job_delay(self):
+        d = self.job_delay
+        if isinstance(d, (tuple, list)):
+            with self._lock:
+                return self._rng.uniform(d[0], d[1])
+        return float(d or 0.0)
+
+    def handle_upload(self, path, headers, body):
+        with self._lock:
+            self.requests += 1
+            self.bytes_received += len(body)
+            fail = self.error_rate and self._rng.random() < self.error_rate
+        if self.latency:
+            time.sleep(self.latency)
+        if fail:
+            return 503, {"error": "overloaded"}
+        digest = headers.get(epoch_net.DIGEST_HEADER)
+        if digest and digest != epoch_net.body_digest(body):
+            return 400, {"error": "body checksum mismatch"}
+        ctype = (headers.get("Content-Type") or "").split(";")[0].strip()
+        if self.record:
+            try:
+                rec = epoch_wire.decode_body(body)[1]
+            except Exception:
+                rec = None
+            with self._lock:
+                self.uploads.append((ctype, rec))
+        key = headers.get(epoch_net.IDEMPOTENCY_HEADER)
+        with self._lock:
+            known = self.keys.get(key) if key else None
+            if known:
+                self.replayed += 1
+        if known:
+            return 200, {"job_id": known, "replayed": True}
+        if ctype == epoch_wire.CONTENT_TYPE_COLUMNAR and epoch_wire.WIRE_COLUMNAR not in self.wire_formats:
+            return 415, {"error": "unsupported upload format"}
+        try:
+            _token, payload = epoch_wire.decode_body(body)
+            events = payload.get("events") or []
+        except Exception as e:
+            return 400, {"error": f"bad body: {e}"}
+        job_id = f"job{next(self._ids)}"
+        ready_at = time.time() + self._job_delay()
+        with self._lock:
+            self.jobs[job_id] = (ready_at, len(events))
+            if key:
+                self.keys[key] = job_id
+        return 202, {"job_id": job_id}
+
+    def handle_status(self, path):
+        job_id = path.rstrip("/").rsplit("/", 1)[-1]
+        with self._lock:
+            job = self.jobs.get(job_id)
+        if not job:
+            return 404, {"error": "unknown job"}
+        ready_at, n = job
+        if time.time() < ready_at:
+            return 200, {"finished": False}
+        return 200, {"finished": True, "result": {"created": n, "updated": 0, "kept": n}}
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="stub-server", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Write synthetic SavedVariables fixtures.")
+    ap.add_argument("--out", default="fixtures", help="output folder (default: %(default)s)")
+    ap.add_argument("--events", type=int, default=10000, help="epochheadDB events (default: %(default)s)")
+    ap.add_argument("--market-items", type=int, default=20000, help="aux/Auctionator items; 0 to skip (default: %(default)s)")
+    ap.add_argument("--seed", type=int, default=1)
+    args = ap.parse_args(argv)
+    for name, p in write_fixtures(args.out, args.events, args.market_items, args.seed).items():
+        print(f"{p}\t{os.path.getsize(p):,} bytes")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
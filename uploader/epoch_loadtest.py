@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+# EpochHead upload load generator
+# - Replays archived epochhead*.lua files or synthetic payloads through post_upload_async/wait_for_job_async
+# - Open-loop at --rate requests/s, at most --concurrency in flight, all as coroutines on the network loop
+# - Reports POST latency percentiles, job completion time and error rates (text + optional JSON)
+#
+#   python epoch_loadtest.py --stub --synthetic 5000 --rate 5 --requests 50
+#   python epoch_loadtest.py --server http://host:5001 --files D:\Archive --rate 1 --duration 300
+
+import os, sys, json, time, math, argparse, asyncio
+from collections import Counter
+
+import epoch_net
+import epoch_uploader as core
+import epoch_fixtures as fx
+from epoch_bulk import expand_inputs
+
+def percentile(values, pct):
+    """Nearest-rank percentile of an unsorted list; None when empty."""
+    if not values:
+        return None
+    vals = sorted(values)
+    k = max(0, min(len(vals) - 1, math.ceil(pct / 100.0 * len(vals)) - 1))
+    return vals[k]
+
+def _dist(values):
+    if not values:
+        return {"count": 0}
+    return {"count": len(values), "mean": round(sum(values) / len(values), 4),
+            **{f"p{p}": round(percentile(values, p), 4) for p in (50, 90, 95, 99)},
+            "max": round(max(values), 4)}
+
+def load_bodies(files=(), synthetic=0, variants=4, token=None):
+    """Pre-encode request bodies so the generator measures the server, not the client."""
+    token = token or core.TOKEN
+    bodies = []
+    for p in files:
+        try:
+            with open(p, "r", encoding="utf-8", errors="ignore") as f:
+                sv = core.parse_savedvars(f.read(), core.VAR_NAME)
+        except Exception as e:
+            print(f"skipping {p}: {e}", file=sys.stderr)
+            continue
+        events, meta = list(sv.get("events") or []), dict(sv.get("meta") or {})
+        core._normalize_inplace(events); core._normalize_inplace(meta)
+        bodies.append((os.path.basename(p), len(events), core.encode_upload_body(token, {"events": events, "meta": meta})))
+    for i in range(synthetic and variants or 0):
+        db = fx.make_epochhead_db(synthetic, seed=100 + i)
+        core._normalize_inplace(db["events"])
+        payload = {"events": db["events"], "meta": db["meta"]}
+        bodies.append((f"synthetic-{i}", synthetic, core.encode_upload_body(token, payload)))
+    return bodies
+
+class LoadTest:
+    def __init__(self, server, bodies, *, rate=1.0, concurrency=4, poll_interval=0.5, job_timeout=300.0):
+        self.server = server
+        self.bodies = bodies
+        self.rate = max(0.001, float(rate))
+        self.concurrency = max(1, int(concurrency))
+        self.poll_interval = poll_interval
+        self.job_timeout = job_timeout
+        self.post_latency, self.job_time, self.total_time = [], [], []
+        self.codes = Counter()
+        self.job_errors = Counter()
+        self.bytes_sent = 0
+        self.late_starts = 0
+
+    async def _one(self, slots, body):
+        """One request and its job, on the loop thread (no locking needed)."""
+        try:
+            t0 = time.perf_counter()
+            try:
+                code, resp = await core.post_upload_async(self.server, core.TOKEN, None, body=body)
+            except Exception as e:
+                code, resp = 0, str(e)
+            t_post = time.perf_counter() - t0
+            t_job = job_id = None
+            if 200 <= int(code or 0) < 400:
+                try: job_id = json.loads(resp).get("job_id")
+                except Exception: pass
+            if job_id:
+                t1 = time.perf_counter()
+                # A fixed interval (no backoff) keeps completion times comparable between runs.
+                scode, sbody = await core.wait_for_job_async(self.server, job_id, interval=self.poll_interval,
+                                                             max_wait=self.job_timeout,
+                                                             max_interval=self.poll_interval)
+                if 200 <= int(scode or 0) < 300:
+                    t_job = time.perf_counter() - t1
+                elif int(scode or 0) == 0 and sbody.startswith("timed out"):
+                    self.job_errors["timeout"] += 1
+                else:
+                    self.job_errors[f"status_{scode}"] += 1
+            self.codes[int(code or 0)] += 1
+            self.bytes_sent += len(body)
+            self.post_latency.append(t_post)
+            if t_job is not None:
+                self.job_time.append(t_job)
+                self.total_time.append(t_post + t_job)
+        finally:
+            slots.release()
+
+    async def _drive(self, requests, duration, progress):
+        slots = asyncio.Semaphore(self.concurrency)
+        t0 = time.perf_counter()
+        interval = 1.0 / self.rate
+        issued, tasks = 0, []
+        while True:
+            if requests and issued >= requests:
+                break
+            due = t0 + issued * interval
+            if duration and due - t0 >= duration:
+                break
+            delay = due - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            if slots.locked():
+                # All connections busy: the server is slower than the offered rate.
+                self.late_starts += 1
+            await slots.acquire()
+            _name, _n, body = self.bodies[issued % len(self.bodies)]
+            tasks.append(asyncio.ensure_future(self._one(slots, body)))
+            issued += 1
+            if progress and issued % max(1, int(self.rate * 5)) == 0:
+                progress.write(f"issued {issued}, done {sum(self.codes.values())}\n"); progress.flush()
+        await asyncio.gather(*tasks)
+        return issued, time.perf_counter() - t0
+
+    def run(self, requests=None, duration=None, progress=sys.stderr):
+        if not requests and not duration:
+            requests = 10
+        issued, elapsed = epoch_net.run(self._drive(requests, duration, progress))
+        return self.report(issued, elapsed)
+
+    def report(self, issued, elapsed):
+        done = sum(self.codes.values())
+        errors = sum(n for c, n in self.codes.items() if not 200 <= c < 400)
+        return {
+            "server": self.server,
+            "offered_rate": self.rate,
+            "achieved_rate": round(done / elapsed, 3) if elapsed else None,
+            "concurrency": self.concurrency,
+            "issued": issued,
+            "completed": done,
+            "elapsed_s": round(elapsed, 3),
+            "late_starts": self.late_starts,
+            "status_codes": {str(k): v for k, v in sorted(self.codes.items())},
+            "error_rate": round(errors / done, 4) if done else None,
+            "job_errors": dict(self.job_errors),
+            "mb_sent": round(self.bytes_sent / 1e6, 3),
+            "post_latency_s": _dist(self.post_latency),
+            "job_completion_s": _dist(self.job_time),
+            "end_to_end_s": _dist(self.total_time),
+        }
+
+def format_report(r):
+    def row(name, d):
+        if not d.get("count"):
+            return f"  {name:<16} —"
+        return (f"  {name:<16} n={d['count']:<5} p50 {d['p50'] * 1000:8.1f}  p90 {d['p90'] * 1000:8.1f}  "
+                f"p99 {d['p99'] * 1000:8.1f}  max {d['max'] * 1000:8.1f} ms")
+    err = "—" if r["error_rate"] is None else f"{r['error_rate'] * 100:.1f}%"
+    return "\n".join([
+        f"{r['completed']}/{r['issued']} requests in {r['elapsed_s']:.1f}s "
+        f"(offered {r['offered_rate']}/s, achieved {r['achieved_rate']}/s, concurrency {r['concurrency']})",
+        f"  status codes     {r['status_codes']}  error rate {err}  late starts {r['late_starts']}  "
+        f"job errors {r['job_errors'] or '—'}  sent {r['mb_sent']} MB",
+        row("POST latency", r["post_latency_s"]),
+        row("job completion", r["job_completion_s"]),
+        row("end to end", r["end_to_end_s"]),
+    ])
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Replay uploads against the backend at a fixed rate.")
+    src = ap.add_argument_group("payloads")
+    src.add_argument("--files", nargs="*", default=[], help="archived files, directories or globs to replay")
+    src.add_argument("--synthetic", type=int, default=0, metavar="EVENTS", help="synthetic payloads with this many events")
+    src.add_argument("--variants", type=int, default=4, help="distinct synthetic payloads (default: %(default)s)")
+    tgt = ap.add_argument_group("target")
+    tgt.add_argument("--server", default=None, help=f"base URL (default: {core.SERVER})")
+    tgt.add_argument("--stub", action="store_true", help="start a local stand-in server and target it")
+    tgt.add_argument("--stub-job-delay", default="0.2,1.0", help="stub job time range in seconds (default: %(default)s)")
+    tgt.add_argument("--stub-latency", type=float, default=0.0)
+    tgt.add_argument("--stub-error-rate", type=float, default=0.0)
+    ld = ap.add_argument_group("load")
+    ld.add_argument("--rate", type=float, default=1.0, help="requests per second (default: %(default)s)")
+    ld.add_argument("--concurrency", type=int, default=4)
+    ld.add_argument("--requests", type=int, default=None)
+    ld.add_argument("--duration", type=float, default=None, help="seconds")
+    ld.add_argument("--poll-interval", type=float, default=0.5)
+    ld.add_argument("--job-timeout", type=float, default=300.0, help="seconds to wait for a job (default: %(default)s)")
+    ap.add_argument("--json", help="also write the report as JSON to this path")
+    args = ap.parse_args(argv)
+
+    files = expand_inputs(args.files) if args.files else []
+    if not files and not args.synthetic:
+        args.synthetic = 2000
+    bodies = load_bodies(files, args.synthetic, args.variants)
+    if not bodies:
+        print("No usable payloads.", file=sys.stderr)
+        return 1
+    print(f"{len(bodies)} payload(s), {sum(len(b) for _n, _e, b in bodies) / len(bodies) / 1e6:.2f} MB average",
+          file=sys.stderr)
+
+    stub = None
+    server = args.server or core.SERVER
+    if args.stub:
+        lo, _, hi = args.stub_job_delay.partition(",")
+        stub = fx.StubServer(job_delay=(float(lo), float(hi or lo)), latency=args.stub_latency,
+                             error_rate=args.stub_error_rate).start()
+        server = stub.url
+    try:
+        lt = LoadTest(server, bodies, rate=args.rate, concurrency=args.concurrency, poll_interval=args.poll_interval,
+                      job_timeout=args.job_timeout)
+        report = lt.run(requests=args.requests, duration=args.duration)
+    finally:
+        if stub:
+            stub.stop()
+    print(format_report(report))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+# EpochHead market addon exports -> price records
+# - aux-addon:   aux.faction["Realm|Faction"].history[item_key] = "next_push#daily_min#v@t;v@t;..."
+# - Auctionator: AUCTIONATOR_PRICE_DATABASE["Realm_Faction"][item name] = {mr=, cc=, id=, H<day>=price}
+# - Works on the tables parse_savedvars() returns; only records newer than a per-scope cursor
+#   (the newest history timestamp the server acknowledged) are kept
+#
+# Upload shape per addon (replaces "raw_lua" when the server accepts MARKET_FORMAT):
+#   {"file", "mtime", "size", "format": MARKET_FORMAT,
+#    "scopes": {scope: {"realm", "faction", "since", "history": {item: [[t, price], ...]},
+#                       "current": {item: [t, price]}, "names": {item: name}}}}
+
+MARKET_FORMAT = "eh-market/1"
+AUCTIONATOR_DAY_ZERO = 1289779200  # 2010-11-15, Auctionator's H<day> origin
+
+# addon -> SavedVariables table holding its prices
+ADDON_VARS = {"aux": "aux", "auctionator": "AUCTIONATOR_PRICE_DATABASE"}
+
+def _int(v):
+    try:
+        return int(float(v))
+    except Exception:
+        return None
+
+def _scope(key, sep):
+    realm, _, faction = str(key).rpartition(sep)
+    return (realm, faction) if realm else (str(key), "")
+
+def parse_aux_history(value):
+    """``"next_push#daily_min#v@t;v@t"`` -> ``(next_push, daily_min, [(t, price), ...])``."""
+    parts = str(value).split("#")
+    next_push = _int(parts[0]) if parts else None
+    daily_min = _int(parts[1]) if len(parts) > 1 and parts[1] != "" else None
+    points = []
+    if len(parts) > 2 and parts[2]:
+        for p in parts[2].split(";"):
+            v, _, t = p.partition("@")
+            v, t = _int(v), _int(t)
+            if v is not None and t is not None:
+                points.append((t, v))
+    return next_push, daily_min, points
+
+def aux_records(aux, cursors):
+    """Scopes of new aux price records; ``cursors`` maps scope -> acknowledged timestamp."""
+    out = {}
+    factions = aux.get("faction") if isinstance(aux, dict) else None
+    for key, fdata in (factions or {}).items():
+        history = fdata.get("history") if isinstance(fdata, dict) else None
+        if not isinstance(history, dict):
+            continue
+        since = int(cursors.get(key) or 0)
+        hist, current = {}, {}
+        for item, value in history.items():
+            next_push, daily_min, points = parse_aux_history(value)
+            new = [[t, v] for t, v in points if t > since]
+            if new:
+                hist[str(item)] = new
+            # Today's running minimum lives in a bucket that closes at next_push.
+            if daily_min is not None and next_push is not None and next_push > since:
+                current[str(item)] = [next_push, daily_min]
+        if hist or current:
+            realm, faction = _scope(key, "|")
+            out[key] = {"realm": realm, "faction": faction, "since": since,
+                        "history": hist, "current": current}
+    return out
+
+def auctionator_records(db, cursors):
+    """Scopes of new Auctionator price records; day buckets at or after the cursor are resent
+    because Auctionator keeps updating the current day's value."""
+    out = {}
+    for key, items in (db or {}).items():
+        if not isinstance(items, dict) or str(key).startswith("__"):
+            continue
+        since = int(cursors.get(key) or 0)
+        hist, current, names = {}, {}, {}
+        for name, rec in items.items():
+            if not isinstance(rec, dict):
+                continue
+            item = str(rec.get("id") or name)
+            new = []
+            for k, v in rec.items():
+                if isinstance(k, str) and k[:1] == "H" and k[1:].isdigit():
+                    t = AUCTIONATOR_DAY_ZERO + int(k[1:]) * 86400
+                    price = _int(v)
+                    if t >= since and price is not None:
+                        new.append([t, price])
+            if not new:
+                continue
+            new.sort()
+            hist[item] = new
+            if _int(rec.get("mr")) is not None:
+                current[item] = [new[-1][0], _int(rec["mr"])]
+            if item != name:
+                names[item] = str(name)
+        if hist:
+            realm, faction = _scope(key, "_")
+            out[key] = {"realm": realm, "faction": faction, "since": since,
+                        "history": hist, "current": current, "names": names}
+    return out
+
+EXTRACTORS = {"aux": aux_records, "auctionator": auctionator_records}
+
+def scope_cursors(scopes):
+    """New cursor per scope: newest history timestamp in the records (or the old cursor)."""
+    out = {}
+    for key, sc in scopes.items():
+        latest = sc.get("since") or 0
+        for pts in sc["history"].values():
+            latest = max(latest, max(t for t, _v in pts))
+        out[key] = latest
+    return out
+
+def count_records(scopes):
+    return sum(len(p) for sc in scopes.values() for p in sc["history"].values()) + \
+           sum(len(sc["current"]) for sc in scopes.values())
@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+# EpochHead async HTTP client
+# - Minimal HTTP/1.1 over asyncio.open_connection (stdlib only): one request per connection,
+#   Content-Length / chunked / read-to-close bodies, separate connect and read timeouts
+# - NetLoop owns one event loop on one daemon thread; uploads, status polls and retry waits are
+#   coroutines there, so any number of concurrent uploads costs no extra threads
+# - Blocking callers use run(); the upload thread and bulk ingest submit() and wait on the
+#   returned future
+
+import asyncio
+import base64
+import email.utils
+import hashlib
+import socket
+import ssl
+import threading
+import time
+import urllib.parse
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+DIGEST_HEADER      = "Content-Digest"     # RFC 9530: sha-256=:<base64>:
+
+class Response:
+    __slots__ = ("status", "headers", "body")
+
+    def __init__(self, status, headers, body):
+        self.status = status
+        self.headers = headers      # lower-cased names
+        self.body = body
+
+    def getheader(self, name, default=None):
+        return self.headers.get(name.lower(), default)
+
+    def text(self):
+        return self.body.decode("utf-8", "ignore")
+
+def is_file_body(body):
+    return hasattr(body, "read")
+
+def body_digest(body, chunk_size=1 << 20):
+    """``Content-Digest`` value for ``body`` (bytes or a binary file, read from the start)."""
+    h = hashlib.sha256()
+    if is_file_body(body):
+        body.seek(0)
+        for b in iter(lambda: body.read(chunk_size), b""):
+            h.update(b)
+    else:
+        h.update(body)
+    return "sha-256=:" + base64.b64encode(h.digest()).decode("ascii") + ":"
+
+def retry_after(resp):
+    """Seconds from a ``Retry-After`` header (delta or HTTP date), or None."""
+    v = resp.getheader("Retry-After")
+    if not v:
+        return None
+    v = v.strip()
+    if v.isdigit():
+        return float(v)
+    try:
+        return max(0.0, email.utils.parsedate_to_datetime(v).timestamp() - time.time())
+    except Exception:
+        return None
+
+# --------------- HTTP/1.1 ---------------
+async def _read_chunked(reader):
+    parts = []
+    while True:
+        line = await reader.readline()
+        size = int(line.split(b";", 1)[0].strip() or b"0", 16)
+        if size == 0:
+            # Trailers end with an empty line (or the connection closes).
+            while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                pass
+            return b"".join(parts)
+        parts.append(await reader.readexactly(size))
+        await reader.readline()
+
+async def _read_response(reader, method):
+    line = await reader.readline()
+    parts = line.decode("latin-1").split(None, 2)
+    if len(parts) < 2 or not parts[0].startswith("HTTP/") or not parts[1].isdigit():
+        raise ValueError(f"bad status line: {line[:80]!r}")
+    status = int(parts[1])
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        k, _, v = line.decode("latin-1").partition(":")
+        k, v = k.strip().lower(), v.strip()
+        headers[k] = f"{headers[k]}, {v}" if k in headers else v
+    if method == "HEAD" or status in (204, 304) or 100 <= status < 200:
+        body = b""
+    elif "chunked" in headers.get("transfer-encoding", "").lower():
+        body = await _read_chunked(reader)
+    elif "content-length" in headers:
+        body = await reader.readexactly(int(headers["content-length"]))
+    else:
+        body = await reader.read()
+    return Response(status, headers, body)
+
+async def request(method, url, body=b"", headers=None, connect_timeout=30, read_timeout=300,
+                  chunk_size=64 * 1024, shaper=None):
+    """One HTTP request; returns a ``Response``.
+
+    ``body`` is bytes or a seekable binary file (sent from the start, one
+    ``chunk_size`` piece in memory at a time). ``shaper`` paces the body:
+    ``await shaper.before_send(n)`` before each chunk, ``shaper.after_send(n, secs)``
+    with the time the chunk took to drain into the socket (see
+    epoch_uploader.BandwidthShaper). Each chunk's size comes from
+    ``shaper.chunk_size(chunk_size)`` at the time, and the socket buffer is made
+    small once ``shaper.rate`` is set, so a rate imposed mid-send applies to both. ``read_timeout`` bounds each body chunk write and the wait for the whole
+    response. Raises ``asyncio.TimeoutError``/``OSError``/``ValueError``.
+    """
+    parsed = urllib.parse.urlsplit(url)
+    https = parsed.scheme == "https"
+    port = parsed.port or (443 if https else 80)
+    reader, writer = await asyncio.wait_for(
+        asyncio.open_connection(parsed.hostname, port,
+                                ssl=ssl.create_default_context() if https else None),
+        connect_timeout)
+    try:
+        path = parsed.path or "/"
+        if parsed.query:
+            path += "?" + parsed.query
+        head = [f"{method} {path} HTTP/1.1", f"Host: {parsed.netloc}", "Connection: close"]
+        head += [f"{k}: {v}" for k, v in (headers or {}).items()]
+        next_size = (lambda: shaper.chunk_size(chunk_size)) if shaper is not None else (lambda: chunk_size)
+        if is_file_body(body):
+            size = body.seek(0, 2)
+            body.seek(0)
+            chunks = iter(lambda: body.read(next_size()), b"")
+        else:
+            size = len(body)
+            chunks = _slices(memoryview(body), next_size)
+        small_buffer = False
+        if size or method in ("POST", "PUT"):
+            head.append(f"Content-Length: {size}")
+        writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1"))
+        for chunk in chunks:
+            if shaper is not None:
+                if not small_buffer and shaper.rate:
+                    small_buffer = _set_sndbuf(writer, shaper.SNDBUF)
+                await shaper.before_send(len(chunk))
+            t = time.monotonic()
+            writer.write(chunk)
+            await asyncio.wait_for(writer.drain(), read_timeout)
+            if shaper is not None:
+                shaper.after_send(len(chunk), time.monotonic() - t)
+        await asyncio.wait_for(writer.drain(), read_timeout)
+        return await asyncio.wait_for(_read_response(reader, method), read_timeout)
+    finally:
+        writer.close()
+        try:
+            await writer.wait_closed()
+        except Exception:
+            pass
+
+def _slices(view, next_size):
+    i = 0
+    while i < len(view):
+        n = next_size()
+        yield view[i:i + n]
+        i += n
+
+def _set_sndbuf(writer, size):
+    """Shrink the kernel send buffer so a queue on the uplink shows up as drain time
+    (only worth it while a rate is enforced). Returns True once done or not possible."""
+    sock = writer.get_extra_info("socket")
+    try:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, size)
+    except (AttributeError, OSError):
+        pass
+    return True
+
+def error_text(e):
+    """Short description of a network error (TimeoutError has an empty str())."""
+    if isinstance(e, asyncio.TimeoutError):
+        return "timed out"
+    if isinstance(e, asyncio.IncompleteReadError):
+        return "connection closed mid-response"
+    return str(e) or type(e).__name__
+
+# --------------- Event loop thread ---------------
+class NetLoop:
+    """An asyncio loop on a daemon thread, started on first use."""
+
+    def __init__(self, name="net"):
+        self.name = name
+        self._lock = threading.Lock()
+        self._loop = None
+        self._thread = None
+
+    def loop(self):
+        with self._lock:
+            if self._loop is None or not self._thread.is_alive():
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(target=self._loop.run_forever, name=self.name, daemon=True)
+                self._thread.start()
+            return self._loop
+
+    def in_loop_thread(self):
+        return self._thread is not None and threading.current_thread() is self._thread
+
+    def submit(self, coro):
+        """Schedule ``coro``; returns a concurrent.futures.Future."""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop())
+
+    def run(self, coro, timeout=None):
+        """Run ``coro`` on the loop and block for its result (not from the loop thread)."""
+        if self.in_loop_thread():
+            coro.close()
+            raise RuntimeError("NetLoop.run() called from the loop thread; await instead")
+        return self.submit(coro).result(timeout)
+
+_shared = NetLoop()
+
+def shared_loop():
+    """The process-wide network loop used by the uploader, bulk ingest and tools."""
+    return _shared
+
+def run(coro, timeout=None):
+    return _shared.run(coro, timeout)
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+# EpochHead profiler capture for one upload cycle
+# - Armed with `--profile-next` (optionally `--profile-memory`) or Ctrl+Shift+P / Ctrl+Shift+M in the window;
+#   the next upload runs under cProfile, everything else runs unprofiled (this module is not even
+#   imported until a capture is armed)
+# - cProfile sees the upload thread: read, parse_savedvars, the EventTable steps (normalize, validation,
+#   dedupe), encoding, and the network wait (the request itself runs on the network loop; its wall time
+#   shows under _net)
+# - With memory on, tracemalloc runs for the cycle and takes a snapshot after each stage; the report
+#   lists the allocation sites of the heaviest one
+# - Writes profile-<time>.pstats and profile-<time>.txt to APPDATA_DIR for attaching to a bug report
+
+import io
+import os
+import time
+import pstats
+import cProfile
+import platform
+
+import epoch_uploader as core
+
+TOP_N = 40          # functions per table in the text summary
+TOP_ALLOC = 25      # allocation sites listed from the heaviest snapshot
+
+class _Snapshots:
+    """Keeps the tracemalloc snapshot taken at the highest traced size seen after a stage."""
+
+    def __init__(self, tracemalloc):
+        self.tm = tracemalloc
+        self.base = tracemalloc.take_snapshot()
+        self.best = None        # (traced bytes, stage, snapshot)
+        self.by_stage = []      # (stage, traced bytes, peak bytes)
+
+    def __call__(self, stage):
+        cur, peak = self.tm.get_traced_memory()
+        self.by_stage.append((stage, cur, peak))
+        if self.best is None or cur > self.best[0]:
+            self.best = (cur, stage, self.tm.take_snapshot())
+
+def profile_cycle(upload, run, memory=False, out_dir=None):
+    """Run ``run()`` (one upload cycle of ``upload``, an UploaderCore) under cProfile and
+    write the report. Returns what ``run()`` returned."""
+    out_dir = out_dir or core.APPDATA_DIR
+    snaps = tm_started = None
+    if memory:
+        import tracemalloc
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            tm_started = True
+        snaps = _Snapshots(tracemalloc)
+        upload.on_stage = snaps
+    prof = cProfile.Profile()
+    t0 = time.perf_counter()
+    result = error = None
+    prof.enable()
+    try:
+        result = run()
+    except BaseException as e:
+        error = e
+        raise
+    finally:
+        prof.disable()
+        wall = time.perf_counter() - t0
+        peak = None
+        if memory:
+            upload.on_stage = None
+            peak = tracemalloc.get_traced_memory()[1]
+        try:
+            paths = write_report(prof, out_dir, wall=wall, result=result, error=error,
+                                 metrics=upload.last_metrics, snaps=snaps, peak=peak)
+            upload.log(f"Profile saved: {paths[1]} (and {os.path.basename(paths[0])})")
+        except Exception as e:
+            upload.log(f"Could not write profile: {e}")
+        if tm_started:
+            tracemalloc.stop()
+    return result
+
+def write_report(prof, out_dir, *, wall, result=None, error=None, metrics=None, snaps=None, peak=None):
+    """Write ``.pstats`` and the text summary; returns both paths."""
+    os.makedirs(out_dir, exist_ok=True)
+    stem = os.path.join(out_dir, time.strftime("profile-%Y%m%d-%H%M%S"))
+    prof.dump_stats(stem + ".pstats")
+
+    out = io.StringIO()
+    out.write(f"{core.APP_NAME} {core.APP_VERSION} upload profile\n")
+    out.write(f"time: {time.strftime('%Y-%m-%d %H:%M:%S')}   python: {platform.python_version()}"
+              f"   os: {platform.platform()}\n")
+    out.write(f"wall: {core._fmt_secs(wall)}   result: {result!r}"
+              + (f"   error: {type(error).__name__}: {error}" if error is not None else "") + "\n")
+    if metrics:
+        out.write(f"metrics: {metrics}\n")
+    for order in ("cumulative", "tottime"):
+        out.write(f"\n==== top {TOP_N} by {order} ====\n")
+        pstats.Stats(prof, stream=out).strip_dirs().sort_stats(order).print_stats(TOP_N)
+    if snaps is not None:
+        out.write(f"\n==== memory (tracemalloc) ====\npeak traced: {core._fmt_bytes(peak)}\n")
+        for stage, cur, pk in snaps.by_stage:
+            out.write(f"  after {stage:<10} traced {core._fmt_bytes(cur):>10}   peak so far {core._fmt_bytes(pk):>10}\n")
+        if snaps.best is not None:
+            cur, stage, snap = snaps.best
+            out.write(f"\ntop {TOP_ALLOC} allocation sites after '{stage}' ({core._fmt_bytes(cur)} traced), "
+                      "growth since the cycle started:\n")
+            for st in snap.compare_to(snaps.base, "lineno")[:TOP_ALLOC]:
+                out.write(f"  {st}\n")
+    with open(stem + ".txt", "w", encoding="utf-8") as f:
+        f.write(out.getvalue())
+    return stem + ".pstats", stem + ".txt"
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+# EpochHead client-side validation
+# - Reads meta.schemaVersion and migrates events from older addon schemas to the current one
+# - Prunes what the server would drop anyway: every event of a character on a disallowed realm,
+#   and events missing the fields their kind requires
+# - Returns per-kind drop counts so they can be logged and reported with the upload
+
+from collections import Counter
+
+SCHEMA_VERSION = 2                          # EH.SCHEMA_VERSION in epochhead/init.lua
+DEFAULT_ALLOWED_REALMS = ("kezan", "gurubashi")  # EH.ALLOWED_REALMS
+
+# Required fields per event kind for the current schema. Each entry is a field name or a tuple
+# of alternatives (one of them must be present). "*" applies to every kind.
+EVENT_SCHEMA = {
+    "*":              ("type", "t"),
+    "kill":           ("sourceKey", "source"),
+    "loot":           (("items", "money"),),
+    "gather_attempt": ("source",),
+    "quest":          ("subtype", ("id", "title")),
+}
+_NUMERIC = {"t"}
+
+def _present(ev, field):
+    v = ev.get(field)
+    if v is None or v == "":
+        return False
+    if field in _NUMERIC:
+        return isinstance(v, (int, float)) and not isinstance(v, bool)
+    return True
+
+def missing_fields(ev, schema=EVENT_SCHEMA):
+    """Required fields (or ``a|b`` alternatives) that ``ev`` lacks; empty when valid."""
+    out = []
+    for req in schema["*"] + schema.get(ev.get("type"), ()):
+        alts = req if isinstance(req, tuple) else (req,)
+        if not any(_present(ev, f) for f in alts):
+            out.append("|".join(alts))
+    return out
+
+# --------------- Migrations ---------------
+def _migrate_1(events, meta):
+    """v1 (no schemaVersion): items used ``count`` and some sources only carried ``source.key``."""
+    for ev in events:
+        if not isinstance(ev, dict):
+            continue
+        for it in ev.get("items") or ():
+            if isinstance(it, dict) and "qty" not in it and "count" in it:
+                it["qty"] = it.pop("count")
+        src = ev.get("source")
+        if not ev.get("sourceKey") and isinstance(src, dict) and src.get("key"):
+            ev["sourceKey"] = src["key"]
+
+# version -> function upgrading events/meta from that version to the next, in place
+MIGRATIONS = {
+    1: _migrate_1,
+}
+
+def schema_version(meta):
+    try:
+        return int((meta or {}).get("schemaVersion") or 1)
+    except Exception:
+        return 1
+
+def migrate(events, meta):
+    """Upgrade events in place to SCHEMA_VERSION; returns the version they started at."""
+    start = v = schema_version(meta)
+    while v < SCHEMA_VERSION:
+        fn = MIGRATIONS.get(v)
+        if fn:
+            fn(events, meta)
+        v += 1
+    if start < SCHEMA_VERSION:
+        meta["schemaVersion"] = SCHEMA_VERSION
+    return start
+
+# --------------- Realm ---------------
+def allowed_realms(meta):
+    raw = (meta or {}).get("allowedRealms")
+    if isinstance(raw, dict):
+        names = [k for k, v in raw.items() if v]
+    elif isinstance(raw, list):
+        names = raw
+    else:
+        names = []
+    return {str(n).lower() for n in names if n} or set(DEFAULT_ALLOWED_REALMS)
+
+def realm_allowed(meta):
+    """Same rule as EH.isRealmAllowed on meta.player.realm; meta.realmAllowed when the realm is unknown."""
+    meta = meta or {}
+    realm = (meta.get("player") or {}).get("realm") if isinstance(meta.get("player"), dict) else None
+    if realm:
+        return str(realm).lower() in allowed_realms(meta)
+    flag = meta.get("realmAllowed")
+    return flag if isinstance(flag, bool) else True
+
+# --------------- Validation ---------------
+def validate_events(events, meta):
+    """Migrate, then drop events the server would reject.
+
+    Returns ``(kept, report)``; ``report`` has ``schema_version`` (as found),
+    ``dropped_by_realm`` and ``dropped_invalid`` (per-kind counters) and
+    ``missing`` (per ``kind.field`` counts). Events from a newer schema than
+    this client knows are passed through unchecked.
+    """
+    start = migrate(events, meta)
+    report = {"schema_version": start, "dropped_by_realm": Counter(), "dropped_invalid": Counter(),
+              "missing": Counter()}
+    if start > SCHEMA_VERSION:
+        return events, report
+    if not realm_allowed(meta):
+        report["dropped_by_realm"].update(
+            (ev.get("type") if isinstance(ev, dict) else None) or "?" for ev in events)
+        return [], report
+    kept = []
+    for ev in events:
+        if not isinstance(ev, dict):
+            report["dropped_invalid"]["?"] += 1
+            continue
+        miss = missing_fields(ev)
+        if miss:
+            kind = ev.get("type") or "?"
+            report["dropped_invalid"][kind] += 1
+            report["missing"].update(f"{kind}.{f}" for f in miss)
+            continue
+        kept.append(ev)
+    return kept, report
+
+def validate_table(table, meta):
+    """``validate_events`` for an ``EventTable``: the required-field checks run per column.
+
+    Returns ``(kept_table, report)``. Tables from an older schema are migrated on
+    the dict form (old addon versions are rare), then checked the same way.
+    """
+    from epoch_table import EventTable
+    start = schema_version(meta)
+    if start < SCHEMA_VERSION:
+        events = table.to_dicts()
+        migrate(events, meta)
+        table = EventTable.from_dicts(events)
+    report = {"schema_version": start, "dropped_by_realm": Counter(), "dropped_invalid": Counter(),
+              "missing": Counter()}
+    if start > SCHEMA_VERSION:
+        return table, report
+    if not realm_allowed(meta):
+        for k, n in table.kind_counts().items():
+            report["dropped_by_realm"][k or "?"] += n
+        return table.select(()), report
+    n = len(table)
+    ok = [True] * n
+    present = {}
+    def has(field):
+        if field not in present:
+            present[field] = table.present(field, lambda v, f=field: _present({f: v}, f))
+        return present[field]
+    kinds = [k for k in EVENT_SCHEMA if k != "*"]
+    rows_by_kind = {None: range(n)}
+    rows_by_kind.update((k, table.where(kinds=[k])) for k in kinds)
+    for kind, rows in rows_by_kind.items():
+        for req in EVENT_SCHEMA["*"] if kind is None else EVENT_SCHEMA[kind]:
+            alts = req if isinstance(req, tuple) else (req,)
+            cols = [has(f) for f in alts]
+            for row in rows:
+                if not any(c[row] for c in cols):
+                    if ok[row]:
+                        ok[row] = False
+                        report["dropped_invalid"][table.get(row, "type") or "?"] += 1
+                    report["missing"][f"{table.get(row, 'type') or '?'}.{'|'.join(alts)}"] += 1
+    if all(ok):
+        return table, report
+    return table.select(i for i in range(n) if ok[i]), report
+
+def format_counts(counter):
+    return ", ".join(f"{k} {n}" for k, n in counter.most_common())
@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+# EpochHead local event store
+# - SQLite database fed by the uploader after every upload attempt
+# - Indexed by event kind, source key, item id, zone and session
+# - Small query CLI: `epoch_uploader.py query --item 2589 --zone "Elwynn Forest"`
+
+import os, sys, json, time, sqlite3, argparse
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS uploads (
+    id        INTEGER PRIMARY KEY,
+    ts        INTEGER NOT NULL,
+    file      TEXT,
+    status    INTEGER,
+    ok        INTEGER NOT NULL DEFAULT 0,
+    job_id    TEXT,
+    events    INTEGER NOT NULL DEFAULT 0,
+    player    TEXT,
+    realm     TEXT
+);
+CREATE TABLE IF NOT EXISTS events (
+    id          INTEGER PRIMARY KEY,
+    upload_id   INTEGER NOT NULL REFERENCES uploads(id),
+    kind        TEXT,
+    source_kind TEXT,
+    source_key  TEXT,
+    zone        TEXT,
+    subzone     TEXT,
+    session     TEXT,
+    t           INTEGER,
+    body        TEXT
+);
+CREATE TABLE IF NOT EXISTS event_items (
+    event_id  INTEGER NOT NULL REFERENCES events(id),
+    item_id   INTEGER NOT NULL,
+    qty       INTEGER
+);
+CREATE INDEX IF NOT EXISTS ix_events_kind    ON events(kind, t);
+CREATE INDEX IF NOT EXISTS ix_events_source  ON events(source_key, t);
+CREATE INDEX IF NOT EXISTS ix_events_zone    ON events(zone, t);
+CREATE INDEX IF NOT EXISTS ix_events_session ON events(session, t);
+CREATE INDEX IF NOT EXISTS ix_events_upload  ON events(upload_id);
+CREATE INDEX IF NOT EXISTS ix_items_item     ON event_items(item_id);
+"""
+
+def _int_or_none(v):
+    try: return int(v)
+    except Exception: return None
+
+def _event_row(ev: dict):
+    """Pull the indexed columns out of one normalized event dict."""
+    src = ev.get("source") if isinstance(ev.get("source"), dict) else {}
+    kind = ev.get("type") or ev.get("kind")
+    skey = ev.get("sourceKey") or ev.get("key") or src.get("key")
+    zone = ev.get("zone") or src.get("zone")
+    subzone = ev.get("subzone") or src.get("subzone")
+    items = []
+    for it in ev.get("items") or ():
+        if isinstance(it, dict):
+            iid = _int_or_none(it.get("id"))
+            if iid is not None:
+                items.append((iid, _int_or_none(it.get("qty") or it.get("count"))))
+    return (
+        str(kind) if kind is not None else None,
+        str(src.get("kind")) if src.get("kind") is not None else None,
+        str(skey) if skey is not None else None,
+        zone, subzone,
+        str(ev["session"]) if ev.get("session") is not None else None,
+        _int_or_none(ev.get("t")),
+        json.dumps(ev, separators=(",", ":"), ensure_ascii=False),
+    ), items
+
+class EventStore:
+    """Thin wrapper around the SQLite file. Safe to use from any thread:
+    every public call opens its own short-lived connection."""
+
+    def __init__(self, path: str):
+        self.path = path
+        d = os.path.dirname(path)
+        if d:
+            os.makedirs(d, exist_ok=True)
+        with self._connect() as db:
+            db.executescript(SCHEMA)
+
+    def _connect(self):
+        db = sqlite3.connect(self.path, timeout=30)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        db.row_factory = sqlite3.Row
+        return db
+
+    def record_upload(self, events, meta=None, *, file=None, status=None, ok=False, job_id=None, ts=None):
+        """Store one upload attempt and its events. Returns the upload id.
+
+        ``events`` may be any iterable (e.g. a generator over a streamed file);
+        it is consumed once and never held as a list.
+        """
+        rec = self.begin_upload(meta, file=file, ts=ts)
+        with rec:
+            for ev in events or ():
+                rec.add(ev)
+            return rec.finish(status=status, ok=ok, job_id=job_id)
+
+    def begin_upload(self, meta=None, *, file=None, ts=None):
+        """An ``UploadRecorder`` for an upload whose events are fed in while it is being built."""
+        return UploadRecorder(self, meta, file=file, ts=ts)
+
+    def query(self, *, kind=None, source_key=None, item_id=None, zone=None, session=None,
+              since=None, until=None, uploaded_only=False, limit=50):
+        """Return matching events, newest first, joined with their upload row."""
+        where, args = [], []
+        if kind:        where.append("e.kind = ?");       args.append(kind)
+        if source_key:  where.append("e.source_key = ?"); args.append(str(source_key))
+        if zone:        where.append("e.zone = ?");       args.append(zone)
+        if session:     where.append("e.session = ?");    args.append(session)
+        if since is not None: where.append("e.t >= ?");   args.append(int(since))
+        if until is not None: where.append("e.t < ?");    args.append(int(until))
+        if uploaded_only: where.append("u.ok = 1")
+        if item_id is not None:
+            where.append("e.id IN (SELECT event_id FROM event_items WHERE item_id = ?)")
+            args.append(int(item_id))
+        sql = ("SELECT e.*, u.ts AS upload_ts, u.ok AS upload_ok, u.status AS upload_status, u.file AS upload_file"
+               " FROM events e JOIN uploads u ON u.id = e.upload_id")
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY e.t DESC, e.id DESC"
+        if limit:
+            sql += f" LIMIT {int(limit)}"
+        db = self._connect()
+        try:
+            return [dict(r) for r in db.execute(sql, args)]
+        finally:
+            db.close()
+
+    def uploads(self, limit=20):
+        db = self._connect()
+        try:
+            return [dict(r) for r in db.execute("SELECT * FROM uploads ORDER BY id DESC LIMIT ?", (int(limit),))]
+        finally:
+            db.close()
+
+# --------------- CLI ---------------
+class UploadRecorder:
+    """One upload's rows, written as its events go past in a single transaction.
+    Nothing is visible until ``finish()``; ``abort()`` (or leaving a ``with`` block
+    without finishing) discards them. Use from one thread."""
+
+    ITEM_BATCH = 5000
+
+    def __init__(self, store, meta=None, *, file=None, ts=None):
+        meta = meta if isinstance(meta, dict) else {}
+        player = meta.get("player") if isinstance(meta.get("player"), dict) else {}
+        self.events = 0
+        self._items = []
+        self._db = store._connect()
+        try:
+            self.upload_id = self._db.execute(
+                "INSERT INTO uploads(ts, file, status, ok, job_id, events, player, realm) VALUES (?,?,?,?,?,?,?,?)",
+                (int(ts or time.time()), file, None, 0, None, 0, player.get("name"), player.get("realm")),
+            ).lastrowid
+        except BaseException:
+            self.abort()
+            raise
+
+    def add(self, ev):
+        if not isinstance(ev, dict):
+            return
+        row, items = _event_row(ev)
+        cur = self._db.execute(
+            "INSERT INTO events(upload_id, kind, source_kind, source_key, zone, subzone, session, t, body)"
+            " VALUES (?,?,?,?,?,?,?,?,?)", (self.upload_id,) + row)
+        if items:
+            eid = cur.lastrowid
+            self._items.extend((eid, iid, qty) for iid, qty in items)
+            if len(self._items) >= self.ITEM_BATCH:
+                self._flush_items()
+        self.events += 1
+
+    def _flush_items(self):
+        self._db.executemany("INSERT INTO event_items(event_id, item_id, qty) VALUES (?,?,?)", self._items)
+        self._items = []
+
+    def finish(self, *, status=None, ok=False, job_id=None):
+        """Record the outcome and commit. Returns the upload id."""
+        try:
+            if self._items:
+                self._flush_items()
+            self._db.execute("UPDATE uploads SET status = ?, ok = ?, job_id = ?, events = ? WHERE id = ?",
+                             (_int_or_none(status), 1 if ok else 0, job_id, self.events, self.upload_id))
+            self._db.commit()
+        finally:
+            self.abort()
+        return self.upload_id
+
+    def abort(self):
+        """Drop everything not yet committed; safe to call more than once."""
+        if self._db is not None:
+            try:
+                self._db.rollback()
+            finally:
+                self._db.close()
+                self._db = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.abort()
+
+def _parse_when(s):
+    if s is None: return None
+    if s.isdigit(): return int(s)
+    for fmt in ("%Y-%m-%d %H:%M:%S", "%Y-%m-%d %H:%M", "%Y-%m-%d"):
+        try: return int(time.mktime(time.strptime(s, fmt)))
+        except ValueError: pass
+    raise argparse.ArgumentTypeError(f"bad date: {s!r} (use YYYY-MM-DD[ HH:MM[:SS]] or epoch seconds)")
+
+def _fmt_ts(ts):
+    return time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(ts)) if ts else "—"
+
+def _items_summary(body):
+    try: ev = json.loads(body)
+    except Exception: return ""
+    bits = []
+    for it in ev.get("items") or ():
+        if isinstance(it, dict) and it.get("id") is not None:
+            qty = it.get("qty") or it.get("count") or 1
+            bits.append(f"{it.get('id')}x{qty}")
+    return " ".join(bits)
+
+def main(argv=None, default_path=None):
+    ap = argparse.ArgumentParser(prog="epoch_uploader.py query",
+                                 description="Query events recorded by the uploader.")
+    ap.add_argument("--db", default=default_path, help="path to the event store (default: %(default)s)")
+    ap.add_argument("--kind", help="event kind, e.g. loot, kill, vendor_snapshot")
+    ap.add_argument("--source-key", help="source key, e.g. a mob id or node key")
+    ap.add_argument("--item", type=int, help="item id contained in the event")
+    ap.add_argument("--zone")
+    ap.add_argument("--session")
+    ap.add_argument("--since", type=_parse_when)
+    ap.add_argument("--until", type=_parse_when)
+    ap.add_argument("--uploaded", action="store_true", help="only events from successful uploads")
+    ap.add_argument("--limit", type=int, default=50)
+    ap.add_argument("--json", action="store_true", help="print full events as JSON lines")
+    ap.add_argument("--uploads", action="store_true", help="list recent uploads instead of events")
+    args = ap.parse_args(argv)
+    if not args.db:
+        ap.error("--db is required")
+    if not os.path.exists(args.db):
+        print(f"No event store at {args.db} yet.", file=sys.stderr)
+        return 1
+
+    store = EventStore(args.db)
+    t0 = time.perf_counter()
+    if args.uploads:
+        rows = store.uploads(limit=args.limit)
+        for r in rows:
+            print(f"#{r['id']}\t{_fmt_ts(r['ts'])}\t{'OK' if r['ok'] else 'FAIL'}({r['status']})\t"
+                  f"{r['events']} events\t{r['player'] or ''} {r['realm'] or ''}\t{r['file'] or ''}")
+    else:
+        rows = store.query(kind=args.kind, source_key=args.source_key, item_id=args.item, zone=args.zone,
+                           session=args.session, since=args.since, until=args.until,
+                           uploaded_only=args.uploaded, limit=args.limit)
+        for r in rows:
+            if args.json:
+                print(r["body"])
+                continue
+            where = r["zone"] or ""
+            if r["subzone"]: where += f"/{r['subzone']}"
+            print(f"{_fmt_ts(r['t'])}\t{r['kind'] or '?'}\t{r['source_key'] or ''}\t{where}\t"
+                  f"{_items_summary(r['body'])}\tupload #{r['upload_id']} {'OK' if r['upload_ok'] else 'FAIL'}")
+    print(f"{len(rows)} row(s) in {(time.perf_counter() - t0) * 1000:.1f} ms", file=sys.stderr)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+# EpochHead bounded-memory upload path
+# - Scans SavedVariables in 1 MB chunks without loading the file: each element of the events array
+#   is cut out and parsed on its own (same tokenizer/parser as parse_savedvars), everything else in
+#   the table is kept as one small "rest" table (meta, version, ...)
+# - BodySpool writes the request JSON to a temporary file piece by piece; the file is then sent
+#   with a Content-Length, so memory stays at a few events plus I/O buffers
+# - Body bytes equal encode_upload_body() for the same payload
+
+import re
+import json
+import hashlib
+import tempfile
+
+import epoch_uploader as core
+
+CHUNK_SIZE = 1 << 20
+
+_NORMAL = re.compile(r"[\"'{}\-]")
+_IN_STR = {'"': re.compile(r'[\\"]'), "'": re.compile(r"[\\']")}
+_EVENTS_KEY = re.compile(r"""(?:\[\s*["']events["']\s*\]|\bevents)\s*=\s*$""")
+_LOOKBACK = 256  # chars kept before the scan position for the events key check
+
+def iter_text(path, digest=None, chunk_size=CHUNK_SIZE):
+    """Text of ``path`` in chunks, read exactly as the in-memory path reads it (invalid UTF-8
+    dropped, newlines translated). The text, UTF-8 encoded, also goes into ``digest`` when
+    given, so it matches the in-memory path's source digest."""
+    with open(path, "r", encoding="utf-8", errors="ignore") as f:
+        while True:
+            text = f.read(chunk_size)
+            if not text:
+                return
+            if digest is not None:
+                digest.update(text.encode("utf-8"))
+            yield text
+
+def _scan(chunks, varname, want_events):
+    """Yield ``("event", text)`` per events element (when ``want_events``), then ``("rest", text)``:
+    the table source with the events array emptied. Raises ValueError like _find_var_table."""
+    it = iter(chunks)
+    buf = ""
+    pat = re.compile(rf"{re.escape(varname)}\s*=\s*{{")
+    while True:
+        m = pat.search(buf)
+        if m:
+            break
+        nxt = next(it, None)
+        if nxt is None:
+            raise ValueError(f"Could not find '{varname} = {{' in file.")
+        buf = buf[-(len(varname) + 64):] + nxt
+    buf = buf[m.end() - 1:]
+    i, depth, state = 0, 0, None       # state: None, a quote char, "line" or "block"
+    rest, keep = [], 0                 # keep: start of text not yet copied to rest (None inside events)
+    in_events, ev_start, eof = False, None, False
+
+    def more():
+        nonlocal buf, i, keep, ev_start, eof
+        nxt = next(it, None)
+        if nxt is None:
+            eof = True
+            return False
+        if keep is not None:
+            rest.append(buf[keep:i]); keep = i
+        cut = max(0, i - _LOOKBACK)
+        if keep is not None:
+            cut = min(cut, keep)
+        if ev_start is not None:
+            cut = min(cut, ev_start)
+        buf = buf[cut:] + nxt
+        i -= cut
+        if keep is not None:
+            keep -= cut
+        if ev_start is not None:
+            ev_start -= cut
+        return True
+
+    while True:
+        if state is None:
+            m = _NORMAL.search(buf, i)
+            if m is None or (m.group() == "-" and m.start() + 4 > len(buf) and not eof):
+                if m is None:
+                    i = len(buf)
+                if not more():
+                    if m is None:
+                        raise ValueError("Unbalanced braces while extracting table")
+                continue
+            j = m.start(); ch = buf[j]
+            if ch == "-":
+                if buf[j + 1:j + 2] == "-":
+                    if buf[j + 2:j + 4] == "[[":
+                        state, i = "block", j + 4
+                    else:
+                        state, i = "line", j + 2
+                else:
+                    i = j + 1
+                continue
+            if ch in "\"'":
+                state, i = ch, j + 1
+                continue
+            i = j + 1
+            if ch == "{":
+                depth += 1
+                if depth == 2 and not in_events and _EVENTS_KEY.search(buf, max(0, j - _LOOKBACK), j):
+                    in_events = True
+                    rest.append(buf[keep:j + 1]); keep = None
+                elif depth == 3 and in_events and want_events:
+                    ev_start = j
+                continue
+            depth -= 1
+            if in_events and depth == 2 and ev_start is not None:
+                yield "event", buf[ev_start:j + 1]
+                ev_start = None
+            elif in_events and depth == 1:
+                in_events, keep = False, j
+            elif depth == 0:
+                rest.append(buf[keep:j + 1])
+                yield "rest", "".join(rest)
+                return
+        elif state == "line" or state == "block":
+            end = buf.find("\n" if state == "line" else "]]", i)
+            if end < 0:
+                i = max(i, len(buf) - 1)
+                if not more():
+                    raise ValueError("Unbalanced braces while extracting table")
+                continue
+            i = end + (1 if state == "line" else 2)
+            state = None
+        else:
+            m = _IN_STR[state].search(buf, i)
+            if m is None or (m.group() == "\\" and m.start() + 1 >= len(buf) and not eof):
+                i = len(buf) if m is None else m.start()
+                if not more():
+                    raise ValueError("Unbalanced braces while extracting table")
+                continue
+            if m.group() == "\\":
+                i = m.start() + 2
+            else:
+                i, state = m.start() + 1, None
+
+def _parse(text):
+    return core.Parser(core._tokenize(core._strip_lua_comments(text))).parse_value()
+
+def read_rest(path, varname=core.VAR_NAME):
+    """``(table_without_events, source_digest)``; one pass, events are skipped. The digest
+    covers the whole file, like the in-memory path's."""
+    h = hashlib.sha256()
+    chunks = iter_text(path, h)
+    for kind, text in _scan(chunks, varname, want_events=False):
+        if kind == "rest":
+            val = _parse(text)
+            for _ in chunks:   # text after the table still counts
+                pass
+            return (val if isinstance(val, dict) else {}), h.digest()
+
+def iter_events(path, varname=core.VAR_NAME):
+    """Parsed event tables one at a time, in file order (non-table elements are skipped)."""
+    for kind, text in _scan(iter_text(path), varname, want_events=True):
+        if kind == "event":
+            yield _parse(text)
+
+def raw_length(path):
+    """Length of the decoded text (the ``size`` the in-memory path reports)."""
+    return sum(len(t) for t in iter_text(path))
+
+class BodySpool:
+    """Request body built in a temporary file; pass ``file`` as the upload body."""
+
+    def __init__(self, dir=None):
+        self.file = tempfile.TemporaryFile(prefix="epoch_upload_", dir=dir)
+        self.size = 0
+
+    def write(self, s):
+        b = s.encode("utf-8")
+        self.file.write(b)
+        self.size += len(b)
+
+    def write_json(self, obj):
+        self.write(json.dumps(obj))
+
+    def write_raw_string(self, path):
+        """A JSON string holding the decoded text of ``path``, escaped chunk by chunk."""
+        self.write('"')
+        for text in iter_text(path):
+            self.write(json.dumps(text)[1:-1])
+        self.write('"')
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
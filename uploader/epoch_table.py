@@ -0,0 +1,381 @@
+#!/usr/bin/env python3
+# EpochHead in-memory event table
+# - Common event fields live in typed `array` columns, strings as indexes into one pool
+# - Items are stored CSR-style: row i owns item slots item_start[i]:item_start[i+1]
+# - Everything else stays in sparse side maps keyed by row (or item slot)
+# - normalize / where / select / fingerprints / dedupe_keys work column by column; to_dicts() gives
+#   back the dicts parse_savedvars produced (equal values; key order is not kept)
+# - The in-memory upload runs parse -> EventTable -> normalize -> validate -> dedupe -> to_dicts ->
+#   encode; bulk ingest ships tables from its worker processes
+
+import json
+import hashlib
+from array import array
+from collections import Counter
+from itertools import compress
+
+import epoch_uploader as core
+
+_NO_INT = -(1 << 63)      # absent value in "q" columns
+_NO_STR = -1              # absent value in string columns
+
+# (attribute, dict key, kind): "s" string, "q" int64, "d" float64
+_TOP_COLUMNS = (
+    ("kind", "type", "s"),
+    ("t", "t", "q"),
+    ("session", "session", "s"),
+    ("source_key", "sourceKey", "s"),
+)
+_SOURCE_COLUMNS = (
+    ("src_kind", "kind", "s"),
+    ("src_id", "id", "q"),
+    ("zone", "zone", "s"),
+    ("subzone", "subzone", "s"),
+    ("x", "x", "d"),
+    ("y", "y", "d"),
+)
+_ITEM_COLUMNS = (
+    ("item_id", "id", "q"),
+    ("item_qty", "qty", "q"),
+    ("item_quality", "quality", "q"),
+    ("item_name", "name", "s"),
+    ("item_link", "link", "s"),
+)
+_TYPECODES = {"s": "i", "q": "q", "d": "d"}
+# fields dedupe_key reads that can land in the side maps
+_KEY_FIELDS = ("type", "kind", "sourceKey", "source", "items", "session", "t")
+_ITEM_KEY_FIELDS = {"id", "qty", "count"}
+
+def _storable(kind, v):
+    if kind == "s":
+        return isinstance(v, str)
+    if kind == "q":
+        return type(v) is int and v != _NO_INT and -(1 << 63) < v < (1 << 63)
+    return type(v) is float and v == v   # NaN marks "absent"
+
+def _absent(kind):
+    return _NO_STR if kind == "s" else (_NO_INT if kind == "q" else float("nan"))
+
+class EventTable:
+    """Columnar store for normalized upload events.
+
+    Build with ``from_dicts(events)``; ``to_dicts()`` returns equal dicts.
+    Nested values that are not split into columns are shared, not copied.
+    """
+
+    def __init__(self):
+        self.strings = []
+        self._sidx = {}
+        for name, _key, kind in _TOP_COLUMNS + _SOURCE_COLUMNS + _ITEM_COLUMNS:
+            setattr(self, name, array(_TYPECODES[kind]))
+        self.has_source = array("b")
+        self.has_items = array("b")
+        self.item_start = array("q", [0])
+        self.extra = {}          # row -> other top-level fields
+        self.source_extra = {}   # row -> other source fields
+        self.item_extra = {}     # item slot -> other item fields
+
+    def __len__(self):
+        return len(self.kind)
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        del state["_sidx"]   # rebuilt from the pool; keeps worker->parent pickles small
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._sidx = {s: i for i, s in enumerate(self.strings)}
+
+    def _intern(self, s):
+        i = self._sidx.get(s)
+        if i is None:
+            i = self._sidx[s] = len(self.strings)
+            self.strings.append(s)
+        return i
+
+    def _appenders(self, columns):
+        return [(getattr(self, name).append, k, kind, _absent(kind)) for name, k, kind in columns]
+
+    def _split(self, d, spec):
+        """Append d's columnar fields; returns the leftover fields (or None)."""
+        intern, keep = self._intern, []
+        for append, k, kind, absent in spec:
+            v = d.get(k)
+            if v is not None and _storable(kind, v):
+                append(intern(v) if kind == "s" else v)
+                keep.append(k)
+            else:
+                append(absent)
+        if len(keep) == len(d):
+            return None   # every key went into a column
+        return {k: v for k, v in d.items() if k not in keep} or None
+
+    # --------------- Building ---------------
+    @classmethod
+    def from_dicts(cls, events, consume=False):
+        """Build from event dicts. With ``consume`` (``events`` must be a list), each slot
+        is set to None once its event is split, so the dicts are freed as the table
+        grows instead of both being held in full."""
+        tbl = cls()
+        top, source, item = (tbl._appenders(c) for c in (_TOP_COLUMNS, _SOURCE_COLUMNS, _ITEM_COLUMNS))
+        for row, ev in enumerate(events):
+            if not isinstance(ev, dict):
+                raise ValueError("EventTable needs dict events")
+            rest = tbl._split(ev, top) or {}
+            src = rest.get("source")
+            if isinstance(src, dict):
+                del rest["source"]
+                tbl.has_source.append(1)
+                srest = tbl._split(src, source)
+                if srest:
+                    tbl.source_extra[row] = srest
+            else:
+                tbl.has_source.append(0)
+                for append, _k, _kind, absent in source:
+                    append(absent)
+            items = rest.get("items")
+            if isinstance(items, list) and all(isinstance(it, dict) for it in items):
+                del rest["items"]
+                tbl.has_items.append(1)
+                for it in items:
+                    irest = tbl._split(it, item)
+                    if irest:
+                        tbl.item_extra[len(tbl.item_id) - 1] = irest
+            else:
+                tbl.has_items.append(0)
+            tbl.item_start.append(len(tbl.item_id))
+            if rest:
+                tbl.extra[row] = rest
+            if consume:
+                events[row] = None
+        if consume:
+            events.clear()
+        return tbl
+
+    # --------------- Back to dicts ---------------
+    def _column_values(self, name, kind, lo, hi):
+        col = getattr(self, name)[lo:hi]
+        if kind == "s":
+            strings = self.strings
+            return [strings[i] if i >= 0 else None for i in col]
+        if kind == "q":
+            return [None if v == _NO_INT else v for v in col]
+        return [None if v != v else v for v in col]
+
+    def _fill(self, rows, columns, lo, hi, extra_map, base):
+        for name, key, kind in columns:
+            for d, v in zip(rows, self._column_values(name, kind, lo, hi)):
+                if v is not None:
+                    d[key] = v
+        if extra_map:
+            for i, d in enumerate(rows):
+                rest = extra_map.get(base + i)
+                if rest:
+                    d.update(rest)
+
+    def to_dicts(self, start=0, stop=None):
+        """Event dicts for rows ``start:stop``."""
+        stop = len(self) if stop is None else min(stop, len(self))
+        if start >= stop:
+            return []
+        rows = [{} for _ in range(start, stop)]
+        self._fill(rows, _TOP_COLUMNS, start, stop, None, start)
+        srcs = [{} for _ in range(start, stop)]
+        self._fill(srcs, _SOURCE_COLUMNS, start, stop, self.source_extra, start)
+        for d, has, s in zip(rows, self.has_source[start:stop], srcs):
+            if has:
+                d["source"] = s
+        lo, hi = self.item_start[start], self.item_start[stop]
+        items = [{} for _ in range(lo, hi)]
+        self._fill(items, _ITEM_COLUMNS, lo, hi, self.item_extra, lo)
+        for i, d in enumerate(rows, start):
+            if self.has_items[i]:
+                d["items"] = items[self.item_start[i] - lo:self.item_start[i + 1] - lo]
+            rest = self.extra.get(i)
+            if rest:
+                d.update(rest)
+        return rows
+
+    def iter_dicts(self, chunk=4096):
+        for lo in range(0, len(self), chunk):
+            yield from self.to_dicts(lo, lo + chunk)
+
+    # --------------- Batch operations ---------------
+    def select(self, rows):
+        """New table with only ``rows`` (indexes, in the given order)."""
+        rows = list(rows)
+        out = EventTable()
+        out.strings, out._sidx = list(self.strings), dict(self._sidx)
+        for name, _k, kind in _TOP_COLUMNS + _SOURCE_COLUMNS:
+            col = getattr(self, name)
+            setattr(out, name, array(_TYPECODES[kind], [col[i] for i in rows]))
+        out.has_source = array("b", [self.has_source[i] for i in rows])
+        out.has_items = array("b", [self.has_items[i] for i in rows])
+        slots = []
+        for new, i in enumerate(rows):
+            lo, hi = self.item_start[i], self.item_start[i + 1]
+            for s in range(lo, hi):
+                rest = self.item_extra.get(s)
+                if rest:
+                    out.item_extra[len(slots)] = rest
+                slots.append(s)
+            out.item_start.append(len(slots))
+            if i in self.extra:
+                out.extra[new] = self.extra[i]
+            if i in self.source_extra:
+                out.source_extra[new] = self.source_extra[i]
+        for name, _k, kind in _ITEM_COLUMNS:
+            col = getattr(self, name)
+            setattr(out, name, array(_TYPECODES[kind], [col[s] for s in slots]))
+        return out
+
+    def get(self, row, key):
+        """Top-level field ``key`` of ``row`` (a column or a side-map value), or None."""
+        for name, k, kind in _TOP_COLUMNS:
+            if k == key:
+                v = getattr(self, name)[row]
+                if kind == "s" and v >= 0:
+                    return self.strings[v]
+                if kind == "q" and v != _NO_INT:
+                    return v
+                break
+        return (self.extra.get(row) or {}).get(key)
+
+    def set_extra(self, row, key, value):
+        """Set a top-level field that has no column (``count``, ``tLast``, ...)."""
+        if any(k == key for _n, k, _kind in _TOP_COLUMNS):
+            raise ValueError(f"{key} is a column")
+        self.extra.setdefault(row, {})[key] = value
+
+    def _remap_strings(self, col, fn):
+        """Apply fn once per distinct string in ``col``; returns the new column."""
+        remap = {i: self._intern(fn(self.strings[i])) for i in set(col) if i >= 0}
+        remap[_NO_STR] = _NO_STR
+        return array("i", map(remap.__getitem__, col))
+
+    def normalize(self):
+        """Column-wise equivalent of ``_normalize_inplace`` over every event."""
+        strip = lambda s: core.MOB_PREFIX_RE.sub("", s)
+        self.source_key = self._remap_strings(self.source_key, strip)
+        for row, rest in self.extra.items():
+            core._normalize_inplace(rest)
+            sk = rest.get("sourceKey")
+            if isinstance(sk, str):
+                # A top-level "kind": "mob" rewrote sourceKey; it belongs in the column.
+                self.source_key[row] = self._intern(rest.pop("sourceKey"))
+        for rest in self.source_extra.values():
+            core._normalize_inplace(rest)
+        for rest in self.item_extra.values():
+            core._normalize_inplace(rest)
+        mob = {i for i, s in enumerate(self.strings) if s.lower() == "mob"}
+        for row in compress(range(len(self)), (k in mob for k in self.src_kind)):
+            kid = self.src_id[row]
+            if kid == _NO_INT:
+                kid = (self.source_extra.get(row) or {}).get("id")
+                if kid is None:
+                    continue
+            try:
+                v = str(int(kid))
+            except Exception:
+                continue
+            rest = self.source_extra.setdefault(row, {})
+            rest["sourceKey"] = v; rest["key"] = v
+        self.extra = {row: rest for row, rest in self.extra.items() if rest}
+        return self
+
+    def where(self, kinds=None, zones=None, since=None, until=None):
+        """Row indexes matching all given filters (kinds/zones are collections of strings;
+        since/until compare the integer ``t`` column)."""
+        mask = [True] * len(self)
+        def _and(values):
+            for i, ok in enumerate(values):
+                if not ok:
+                    mask[i] = False
+        if kinds is not None:
+            ks = {self._sidx[k] for k in kinds if k in self._sidx}
+            _and(k in ks for k in self.kind)
+        if zones is not None:
+            zs = {self._sidx[z] for z in zones if z in self._sidx}
+            _and(z in zs for z in self.zone)
+        if since is not None:
+            _and(t != _NO_INT and t >= since for t in self.t)
+        if until is not None:
+            _and(t != _NO_INT and t < until for t in self.t)
+        return list(compress(range(len(self)), mask))
+
+    def present(self, key, ok):
+        """Per row: top-level ``key`` is there and ``ok(value)``; ``ok`` runs once per
+        distinct string for string columns."""
+        n = len(self)
+        if key == "source":
+            out = [bool(h) for h in self.has_source]
+        elif key == "items":
+            out = [bool(h) for h in self.has_items]
+        else:
+            out = [False] * n
+            for name, k, kind in _TOP_COLUMNS:
+                if k == key:
+                    col = getattr(self, name)
+                    if kind == "s":
+                        good = {i for i in set(col) if i >= 0 and ok(self.strings[i])}
+                        out = [i in good for i in col]
+                    else:
+                        out = [v != _NO_INT and ok(v) for v in col]
+                    break
+        for row, rest in self.extra.items():
+            if key in rest:
+                out[row] = ok(rest[key])
+        return out
+
+    def kind_counts(self):
+        return Counter({(self.strings[k] if k >= 0 else None): n for k, n in Counter(self.kind).items()})
+
+    def fingerprints(self):
+        """8-byte digest per row from the column values and side maps; equal events give equal
+        digests in any table (strings are hashed by value). Not the bytes ``event_fingerprint``
+        gives for the dict, so don't mix the two."""
+        n, ni = len(self), len(self.item_id)
+        cols = [self._column_values(name, kind, 0, n) for name, _k, kind in _TOP_COLUMNS + _SOURCE_COLUMNS]
+        items = list(zip(*(self._column_values(name, kind, 0, ni) for name, _k, kind in _ITEM_COLUMNS)))
+        dumps = json.JSONEncoder(sort_keys=True, separators=(",", ":"), default=str).encode
+        extra, source_extra, item_extra = self.extra, self.source_extra, self.item_extra
+        start = self.item_start
+        blake2b = hashlib.blake2b
+        out = []
+        for row, vals in enumerate(zip(*cols, self.has_source, self.has_items)):
+            lo, hi = start[row], start[row + 1]
+            iex = [[s - lo, item_extra[s]] for s in range(lo, hi) if s in item_extra] if item_extra else None
+            key = dumps([vals, items[lo:hi], extra.get(row), source_extra.get(row), iex])
+            out.append(blake2b(key.encode("utf-8"), digest_size=8).digest())
+        return out
+
+    def dedupe_keys(self, bucket=None):
+        """``core.dedupe_key`` of every row. Rows whose key fields all sit in columns are read
+        from the columns; the rest (odd types, item ids that are not ints) go through the dict."""
+        bucket = core.DEDUPE_BUCKET_SEC if bucket is None else bucket
+        n = len(self)
+        kinds = self._column_values("kind", "s", 0, n)
+        keys = self._column_values("source_key", "s", 0, n)
+        sessions = self._column_values("session", "s", 0, n)
+        ts = self._column_values("t", "q", 0, n)
+        ids = self._column_values("item_id", "q", 0, len(self.item_id))
+        qtys = self._column_values("item_qty", "q", 0, len(self.item_id))
+        start, item_extra = self.item_start, self.item_extra
+        out = []
+        for row in range(n):
+            rest = self.extra.get(row) or {}
+            lo, hi = start[row], start[row + 1]
+            if any(k in rest for k in _KEY_FIELDS) or any(
+                    s in item_extra and _ITEM_KEY_FIELDS & item_extra[s].keys() for s in range(lo, hi)):
+                out.append(core.dedupe_key(self.to_dicts(row, row + 1)[0], bucket))
+                continue
+            sk = keys[row] or (self.source_extra.get(row) or {}).get("key")
+            parts = sorted(f"{ids[s] or 0}x{qtys[s] or 1}" for s in range(lo, hi))
+            money = core.items_signature((), rest.get("money"))
+            if money:
+                parts.append(money)
+            t = ts[row]
+            tb = None if t is None else (t // bucket if bucket else t)
+            out.append((kinds[row] or None, sk, "|".join(parts), sessions[row], tb))
+        return out
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+# EpochHead tray icon and fast-start tray mode
+# - Tray: pystray/Pillow are imported on first use (both optional in the build)
+# - TrayMode (`--silent` / "Start minimized"): only the watcher, uploader and tray icon come up
+#   at boot; tkinter and the window are loaded the first time the user restores it
+# - Startup time and memory are logged and recorded (core.report_startup)
+
+import time
+import queue
+
+import epoch_uploader as core
+
+class Tray:
+    """Tray icon with Restore/Cancel upload/Close; callbacks run on the tray thread."""
+
+    def __init__(self, on_restore, on_exit, on_cancel=None):
+        self.on_restore = on_restore
+        self.on_exit = on_exit
+        self.on_cancel = on_cancel
+        self._icon = None
+        self._warned = False
+
+    @property
+    def running(self):
+        return self._icon is not None
+
+    @staticmethod
+    def _image():
+        from PIL import Image, ImageDraw
+        img = Image.new("RGBA", (64, 64), (35, 35, 35, 255))
+        d = ImageDraw.Draw(img)
+        d.ellipse((8, 8, 56, 56), fill=(43, 121, 245, 255))
+        d.text((19, 21), "EH", fill=(255, 255, 255, 255))
+        return img
+
+    def start(self):
+        """Show the icon; returns a message for the log when it can't, else None."""
+        if self._icon is not None:
+            return None
+        try:
+            import pystray
+            self._image()  # Pillow missing -> ImportError here, like pystray
+        except Exception:
+            if self._warned:
+                return None
+            self._warned = True
+            return "Tray support unavailable (missing pystray/Pillow in build environment)."
+        try:
+            items = [pystray.MenuItem("Restore", lambda: self.on_restore())]
+            if self.on_cancel is not None:
+                items.append(pystray.MenuItem("Cancel upload", lambda: self.on_cancel()))
+            items.append(pystray.MenuItem("Close", lambda: self.on_exit()))
+            menu = pystray.Menu(*items)
+            self._icon = pystray.Icon("epoch_uploader", self._image(), core.APP_NAME, menu)
+            self._icon.run_detached()
+        except Exception as e:
+            self._icon = None
+            return f"Tray icon failed to start: {e}"
+        return None
+
+    def stop(self):
+        if not self._icon:
+            return
+        try:
+            self._icon.stop()
+        except Exception:
+            pass
+        self._icon = None
+
+class TrayMode:
+    """Watcher + tray without Tk. The window is built on the first Restore and
+    takes over the running core, log ring and tray icon."""
+
+    def __init__(self, cfg=None, silent=False):
+        self.silent = silent
+        self.app = None
+        self._wake = queue.Queue()
+        self.log_ring = core.LogRing(core.LOG_MAX_LINES - 1)
+        self._latest = {}   # kind -> last core event, replayed into the window
+        self.core = core.UploaderCore(cfg, notify=self._notify)
+        self.tray = Tray(on_restore=self.show, on_exit=self.exit, on_cancel=self.cancel)
+
+    def _notify(self, kind, data):
+        if kind == "log":
+            self.log_ring.push(f"[{time.strftime('%H:%M:%S')}] {data.get('msg', '')}")
+        else:
+            self._latest[kind] = data
+
+    def show(self):
+        if self.app is not None:
+            self.app.queue.put(("show", {}))
+        else:
+            self._wake.put("show")
+
+    def cancel(self):
+        if self.app is not None:
+            self.app.queue.put(("cancel", {}))
+        else:
+            self.core.cancel_upload()   # thread-safe; no window to marshal onto yet
+
+    def exit(self):
+        if self.app is not None:
+            self.app.queue.put(("exit", {}))
+        else:
+            self._wake.put("exit")
+
+    def run(self):
+        self.core.start()
+        core._start_activation_listener(self.show)
+        msg = self.tray.start()
+        if msg:
+            self.core.log(msg)
+        self.core.log(f"Watching folder: {self.core.sv_dir}")
+        self.core.log_target_files()
+        core.report_startup("tray", record=self.core.metrics_enabled)
+
+        if self._wake.get() == "exit":
+            self.core.stop()
+            self.tray.stop()
+            return 0
+        t0 = time.perf_counter()
+        import epoch_uploader_gui
+        self.app = epoch_uploader_gui.App(silent=self.silent, core=self.core,
+                                          log_ring=self.log_ring, tray=self.tray)
+        for kind, data in self._latest.items():
+            self.app.queue.put((kind, data))
+        self.core.log(f"Window loaded in {core._fmt_secs(time.perf_counter() - t0)}.")
+        self.app.mainloop()
+        return 0
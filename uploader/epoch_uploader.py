@@ -1,21 +1,23 @@
 #!/usr/bin/env python3
 # EpochHead Uploader (Windows/Tk) — with controls & AV-friendly behavior
 # - Watches SavedVariables\epochhead.lua and uploads changes
+# - Headless core (no Tk import): `--headless [--sv-dir DIR] [--once]` for services/containers
+# - Tk front-end lives in epoch_uploader_gui.py and is a thin client of UploaderCore
 # - Top row controls: [Upload now] [Auto-upload] [Start with Windows] [Pause watching] [Open SV Folder] [Open Log]
 # - Status strip shows last upload + server stats; optional addon version warning banner
-# - Exponential backoff + min-interval between uploads
+# - Exponential backoff + min-interval between uploads; network I/O runs on one asyncio loop (epoch_net.py)
 # - Single instance (best-effort), no external deps
 
-import os, sys, json, time, threading, queue, re, socket, logging, logging.handlers, glob
-import tkinter as tk
-from tkinter import ttk, messagebox, filedialog
+import os, sys, json, time, threading, re, socket, logging, logging.handlers, glob, hashlib, contextlib, asyncio
+import atexit, collections, concurrent.futures, queue
+_BOOT_T0 = time.perf_counter()  # startup timings are measured from here (see report_startup)
 
-try:
-    import pystray
-    from PIL import Image, ImageDraw
-except Exception:
-    pystray = None
-    Image = None
+import epoch_encode
+import epoch_market
+import epoch_net
+import epoch_schema
+import epoch_store
+import epoch_wire
 
 # ------------------ FIXED SETTINGS ------------------
 APP_NAME           = "Epoch Uploader"
@@ -30,9 +32,25 @@ RETRY_ON_PARSE_SEC = 1.25
 WRITE_SETTLE_SEC   = 2.0   # wait for file to stop changing before uploading
 UPLOAD_ENDPOINT    = "/upload"
 LOG_MAX_LINES      = 500
-MIN_SUCCESS_SPACING= 5.0  # seconds between successful uploads
+LOG_FLUSH_MS       = 250   # UI log refresh interval (batched inserts)
+MIN_SUCCESS_SPACING= 5.0  # seconds between automatic uploads (token bucket refill)
+ACKED_UPLOADS_MAX  = 200  # idempotency keys of acknowledged uploads kept in config.json
+DEDUPE_BUCKET_SEC  = 60   # coarse timestamp used by the server's duplicate check
+COLLAPSE_KINDS     = ("loot",)  # gather_attempt carries a unique attemptKey, nothing to collapse
+DEDUPE_KINDS       = ("kill", "loot")  # source-keyed kinds the server keeps once per dedupe_key
 PRIMARY_SV_FILE    = "epochhead.lua"
 TARGET_SV_FILES    = ("aux-addon.lua", "epochhead.lua", "Auctionator.lua", "EpochCensus.lua")
+MARKET_ADDON_FILES = {   # source -> candidate file names (lower case), first found wins
+    "aux": ("aux-addon.lua", "aux.lua", "auxhistory.lua", "aux_history.lua"),
+    "auctionator": ("auctionator.lua", "auctionatordata.lua", "auctionatorshoppinglists.lua"),
+}
+CENSUS_FILE        = "epochcensus.lua"
+# Estimated peak memory per byte of file, measured on fixtures (epoch_bench.py): epochhead.lua
+# parsed + normalized + encoded, aux/Auctionator parsed into price records, any file sent as raw_lua.
+MEM_FACTOR_EVENTS  = 40
+MEM_FACTOR_MARKET  = 45
+MEM_FACTOR_RAW     = 4
+STREAM_BATCH       = 1000  # events per EventTable (normalize, validate, dedupe) in streaming mode
 
 # Single-instance (best effort) + activation ping
 MUTEX_NAME   = r"Global\EpochUploaderMutex_v2"
@@ -42,6 +60,9 @@ ACTIVATE_PORT = 52931
 APPDATA_DIR = os.path.join(os.environ.get("APPDATA", os.path.expanduser("~")), "EpochUploader")
 CONFIG_PATH = os.path.join(APPDATA_DIR, "config.json")
 LOG_PATH    = os.path.join(APPDATA_DIR, "uploader.log")
+STORE_PATH  = os.path.join(APPDATA_DIR, "events.sqlite3")
+METRICS_PATH = os.path.join(APPDATA_DIR, "metrics.jsonl")
+METRICS_MAX_BYTES = 2 * 1024 * 1024
 
 # Defaults for toggles
 DEFAULT_AUTO_UPLOAD      = True
@@ -50,24 +71,243 @@ DEFAULT_PAUSE_WATCHING   = False
 DEFAULT_START_MINIMIZED  = False
 DEFAULT_START_SILENT     = False
 DEFAULT_CLEANUP_KEEP_FILES = 30
+DEFAULT_RECORD_EVENTS    = True
+DEFAULT_METRICS          = True
+DEFAULT_METRICS_TRACEMALLOC = False
+DEFAULT_DEDUPE           = True
+DEFAULT_VALIDATE         = True
+DEFAULT_MARKET_RECORDS   = True     # parse aux/Auctionator into price records when the server accepts them
+DEFAULT_WIRE_FORMAT      = "auto"   # auto (compact once the server advertises it) | json | columnar
+DEFAULT_UPLOAD_MODE      = "auto"   # auto (stream when over the memory budget) | memory | stream
+DEFAULT_MEMORY_BUDGET_MB = 512      # estimated peak above which auto mode streams; 0 = no limit
+DEFAULT_UPLOAD_RATE_KBPS = 0        # send cap for automatic uploads in KB/s; 0 = no fixed cap
+DEFAULT_UPLOAD_ADAPTIVE  = True     # automatic uploads slow down when the send delay rises
+DEFAULT_MANUAL_FULL_SPEED = True    # "Upload now" ignores the cap and adaptive pacing
+DEFAULT_ENCODE_WORKERS   = 0        # processes for JSON-encoding large uploads; 0 = CPU count (max 8), 1 = off
 
 # --------------- Logging (rotating) ---------------
 def _ensure_appdata():
     try: os.makedirs(APPDATA_DIR, exist_ok=True)
     except Exception: pass
 
+_log_listener = None
+
 def _init_file_log():
+    """Root logger -> QueueHandler; a QueueListener thread does the (rotating) file writes,
+    so logging from the Tk or upload threads never waits on disk."""
+    global _log_listener
     _ensure_appdata()
     root = logging.getLogger()
     root.handlers.clear()
     root.setLevel(logging.INFO)
+    if _log_listener is not None:
+        _log_listener.stop()
     h = logging.handlers.RotatingFileHandler(LOG_PATH, maxBytes=512*1024, backupCount=3, encoding="utf-8")
     fmt = logging.Formatter("%(asctime)s %(levelname)s %(message)s")
     h.setFormatter(fmt)
-    root.addHandler(h)
+    q = queue.SimpleQueue()
+    root.addHandler(logging.handlers.QueueHandler(q))
+    _log_listener = logging.handlers.QueueListener(q, h, respect_handler_level=True)
+    _log_listener.start()
+    atexit.register(_stop_file_log)
     root.info("%s %s starting", APP_NAME, APP_VERSION)
 
-_init_file_log()
+def _stop_file_log():
+    """Flush queued records to the file and stop the listener thread."""
+    global _log_listener
+    if _log_listener is not None:
+        _log_listener.stop()
+        _log_listener = None
+
+class LogRing:
+    """Fixed-size buffer of UI log lines, filled from any thread and drained in batches.
+
+    When more than ``maxlen`` lines arrive between two drains the oldest are
+    dropped and counted, so a burst of logging costs the UI one bounded update.
+    """
+
+    def __init__(self, maxlen=LOG_MAX_LINES):
+        self._lines = collections.deque(maxlen=maxlen)
+        self._lock = threading.Lock()
+        self._dropped = 0
+
+    def push(self, line):
+        with self._lock:
+            if len(self._lines) == self._lines.maxlen:
+                self._dropped += 1
+            self._lines.append(line)
+
+    def drain(self):
+        """``(lines, dropped)`` since the last drain."""
+        with self._lock:
+            lines, dropped = list(self._lines), self._dropped
+            self._lines.clear(); self._dropped = 0
+        return lines, dropped
+
+# --------------- Upload metrics ---------------
+def _peak_rss_bytes():
+    """Process peak resident/working-set size, or None if the platform won't say."""
+    try:
+        if sys.platform == "win32":
+            import ctypes
+            from ctypes import wintypes
+            class PMC(ctypes.Structure):
+                _fields_ = [("cb", wintypes.DWORD), ("PageFaultCount", wintypes.DWORD),
+                            ("PeakWorkingSetSize", ctypes.c_size_t), ("WorkingSetSize", ctypes.c_size_t),
+                            ("QuotaPeakPagedPoolUsage", ctypes.c_size_t), ("QuotaPagedPoolUsage", ctypes.c_size_t),
+                            ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t), ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+                            ("PagefileUsage", ctypes.c_size_t), ("PeakPagefileUsage", ctypes.c_size_t)]
+            pmc = PMC(); pmc.cb = ctypes.sizeof(PMC)
+            if ctypes.windll.psapi.GetProcessMemoryInfo(ctypes.windll.kernel32.GetCurrentProcess(),
+                                                        ctypes.byref(pmc), pmc.cb):
+                return int(pmc.PeakWorkingSetSize)
+            return None
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return int(peak if sys.platform == "darwin" else peak * 1024)
+    except Exception:
+        return None
+
+def _fmt_bytes(n):
+    n = float(n or 0)
+    for unit in ("B", "KB", "MB", "GB"):
+        if n < 1024 or unit == "GB":
+            return f"{n:.0f} {unit}" if unit == "B" else f"{n:.1f} {unit}"
+        n /= 1024
+
+def _fmt_secs(s):
+    return f"{s * 1000:.0f}ms" if s < 1 else f"{s:.1f}s"
+
+class UploadMetrics:
+    """Stage timings, byte/event counts and peak memory for one upload cycle.
+
+    Timings are plain ``perf_counter`` deltas and the process peak comes from
+    the OS, so this stays on in production.  ``trace_memory`` additionally
+    runs tracemalloc for the cycle (Python-heap peak, noticeably slower).
+    """
+
+    STAGES = ("read", "market", "parse", "table", "normalize", "validate", "dedupe", "encode", "stream", "send",
+              "server")
+
+    def __init__(self, trace_memory=False, on_stage=None, **info):
+        self.info = dict(info)
+        self.on_stage = on_stage  # called with the stage name after each stage (epoch_profile)
+        self.started = time.time()
+        self._t0 = time.perf_counter()
+        self.stages = {}
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.events = 0
+        self.trace_memory = bool(trace_memory)
+        self._tm_started = False
+        if self.trace_memory:
+            import tracemalloc
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self._tm_started = True
+            if hasattr(tracemalloc, "reset_peak"):  # 3.9+
+                tracemalloc.reset_peak()
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        t = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = self.stages.get(name, 0.0) + (time.perf_counter() - t)
+            if self.on_stage is not None:
+                self.on_stage(name)
+
+    def finish(self, **extra):
+        """Close the cycle and return the record that goes to the metrics file."""
+        rec = {
+            "ts": int(self.started),
+            "total_s": round(time.perf_counter() - self._t0, 4),
+            "stages": {k: round(v, 4) for k, v in self.stages.items()},
+            "bytes_in": self.bytes_in,
+            "bytes_out": self.bytes_out,
+            "events": self.events,
+            "peak_rss": _peak_rss_bytes(),
+        }
+        if self.trace_memory:
+            import tracemalloc
+            rec["peak_traced"] = tracemalloc.get_traced_memory()[1]
+            if self._tm_started:
+                tracemalloc.stop()
+        rec.update(self.info)
+        rec.update(extra)
+        self.record = rec
+        return rec
+
+    def summary(self):
+        """Compact one-liner for the status strip, e.g. ``3.2s (parse 2.1s) · 812 KB↑ · 95.0 MB peak``."""
+        rec = getattr(self, "record", None) or self.finish()
+        stages = rec.get("stages") or {}
+        bits = [_fmt_secs(rec["total_s"])]
+        if stages:
+            slow = max(stages, key=stages.get)
+            bits[0] += f" ({slow} {_fmt_secs(stages[slow])})"
+        if rec.get("bytes_out"):
+            bits.append(f"{_fmt_bytes(rec['bytes_out'])}↑")
+        peak = rec.get("peak_traced") or rec.get("peak_rss")
+        if peak:
+            bits.append(f"{_fmt_bytes(peak)} peak")
+        return " · ".join(bits)
+
+def _process_age_s():
+    """Seconds since this process was created (covers interpreter/bootloader start), or None."""
+    try:
+        if sys.platform == "win32":
+            import ctypes
+            from ctypes import wintypes
+            ft = [wintypes.FILETIME() for _ in range(4)]
+            if not ctypes.windll.kernel32.GetProcessTimes(ctypes.windll.kernel32.GetCurrentProcess(),
+                                                          *(ctypes.byref(f) for f in ft)):
+                return None
+            created = ((ft[0].dwHighDateTime << 32) | ft[0].dwLowDateTime) / 1e7 - 11644473600.0
+            return max(0.0, time.time() - created)
+        with open("/proc/self/stat") as f:
+            start_ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+        return max(0.0, uptime - start_ticks / os.sysconf("SC_CLK_TCK"))
+    except Exception:
+        return None
+
+def report_startup(mode, record=True):
+    """Log how long startup took and the memory it used; with ``record`` also append it to the
+    metrics file (``"event": "startup"``) so regressions show up next to upload timings."""
+    rec = {
+        "ts": int(time.time()),
+        "event": "startup",
+        "mode": mode,
+        "version": APP_VERSION,
+        "since_import_s": round(time.perf_counter() - _BOOT_T0, 4),
+        "since_process_s": None,
+        "peak_rss": _peak_rss_bytes(),
+        "tk_loaded": "tkinter" in sys.modules,
+    }
+    age = _process_age_s()
+    if age is not None:
+        rec["since_process_s"] = round(age, 4)
+    logging.info("startup (%s): ready %s after process start, %s after import; peak %s; tk %s",
+                 mode, _fmt_secs(age) if age is not None else "?", _fmt_secs(rec["since_import_s"]),
+                 _fmt_bytes(rec["peak_rss"]) if rec["peak_rss"] else "?",
+                 "loaded" if rec["tk_loaded"] else "not loaded")
+    if record:
+        write_metrics(rec)
+    return rec
+
+def write_metrics(record, path=None):
+    path = path or METRICS_PATH
+    _ensure_appdata()
+    try:
+        if os.path.exists(path) and os.path.getsize(path) > METRICS_MAX_BYTES:
+            os.replace(path, path + ".1")
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, separators=(",", ":")) + "\n")
+    except Exception as e:
+        logging.warning("metrics write failed: %s", e)
 
 # --------------- Single-instance helpers ---------------
 def _windows_mutex_singleton():
@@ -310,6 +550,10 @@ def parse_savedvars(lua_text: str, preferred=VAR_NAME):
     val=Parser(toks).parse_value()
     return val if isinstance(val, dict) else {"_array": val}
 
+def parse_lua_var(lua_text: str, varname: str):
+    """Parse the table assigned to ``varname``; unlike parse_savedvars, no fallback to other variables."""
+    return Parser(_tokenize(_strip_lua_comments(_find_var_table(lua_text, varname)))).parse_value()
+
 def _normalize_inplace(obj):
     if isinstance(obj, dict):
         kind=obj.get("kind"); kid=obj.get("id"); is_mob=isinstance(kind,str) and kind.lower()=="mob"
@@ -326,127 +570,625 @@ def _normalize_inplace(obj):
     elif isinstance(obj, list):
         for v in obj: _normalize_inplace(v)
 
+def event_fingerprint(ev) -> bytes:
+    """8-byte digest of an event's canonical JSON; equal events give equal digests."""
+    return hashlib.blake2b(
+        json.dumps(ev, sort_keys=True, separators=(",", ":"), ensure_ascii=False).encode("utf-8"),
+        digest_size=8,
+    ).digest()
+
+def items_signature(items, money=None) -> str:
+    """Same string as ItemsSignature() in events.lua: sorted "<id>x<qty>" joined by "|", then "c<copper>"."""
+    parts = []
+    for it in items or ():
+        if not isinstance(it, dict):
+            continue
+        try: iid = int(it.get("id") or 0)
+        except Exception: iid = 0
+        try: qty = int(it.get("qty") or it.get("count") or 1)
+        except Exception: qty = 1
+        parts.append(f"{iid}x{qty}")
+    parts.sort()
+    copper = money.get("copper") if isinstance(money, dict) else money
+    try:
+        if copper and int(copper) > 0:
+            parts.append(f"c{int(copper)}")
+    except Exception:
+        pass
+    return "|".join(parts)
+
+def dedupe_key(ev, bucket=DEDUPE_BUCKET_SEC):
+    """(kind, source key, items signature, session, coarse time), the fields the server dedupes on."""
+    src = ev.get("source") if isinstance(ev.get("source"), dict) else {}
+    t = ev.get("t")
+    try: tb = int(t) // bucket if bucket else int(t)
+    except Exception: tb = None
+    return (ev.get("type") or ev.get("kind"), ev.get("sourceKey") or src.get("key"),
+            items_signature(ev.get("items"), ev.get("money")), ev.get("session"), tb)
+
+def _dedupe_plan(fps, kinds, keys, collapse_kinds=(), dedupe_kinds=DEDUPE_KINDS):
+    """Which events to keep, from their fingerprints, kinds and dedupe keys (sequences).
+
+    Returns ``(kept, dropped, merged)``: row indexes to keep, copies to drop (exact, or a
+    repeated key of ``dedupe_kinds`` with a source key) and ``{kept row: [rows collapsed into it]}``.
+    """
+    kept, dropped, merged = [], [], {}
+    exact, groups = set(), {}
+    for i, fp in enumerate(fps):
+        if fp in exact:
+            dropped.append(i)
+            continue
+        exact.add(fp)
+        collapse = kinds[i] in collapse_kinds
+        if collapse or (kinds[i] in dedupe_kinds and keys[i] is not None and keys[i][1] is not None):
+            first = groups.get(keys[i])
+            if first is not None:
+                if collapse:
+                    merged.setdefault(first, []).append(i)
+                else:
+                    dropped.append(i)
+                continue
+            groups[keys[i]] = i
+        kept.append(i)
+    return kept, dropped, merged
+
+def _merge_count(first, others):
+    """``count``/``tLast`` for an event that absorbs ``others`` (each a ``(count, t)`` pair)."""
+    count, t_last = first
+    for c, t in others:
+        count += c
+        try:
+            if t is not None and int(t) > int(t_last or 0):
+                t_last = int(t)
+        except Exception:
+            pass
+    return count, t_last
+
+def _dedupe_stats(removed, collapsed):
+    saved = sum(len(json.dumps(ev)) + 2 for ev in removed) - collapsed * len(', "count": 2')
+    return {"dropped": len(removed) - collapsed, "collapsed": collapsed, "bytes_saved": max(0, saved)}
+
+def dedupe_events(events, bucket=DEDUPE_BUCKET_SEC, collapse_kinds=(), dedupe_kinds=DEDUPE_KINDS):
+    """Drop events the server would count as duplicates before they are encoded.
+
+    Exact copies (e.g. re-logged after a /reload) are dropped. Events of
+    ``collapse_kinds`` (pass COLLAPSE_KINDS once the server accepts
+    WIRE_COLLAPSE) that share a ``dedupe_key`` but differ elsewhere (guid,
+    position, time within the bucket) collapse into the first one, which gets
+    ``count`` and ``tLast``. Other events of ``dedupe_kinds`` that repeat a
+    ``dedupe_key`` with a source key are dropped: the server keeps only the
+    first of them.
+
+    Returns ``(kept, stats)``; ``stats`` has ``dropped``, ``collapsed`` and
+    ``bytes_saved`` (approximate JSON bytes no longer sent).
+    """
+    fps = [event_fingerprint(ev) if isinstance(ev, dict) else object() for ev in events]  # non-dicts stay
+    kinds = [(ev.get("type") or ev.get("kind")) if isinstance(ev, dict) else None for ev in events]
+    keys = [dedupe_key(ev, bucket) if k in collapse_kinds or k in dedupe_kinds else None
+            for ev, k in zip(events, kinds)]
+    kept, dropped, merged = _dedupe_plan(fps, kinds, keys, collapse_kinds, dedupe_kinds)
+    for row, others in merged.items():
+        first = events[row]
+        count, t_last = _merge_count((int(first.get("count") or 1), first.get("tLast") or first.get("t")),
+                                     ((int(events[i].get("count") or 1), events[i].get("t")) for i in others))
+        first["count"] = count
+        if t_last != (first.get("tLast") or first.get("t")):
+            first["tLast"] = t_last
+    removed = [events[i] for i in dropped] + [events[i] for rows in merged.values() for i in rows]
+    return [events[i] for i in kept], _dedupe_stats(removed, len(removed) - len(dropped))
+
+def dedupe_table(table, bucket=DEDUPE_BUCKET_SEC, collapse_kinds=(), dedupe_kinds=DEDUPE_KINDS):
+    """``dedupe_events`` for an ``EventTable``: fingerprints and dedupe keys come from the
+    columns. Returns ``(kept_table, stats)``."""
+    if collapse_kinds or dedupe_kinds:
+        keys = table.dedupe_keys(bucket)
+        kinds = [key[0] for key in keys]
+    else:
+        keys = kinds = [None] * len(table)
+    kept, dropped, merged = _dedupe_plan(table.fingerprints(), kinds, keys, collapse_kinds, dedupe_kinds)
+    if not dropped and not merged:
+        return table, _dedupe_stats((), 0)
+    for row, others in merged.items():
+        before = table.get(row, "tLast") or table.get(row, "t")
+        count, t_last = _merge_count((int(table.get(row, "count") or 1), before),
+                                     ((int(table.get(i, "count") or 1), table.get(i, "t")) for i in others))
+        table.set_extra(row, "count", count)
+        if t_last != before:
+            table.set_extra(row, "tLast", t_last)
+    removed = table.select(dropped + [i for rows in merged.values() for i in rows]).to_dicts()
+    return table.select(kept), _dedupe_stats(removed, len(removed) - len(dropped))
+
 # --------------- Networking ---------------
-def post_upload(server: str, token: str, payload: dict,
-                endpoint: str = UPLOAD_ENDPOINT,
-                timeout=(30, 300), chunk_size=64 * 1024):
+def encode_upload_body(token: str, payload: dict) -> bytes:
+    return json.dumps({"token": token, "payload": payload}).encode("utf-8")
+
+# Upload formats this client can send, and those each server has advertised via
+# WIRE_ACCEPT_HEADER (see epoch_wire.py, epoch_market.py).
+WIRE_OFFERS = (epoch_wire.WIRE_COLUMNAR, epoch_market.MARKET_FORMAT, epoch_wire.WIRE_COLLAPSE)
+_SERVER_WIRE = {}
+
+def server_accepts_wire(server: str, fmt: str) -> bool:
+    return fmt in _SERVER_WIRE.get(server.rstrip("/"), ())
+
+def forget_server_wire(server: str):
+    _SERVER_WIRE.pop(server.rstrip("/"), None)
+
+def _note_server_wire(server, resp):
+    try:
+        v = resp.getheader(epoch_wire.WIRE_ACCEPT_HEADER)
+    except Exception:
+        v = None
+    if v is not None:
+        _SERVER_WIRE[server.rstrip("/")] = tuple(x.strip() for x in v.split(",") if x.strip())
+
+# Retry policy: only connection errors (0), 429 and 503 are worth another attempt.
+RETRY_STATUS    = (0, 429, 503)
+MAX_RETRY_AFTER = 300.0
+JOB_POLL_MAX_SEC = 8.0      # longest wait between job status polls
+JOB_WAIT_MAX_SEC = 900.0    # give up on a job that has not finished by then
+
+class _Reply(tuple):
+    """``(status, body)`` plus the server's Retry-After in seconds (or None)."""
+
+    def __new__(cls, status, body, retry_after=None):
+        self = super().__new__(cls, (status, body))
+        self.retry_after = retry_after
+        return self
+
+def _upload_headers(content_type=None):
+    return {
+        "Content-Type": content_type or epoch_wire.CONTENT_TYPE_JSON,
+        "User-Agent": f"EpochUploader/{APP_VERSION} (Windows)",
+        epoch_wire.WIRE_OFFER_HEADER: ", ".join(WIRE_OFFERS),
+    }
+
+async def post_upload_async(server: str, token: str, payload: dict,
+                            endpoint: str = UPLOAD_ENDPOINT,
+                            timeout=(30, 300), chunk_size=64 * 1024, body: bytes = None,
+                            content_type: str = None, idempotency_key: str = None, shaper=None):
     """POST data to the upload endpoint with generous timeouts.
 
     The timeout parameter accepts a tuple of ``(connect_timeout, read_timeout)``
     so the client can wait longer for the server to finish processing the
-    request.  The payload is streamed in chunks to avoid buffering very large
-    uploads in memory.
+    request.  The body is written in chunks with flow control.  Pass a
+    pre-encoded ``body`` (see ``encode_upload_body``; a binary file such as
+    ``epoch_stream.BodySpool.file`` also works) to skip encoding here;
+    ``payload`` is then ignored.  ``content_type`` labels a body in the compact
+    wire format (``epoch_wire.encode_body``).  Every request carries a
+    ``Content-Digest`` of the body; ``idempotency_key`` (see ``upload_key``)
+    lets the server recognise a resend of something it already accepted.
+    ``shaper`` (a BandwidthShaper) paces and measures the body.
 
     Returns a ``(status_code, body)`` tuple.  On network errors, ``status_code``
-    will be ``0`` and ``body`` will contain the exception string.
+    will be ``0`` and ``body`` will contain the error text.
     """
-    import json as _json
-    import socket
-    import http.client
-    import urllib.parse
-
     connect_timeout, read_timeout = (
         timeout if isinstance(timeout, tuple) else (timeout, timeout)
     )
+    if body is None:
+        body = encode_upload_body(token, payload)
+    headers = _upload_headers(content_type)
+    if epoch_net.is_file_body(body):
+        # Hashing a spooled body reads the whole file; keep that off the loop thread.
+        digest = await asyncio.get_running_loop().run_in_executor(None, epoch_net.body_digest, body)
+    else:
+        digest = epoch_net.body_digest(body)
+    headers[epoch_net.DIGEST_HEADER] = digest
+    if idempotency_key:
+        headers[epoch_net.IDEMPOTENCY_HEADER] = idempotency_key
+    try:
+        resp = await epoch_net.request("POST", server.rstrip("/") + endpoint, body, headers,
+                                       connect_timeout=connect_timeout, read_timeout=read_timeout,
+                                       chunk_size=chunk_size, shaper=shaper)
+    except (asyncio.TimeoutError, OSError, ValueError, asyncio.IncompleteReadError) as e:
+        return _Reply(0, epoch_net.error_text(e))
+    _note_server_wire(server, resp)
+    return _Reply(resp.status, resp.text(), epoch_net.retry_after(resp))
+
+async def get_upload_status_async(server: str, job_id: str, timeout=30):
+    try:
+        resp = await epoch_net.request("GET", server.rstrip("/") + f"/upload/status/{job_id}",
+                                       headers={"User-Agent": f"EpochUploader/{APP_VERSION} (Windows)"},
+                                       connect_timeout=timeout, read_timeout=timeout)
+    except (asyncio.TimeoutError, OSError, ValueError, asyncio.IncompleteReadError) as e:
+        return _Reply(0, epoch_net.error_text(e))
+    return _Reply(resp.status, resp.text(), epoch_net.retry_after(resp))
+
+async def _net_call_with_backoff(call, attempts=6):
+    """Run ``call()`` (a coroutine factory), retrying only what can succeed later:
+    connection errors (status 0), 429 and 503. Waits follow the server's
+    Retry-After when given, otherwise exponential backoff. Every other answer,
+    including 4xx, is returned at once."""
+    delay = 0.5
+    for i in range(attempts):
+        res = await call()
+        if int(res[0] or 0) not in RETRY_STATUS or i == attempts - 1:
+            return res
+        wait = getattr(res, "retry_after", None)
+        await asyncio.sleep(delay if wait is None else min(wait, MAX_RETRY_AFTER))
+        delay = min(delay * 2, 8.0)
 
-    url = server.rstrip("/") + endpoint
-    parsed = urllib.parse.urlsplit(url)
-    body = _json.dumps({"token": token, "payload": payload}).encode("utf-8")
+async def wait_for_job_async(server: str, job_id: str, interval=1.0, should_stop=None,
+                             max_wait=JOB_WAIT_MAX_SEC, max_interval=JOB_POLL_MAX_SEC):
+    """Poll ``/upload/status/<job_id>`` until the job reports ``finished``.
 
-    headers = {
-        "Content-Type": "application/json",
-        "User-Agent": f"EpochUploader/{APP_VERSION} (Windows)",
-    }
-
-    conn_cls = http.client.HTTPSConnection if parsed.scheme == "https" else http.client.HTTPConnection
-    port = parsed.port or (443 if parsed.scheme == "https" else 80)
-    conn = conn_cls(parsed.hostname, port, timeout=connect_timeout)
-    try:
-        conn.connect()
-        path = parsed.path or "/"
-        if parsed.query:
-            path += "?" + parsed.query
-        conn.putrequest("POST", path, skip_accept_encoding=True)
-        for k, v in headers.items():
-            conn.putheader(k, v)
-        conn.putheader("Content-Length", str(len(body)))
-        conn.endheaders()
-        for i in range(0, len(body), chunk_size):
-            conn.send(body[i : i + chunk_size])
-        conn.sock.settimeout(read_timeout)
-        resp = conn.getresponse()
-        data = resp.read().decode("utf-8", "ignore")
-        return resp.status, data
-    except (socket.timeout, ConnectionResetError, OSError) as e:
-        return 0, str(e)
-    finally:
+    The wait between polls grows by half each time up to ``max_interval``.
+    Returns the final ``(status_code, body)``; ``(0, "stopped")`` if
+    ``should_stop()`` turns true first and ``(0, "timed out ...")`` once
+    ``max_wait`` seconds have passed without an answer.
+    """
+    deadline = time.monotonic() + max_wait
+    while True:
+        left = deadline - time.monotonic()
+        if left <= 0:
+            return 0, f"timed out waiting for job {job_id}"
+        wait = min(interval, left)
+        while wait > 0:                      # short naps so should_stop is seen quickly
+            nap = min(wait, 0.25) if should_stop is not None else wait
+            await asyncio.sleep(nap)
+            wait -= nap
+            if should_stop is not None and should_stop():
+                return 0, "stopped"
+        interval = min(interval * 1.5, max_interval)
         try:
-            conn.close()
-        except Exception:
-            pass
+            scode, sbody = await _net_call_with_backoff(
+                lambda: get_upload_status_async(server, job_id)
+            )
+        except Exception as e:
+            scode, sbody = 0, str(e)
+        if 400 <= int(scode or 0) < 500 and int(scode) != 429:
+            return scode, sbody   # unknown job / bad request: polling again will not help
+        if sbody:
+            try:
+                if json.loads(sbody).get("finished"):
+                    return scode, sbody
+            except Exception:
+                pass
+
+async def send_upload(server: str, token: str, body: bytes, content_type=None, idempotency_key=None,
+                      shaper=None):
+    """POST with retries; the whole exchange runs on the network loop."""
+    return await _net_call_with_backoff(
+        lambda: post_upload_async(server, token, None, body=body, content_type=content_type,
+                                  idempotency_key=idempotency_key, shaper=shaper))
+
+def _key_info(info):
+    """An addon file's section as it enters the key: no mtime, raw_lua text as raw_sha256."""
+    out = {k: v for k, v in info.items() if k not in ("mtime", "raw_lua")}
+    if isinstance(info.get("raw_lua"), str):
+        out["raw_sha256"] = hashlib.sha256(info["raw_lua"].encode("utf-8")).hexdigest()
+    return out
+
+def upload_key(source_digest: bytes, sections: dict) -> str:
+    """Content-derived idempotency key: the primary file's digest plus the addon sections.
+
+    File mtimes are left out, so unchanged data read again gives the same key. A raw
+    file enters as the sha256 of its text (``raw_sha256``), which the streaming path
+    supplies without holding the text, so both paths key the same content alike.
+    """
+    h = hashlib.sha256(source_digest)
+    for name in sorted(sections):
+        sec = sections[name]
+        if isinstance(sec, dict):
+            if name == "census_addon":
+                sec = _key_info(sec)
+            else:
+                sec = {k: (_key_info(v) if isinstance(v, dict) else v) for k, v in sec.items() if k != "mtime"}
+        h.update(name.encode("utf-8"))
+        h.update(json.dumps(sec, sort_keys=True, separators=(",", ":"), default=str).encode("utf-8"))
+    return h.hexdigest()[:32]
+
+# Blocking wrappers for threads outside the network loop (tools, scripts).
+def post_upload(server: str, token: str, payload: dict, **kw):
+    return epoch_net.run(post_upload_async(server, token, payload, **kw))
 
 def get_upload_status(server: str, job_id: str, timeout=30):
-    import socket, http.client, urllib.parse
+    return epoch_net.run(get_upload_status_async(server, job_id, timeout))
+
+# --------------- Upload scheduling ---------------
+class TokenBucket:
+    """``rate`` tokens per second, holding at most ``capacity``. Thread-safe."""
+
+    def __init__(self, rate, capacity=1.0, clock=time.monotonic):
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self._clock = clock
+        self._tokens = self.capacity
+        self._t = clock()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = self._clock()
+        self._tokens = min(self.capacity, self._tokens + (now - self._t) * self.rate)
+        self._t = now
+
+    def delay(self, n=1.0):
+        """Seconds until ``n`` tokens are available (0 when they are)."""
+        with self._lock:
+            self._refill()
+            return 0.0 if self._tokens >= n else (n - self._tokens) / self.rate
+
+    def take(self, n=1.0):
+        """Take ``n`` tokens; the balance may go negative, which delays later callers."""
+        with self._lock:
+            self._refill()
+            self._tokens -= n
+
+    def set_rate(self, rate):
+        with self._lock:
+            self._refill()
+            self.rate = float(rate)
+
+class BandwidthShaper:
+    """Paces a request body through a TokenBucket of bytes and measures the send;
+    passed to ``epoch_net.request`` as ``shaper``.
+
+    ``rate`` caps bytes/s (None: no cap, only measure). ``adaptive`` is a
+    delay-based heuristic: the time each chunk takes to drain into the socket
+    stands in for the send RTT. When it and its average climb well above the
+    lowest seen (a queue is building on the uplink), the rate drops to 70% of
+    the throughput measured since the last cut; while it stays low the rate grows back by 5% per chunk
+    up to ``rate``, or without a cap up to the highest throughput measured at a cut (the link rate).
+    """
 
-    url = server.rstrip("/") + f"/upload/status/{job_id}"
-    parsed = urllib.parse.urlsplit(url)
+    MIN_RATE = 16 * 1024
+    RTT_SLACK = 0.025        # seconds over twice the base delay before backing off
+    SNDBUF = 128 * 1024      # small socket buffer so queueing shows up as drain time
+
+    def __init__(self, rate=None, adaptive=False, clock=time.monotonic):
+        self.cap = float(rate) if rate else None
+        self.adaptive = bool(adaptive)
+        self._clock = clock
+        self.bucket = TokenBucket(self.cap, self._burst(self.cap), clock) if self.cap else None
+        self.bytes = 0
+        self.queue_delay = 0.0   # time spent waiting for tokens
+        self.base_rtt = self.srtt = None
+        self.max_rtt = 0.0
+        self.backoffs = 0
+        self.link_rate = None    # highest throughput measured at a cut: the ceiling when there is no cap
+        self._t0 = self._t_end = self._last_cut = None
+        self._win = (0, None)    # (bytes, start) of the throughput window, restarted at each cut
+
+    @staticmethod
+    def _burst(rate):
+        return max(4096.0, rate / 8)
+
+    @property
+    def rate(self):
+        return self.bucket.rate if self.bucket else None
+
+    @property
+    def shaping(self):
+        return self.cap is not None or self.adaptive
+
+    def chunk_size(self, default):
+        rate = self.rate
+        return int(max(4096, min(default, rate / 8))) if rate else default
+
+    async def before_send(self, n):
+        if self._t0 is None:
+            self._t0 = self._clock()
+            self._win = (0, self._t0)
+        if self.bucket is not None:
+            wait = self.bucket.delay(n)
+            if wait > 0:
+                await asyncio.sleep(wait)
+                self.queue_delay += wait
+            self.bucket.take(n)
+
+    def after_send(self, n, secs):
+        now = self._t_end = self._clock()
+        self.bytes += n
+        self.srtt = secs if self.srtt is None else 0.8 * self.srtt + 0.2 * secs
+        self.base_rtt = secs if self.base_rtt is None else min(self.base_rtt, secs)
+        self.max_rtt = max(self.max_rtt, secs)
+        self._win = (self._win[0] + n, self._win[1])
+        if not self.adaptive:
+            return
+        limit = 2 * self.base_rtt + self.RTT_SLACK
+        if self.srtt > limit and secs > limit:
+            if self._last_cut is None or now - self._last_cut >= max(self.srtt, 0.2):
+                measured = self._win[0] / max(now - self._win[1], 1e-3)
+                self.link_rate = max(self.link_rate or 0.0, measured, self.MIN_RATE)
+                new = max(self.MIN_RATE, min(self.rate or measured, measured) * 0.7)
+                if self.bucket is None:
+                    self.bucket = TokenBucket(new, self._burst(new), self._clock)
+                else:
+                    self.bucket.set_rate(new)
+                self.backoffs += 1
+                self._last_cut = now
+                self._win = (0, now)
+        elif secs <= limit and self.bucket is not None:
+            self.bucket.set_rate(min(self.rate * 1.05, self.cap or self.link_rate))
+
+    def report(self):
+        """Per-upload numbers for the metrics record."""
+        elapsed = (self._t_end - self._t0) if self._t0 is not None and self._t_end is not None else 0.0
+        return {
+            "bytes": self.bytes,
+            "seconds": round(elapsed, 4),
+            "throughput_bps": round(self.bytes / elapsed) if elapsed > 0 else None,
+            "queue_delay_s": round(self.queue_delay, 4),
+            "cap_bps": self.cap,
+            "adaptive": self.adaptive,
+            "final_rate_bps": round(self.rate) if self.rate else None,
+            "backoffs": self.backoffs,
+            "rtt_avg_s": round(self.srtt, 4) if self.srtt is not None else None,
+            "rtt_max_s": round(self.max_rtt, 4),
+        }
 
-    conn_cls = http.client.HTTPSConnection if parsed.scheme == "https" else http.client.HTTPConnection
-    port = parsed.port or (443 if parsed.scheme == "https" else 80)
-    conn = conn_cls(parsed.hostname, port, timeout=timeout)
-    try:
-        conn.connect()
-        path = parsed.path or "/"
-        if parsed.query:
-            path += "?" + parsed.query
-        conn.putrequest("GET", path, skip_accept_encoding=True)
-        conn.putheader("User-Agent", f"EpochUploader/{APP_VERSION} (Windows)")
-        conn.endheaders()
-        conn.sock.settimeout(timeout)
-        resp = conn.getresponse()
-        data = resp.read().decode("utf-8", "ignore")
-        return resp.status, data
-    except (socket.timeout, ConnectionResetError, OSError) as e:
-        return 0, str(e)
-    finally:
-        try:
-            conn.close()
-        except Exception:
-            pass
+class UploadScheduler:
+    """Single upload worker with trigger coalescing.
+
+    ``trigger()`` never runs a job itself: it records that an upload is wanted.
+    Triggers that arrive while one is pending or running collapse into one
+    follow-up run, so no change is lost and a burst costs one upload. Manual
+    triggers start as soon as the worker is free and skip the rate limit; auto
+    triggers wait for their ``delay`` and a token from ``bucket``. Only a
+    successful auto run spends a token, so a retry after a failed run waits
+    just for its own ``delay``.
+    ``run(manual, cancel)`` does the work; ``cancel`` is a threading.Event set by
+    ``cancel()``/``stop()``.
+    """
 
-def _net_call_with_backoff(call):
-    delay = 0.5
-    last_code, last_body = None, None
-    for _ in range(6):
-        code, body = call()
-        last_code, last_body = code, body
+    def __init__(self, run, bucket, on_error=None):
+        self._run = run
+        self.bucket = bucket
+        self._on_error = on_error
+        self._cond = threading.Condition()
+        self._pending = None          # None | "auto" | "manual"
+        self._not_before = 0.0        # monotonic time an auto trigger may start
+        self._running = False
+        self._cancel = threading.Event()
+        self._stopped = False
+        self._thread = None
+        self.coalesced = 0
+
+    @property
+    def running(self):
+        with self._cond:
+            return self._running
+
+    @property
+    def pending(self):
+        with self._cond:
+            return self._pending
+
+    def start(self):
+        """Start the worker. After ``stop()`` a worker still finishing its job is kept, not doubled."""
+        with self._cond:
+            self._stopped = False
+            self._cond.notify_all()
+            if self._thread is not None:
+                return
+            self._thread = t = threading.Thread(target=self._loop, name="upload", daemon=True)
+        t.start()
+
+    def trigger(self, *, manual=False, delay=0.0):
+        with self._cond:
+            if self._stopped:
+                return False
+            if self._pending is not None or self._running:
+                self.coalesced += 1
+            if manual:
+                self._pending = "manual"
+            else:
+                not_before = time.monotonic() + max(0.0, delay)
+                if self._pending is None:
+                    self._pending = "auto"
+                    self._not_before = not_before
+                elif delay:
+                    self._not_before = max(self._not_before, not_before)
+            self._cond.notify_all()
+        return True
+
+    def cancel(self):
+        """Drop the pending trigger and ask a running job to stop."""
+        with self._cond:
+            self._pending = None
+            if self._running:
+                self._cancel.set()
+            self._cond.notify_all()
+
+    def stop(self, wait=0.0):
+        """Stop the worker and cancel a running job; waits up to ``wait`` seconds for it to
+        wind down. True if idle."""
+        with self._cond:
+            self._stopped = True
+            self._pending = None
+            if self._running:
+                self._cancel.set()
+            self._cond.notify_all()
+            deadline = time.monotonic() + max(0.0, wait)
+            while self._running and time.monotonic() < deadline:
+                self._cond.wait(max(0.01, deadline - time.monotonic()))
+            idle = not self._running
+            t = self._thread
+        if idle and t is not None and t is not threading.current_thread():
+            t.join(max(0.0, deadline - time.monotonic()))
+        return idle
+
+    def run_now(self, manual=True):
+        """Run one job on the calling thread once the worker is idle; covers any pending trigger."""
+        with self._cond:
+            while self._running and not self._stopped:
+                self._cond.wait()
+            if self._stopped:
+                return None
+            self._pending = None
+            self._running = True
+            self._cancel.clear()
         try:
-            if 200 <= int(code or 0) < 300:
-                return code, body
-        except Exception:
-            pass
-        time.sleep(delay)
-        delay = min(delay * 2, 8.0)
-    return last_code, last_body
-
-# --------------- Tk App ---------------
-class App(tk.Tk):
-    def __init__(self):
-        super().__init__()
-        self.title(f"{APP_NAME}")
-        self.geometry("840x560")
-        self.minsize(760, 500)
-
-        self.queue = queue.Queue()
-        self._debounce_until = 0.0
-        self._watcher_running = True
-        self._watcher_paused = False
+            ok = self._run(manual, self._cancel)
+            if ok and not manual:
+                self.bucket.take()
+            return ok
+        finally:
+            with self._cond:
+                self._running = False
+                self._cond.notify_all()
+
+    def _next_job(self):
+        """Block until a job may start; returns its kind, or None when stopped."""
+        with self._cond:
+            while True:
+                if self._stopped:
+                    self._thread = None  # under the lock, so start() either reuses this worker or makes a new one
+                    return None
+                if self._pending == "manual":
+                    break
+                if self._pending == "auto":
+                    wait = max(self._not_before - time.monotonic(), self.bucket.delay())
+                    if wait <= 0:
+                        break
+                    self._cond.wait(wait)
+                    continue
+                self._cond.wait()
+            kind, self._pending = self._pending, None
+            self._running = True
+            self._cancel.clear()
+        return kind
+
+    def _loop(self):
+        while True:
+            kind = self._next_job()
+            if kind is None:
+                return
+            try:
+                if self._run(kind == "manual", self._cancel) and kind != "manual":
+                    self.bucket.take()
+            except Exception as e:
+                if self._on_error:
+                    self._on_error(e)
+            finally:
+                with self._cond:
+                    self._running = False
+                    self._cond.notify_all()
+
+# --------------- Uploader core (headless) ---------------
+class UploaderCore:
+    """Watch/parse/upload engine shared by the Tk app and the headless daemon.
+
+    Front-ends subscribe through ``notify(kind, data)``.  It is called from the
+    watcher and upload threads, so GUI clients must marshal onto their own
+    thread (the Tk app just drops everything into its queue).
+    """
+
+    def __init__(self, cfg=None, notify=None):
+        cfg = load_config() if cfg is None else cfg
+        self.notify = notify or (lambda kind, data: None)
+
+        self._watcher_running = False
+        self._watcher_thread = None
         self._last_sig = None  # tuple of watched file signatures
-        self._last_success_at = 0.0
+        self._sig_gen = 0      # bumped by _forget_sig(), so the watcher drops a signature read across it
+        self._sig_lock = threading.Lock()
         self._last_upload_ts = None
-        self._uploading = False
+        # One upload at a time; auto uploads are spaced by a token bucket (one per MIN_SUCCESS_SPACING).
+        self.scheduler = UploadScheduler(self._run_upload, TokenBucket(1.0 / max(MIN_SUCCESS_SPACING, 0.001), 1.0),
+                                         on_error=self._upload_error)
+        self.scheduler.start()
 
-        cfg = load_config()
         sv_dir = cfg.get("sv_dir")
         if not sv_dir and cfg.get("sv_path"):
             try:
@@ -459,16 +1201,39 @@ class App(tk.Tk):
         self.sv_dir = sv_dir
 
         self.auto_upload = bool(cfg.get("auto_upload", DEFAULT_AUTO_UPLOAD))
-        self.start_with_windows = bool(cfg.get("autostart", DEFAULT_START_WITH_WIN))
         self.pause_watching = bool(cfg.get("pause_watching", DEFAULT_PAUSE_WATCHING))
-        self.start_minimized = bool(cfg.get("start_minimized", DEFAULT_START_MINIMIZED))
-        self.start_silent = bool(cfg.get("start_silent", DEFAULT_START_SILENT))
         self.cleanup_keep_files = int(cfg.get("cleanup_keep_files", DEFAULT_CLEANUP_KEEP_FILES) or DEFAULT_CLEANUP_KEEP_FILES)
-
-        # CLI override for silent/minimized startup (useful from task scheduler).
-        if "--silent" in [a.lower() for a in sys.argv[1:]]:
-            self.start_minimized = True
-            self.start_silent = True
+        self.record_events = bool(cfg.get("record_events", DEFAULT_RECORD_EVENTS))
+        self.metrics_enabled = bool(cfg.get("metrics", DEFAULT_METRICS))
+        self.metrics_trace_memory = bool(cfg.get("metrics_tracemalloc", DEFAULT_METRICS_TRACEMALLOC))
+        self.dedupe = bool(cfg.get("dedupe", DEFAULT_DEDUPE))
+        self.validate = bool(cfg.get("validate", DEFAULT_VALIDATE))
+        self.market_records = bool(cfg.get("market_records", DEFAULT_MARKET_RECORDS))
+        self.market_acks = dict(cfg.get("market_acks") or {})  # addon -> {"sig", "cursors"} last acknowledged
+        self._pending_market = {}
+        self.acked_uploads = list(cfg.get("acked_uploads") or [])  # upload_key()s the server acknowledged
+        self._cancel = threading.Event()
+        self._profile_next = None  # None, or tracemalloc on/off for the next upload (profile_next_upload)
+        self.net = epoch_net.shared_loop()
+        self.wire_format = str(cfg.get("wire_format", DEFAULT_WIRE_FORMAT) or DEFAULT_WIRE_FORMAT).lower()
+        try:
+            self.encode_workers = max(0, int(cfg.get("encode_workers", DEFAULT_ENCODE_WORKERS) or 0))
+        except (TypeError, ValueError):
+            self.encode_workers = DEFAULT_ENCODE_WORKERS
+        try:
+            self.upload_rate_kbps = max(0.0, float(cfg.get("upload_rate_kbps", DEFAULT_UPLOAD_RATE_KBPS) or 0))
+        except (TypeError, ValueError):
+            self.upload_rate_kbps = float(DEFAULT_UPLOAD_RATE_KBPS)
+        self.upload_adaptive = bool(cfg.get("upload_adaptive", DEFAULT_UPLOAD_ADAPTIVE))
+        self.manual_full_speed = bool(cfg.get("manual_full_speed", DEFAULT_MANUAL_FULL_SPEED))
+        self._encoder = None  # epoch_encode.ShardedEncoder, created by the first large JSON upload
+        self.upload_mode = str(cfg.get("upload_mode", DEFAULT_UPLOAD_MODE) or DEFAULT_UPLOAD_MODE).lower()
+        try:
+            self.memory_budget_mb = max(0.0, float(cfg.get("memory_budget_mb", DEFAULT_MEMORY_BUDGET_MB)))
+        except (TypeError, ValueError):
+            self.memory_budget_mb = float(DEFAULT_MEMORY_BUDGET_MB)
+        self.last_metrics = None
+        self.on_stage = None  # stage hook for the next cycle's UploadMetrics, set by epoch_profile
 
         self.created = None
         self.updated = None
@@ -477,270 +1242,30 @@ class App(tk.Tk):
         self.kept = None
         self.server_ok = None
 
-        self.warn_banner_var = tk.StringVar(value="")
-        self.status_line_var = tk.StringVar(value="Idle")
-        self.meta_player_var = tk.StringVar(value="")
-        self._tray_icon = None
-        self._tray_warned = False
-
-        self._build_ui()
-
-        if not self._valid_dir(self.sv_dir):
-            self.after(250, lambda: self._choose_sv_dir(initial=True))
-
-        self.protocol("WM_DELETE_WINDOW", self._on_close_hide)
-        self.after(200, self._pump_queue)
-        threading.Thread(target=self._watch_loop, daemon=True).start()
-        _start_activation_listener(lambda: self.queue.put(("show", {})))
-        self._ensure_tray_icon()
-
-        if self.start_minimized:
-            self.after(50, self.withdraw)
-
-        if self.sv_dir:
-            self._log(f"Watching folder: {self.sv_dir}")
-            self._log_target_files()
-        else:
-            self._log("Select your SavedVariables folder (e.g. GAMEDIR\\WTF\\Account\\ACCOUNTNAME\\SavedVariables).")
-
-    # ---------------- UI ----------------
-    def _build_ui(self):
-        root = ttk.Frame(self, padding=12)
-        root.pack(fill="both", expand=True)
-
-        # Banner (hidden until needed)
-        self.banner = ttk.Frame(root)
-        self.banner.pack(fill="x", side="top")
-        self.banner_label = tk.Label(self.banner, textvariable=self.warn_banner_var, fg="#1a1a00",
-                                     bg="#ffec99", padx=10, pady=6, anchor="w", justify="left")
-        self.banner_label.pack(fill="x")
-        self._hide_banner()
-
-        # Path row
-        row = ttk.Frame(root); row.pack(fill="x")
-        ttk.Label(row, text="SavedVariables folder:", font=("Segoe UI", 10, "bold")).pack(side="left")
-        self.path_var = tk.StringVar(value=self.sv_dir or "")
-        e = ttk.Entry(row, textvariable=self.path_var, state="readonly")
-        e.pack(side="left", fill="x", expand=True, padx=8)
-        ttk.Button(row, text="Change…", command=self._choose_sv_dir).pack(side="left")
-
-        # Top controls row
-        bar = ttk.Frame(root); bar.pack(fill="x", pady=(10, 8))
-        ttk.Button(bar, text="Upload now", command=lambda: self.queue.put(("upload", {"manual": True}))).pack(side="left")
-
-        self.auto_upload_var = tk.BooleanVar(value=self.auto_upload)
-        self.autostart_var   = tk.BooleanVar(value=self.start_with_windows)
-        self.pause_var       = tk.BooleanVar(value=self.pause_watching)
-        self.minimized_var   = tk.BooleanVar(value=self.start_minimized)
-        self.silent_var      = tk.BooleanVar(value=self.start_silent)
-
-        ttk.Checkbutton(bar, text="Auto-upload", variable=self.auto_upload_var,
-                        command=self._toggle_auto).pack(side="left", padx=(10,0))
-        ttk.Checkbutton(bar, text="Start with Windows", variable=self.autostart_var,
-                        command=self._toggle_autostart).pack(side="left", padx=(10,0))
-        ttk.Checkbutton(bar, text="Start minimized", variable=self.minimized_var,
-                        command=self._toggle_start_minimized).pack(side="left", padx=(10,0))
-        ttk.Checkbutton(bar, text="Start silently", variable=self.silent_var,
-                        command=self._toggle_start_silent).pack(side="left", padx=(10,0))
-        ttk.Checkbutton(bar, text="Pause watching", variable=self.pause_var,
-                        command=self._toggle_pause).pack(side="left", padx=(10,0))
-
-        ttk.Button(bar, text="Open SV Folder", command=self._open_sv_folder).pack(side="left", padx=(10,0))
-        ttk.Button(bar, text="Open Log", command=self._open_log).pack(side="left", padx=(10,0))
-        ttk.Button(bar, text="Clean old uploads", command=self._cleanup_old_uploads).pack(side="left", padx=(10,0))
-
-        # Status strip
-        meta = ttk.Frame(root); meta.pack(fill="x", pady=(4, 8))
-        ttk.Label(meta, textvariable=self.status_line_var).pack(side="left")
-        ttk.Label(meta, textvariable=self.meta_player_var, foreground="#56b1ff").pack(side="right")
-
-        # Log area
-        box = ttk.LabelFrame(root, text="Recent activity")
-        box.pack(fill="both", expand=True)
-        self.log = tk.Text(box, height=18, wrap="word")
-        self.log.pack(fill="both", expand=True)
-        self.log.configure(state="disabled")
-
-        # Footer
-        ttk.Label(root, text=f"Close window to minimize to tray (single-instance).  v{APP_VERSION}",
-                  foreground="#888").pack(anchor="w", pady=(8, 0))
-
-        try: self.tk.call("tk", "scaling", 1.15)
-        except Exception: pass
-
-    def _show_banner(self, msg: str):
-        self.warn_banner_var.set(msg or "")
-        self.banner_label.configure(bg="#ffec99")
-        self.banner.pack(fill="x")
-        self.banner_label.update_idletasks()
-
-    def _hide_banner(self):
-        self.warn_banner_var.set("")
-        self.banner.forget()
-
-    def _set_status_line(self):
-        t = time.strftime("%H:%M:%S", time.localtime(self._last_upload_ts)) if self._last_upload_ts else "—"
-        created = "—" if self.created is None else str(self.created)
-        updated = "—" if self.updated is None else str(self.updated)
-        dropped = "—" if self.dropped is None else str(self.dropped)
-        dupes   = "—" if self.duplicates is None else str(self.duplicates)
-        server  = "OK" if self.server_ok else ("Error" if self.server_ok is not None else "—")
-        self.status_line_var.set(f"Last upload: {t} • Created: {created}  Updated: {updated}  Dropped: {dropped} • Server: {server}")
-
-    def _log(self, s):
-        logging.info(s)
-        ts = time.strftime("%H:%M:%S")
-        line = f"[{ts}] {s}\n"
-        self.log.configure(state="normal")
-        self.log.insert("end", line)
-        try:
-            if int(self.log.index('end-1c').split('.')[0]) > LOG_MAX_LINES:
-                self.log.delete('1.0', '2.0')
-        except Exception:
-            pass
-        self.log.see("end"); self.log.configure(state="disabled")
-
-    def _make_tray_image(self):
-        if Image is None:
-            return None
-        img = Image.new("RGBA", (64, 64), (35, 35, 35, 255))
-        d = ImageDraw.Draw(img)
-        d.ellipse((8, 8, 56, 56), fill=(43, 121, 245, 255))
-        d.text((19, 21), "EH", fill=(255, 255, 255, 255))
-        return img
-
-    def _ensure_tray_icon(self):
-        if self._tray_icon is not None or pystray is None:
-            if pystray is None and not self._tray_warned:
-                self._log("Tray support unavailable (missing pystray/Pillow in build environment).")
-                self._tray_warned = True
-            return
-        try:
-            menu = pystray.Menu(
-                pystray.MenuItem("Restore", lambda: self.queue.put(("show", {}))),
-                pystray.MenuItem("Close", lambda: self.queue.put(("exit", {}))),
-            )
-            self._tray_icon = pystray.Icon("epoch_uploader", self._make_tray_image(), APP_NAME, menu)
-            self._tray_icon.run_detached()
-        except Exception as e:
-            self._tray_icon = None
-            self._log(f"Tray icon failed to start: {e}")
-
-    def _stop_tray_icon(self):
-        if not self._tray_icon:
+    # ---------------- Lifecycle ----------------
+    def start(self):
+        if self._watcher_running:
             return
-        try:
-            self._tray_icon.stop()
-        except Exception:
-            pass
-        self._tray_icon = None
-
-    # ---------------- Events/queue ----------------
-    def _on_close_hide(self):
-        # Keep app running background and show tray icon.
-        self._ensure_tray_icon()
-        if not self.start_silent:
-            try:
-                messagebox.showinfo(APP_NAME, "Uploader is still running in the system tray.")
-            except Exception:
-                pass
-        self.withdraw()
+        self._watcher_running = True
+        self.scheduler.start()  # no-op unless stop() ran before
+        self._watcher_thread = threading.Thread(target=self._watch_loop, name="watcher", daemon=True)
+        self._watcher_thread.start()
 
-    def _exit_app(self):
+    def stop(self, wait=0.0):
+        """Stop watching; optionally wait up to ``wait`` seconds for an in-flight upload."""
         self._watcher_running = False
-        self._stop_tray_icon()
-        self.destroy()
+        clean = self.scheduler.stop(wait)
+        if self._encoder is not None:
+            self._encoder.close()
+        return clean
 
-    def _pump_queue(self):
-        try:
-            while True:
-                item = self.queue.get_nowait()
-                if isinstance(item, tuple):
-                    kind, payload = item
-                else:
-                    kind, payload = item, {}
-                if kind == "upload":
-                    self._do_upload(manual=bool(payload.get("manual")))
-                elif kind == "upload_result":
-                    self._finish_upload(payload.get("path"), payload.get("code"), payload.get("body"))
-                elif kind == "show":
-                    self.deiconify()
-                    try: self.lift(); self.focus_force()
-                    except Exception: pass
-                elif kind == "exit":
-                    self._exit_app()
-                    return
-        except queue.Empty:
-            pass
-        self.after(200, self._pump_queue)
-
-    # ---------------- Toggles ----------------
-    def _toggle_auto(self):
-        self.auto_upload = bool(self.auto_upload_var.get())
-        cfg = load_config(); cfg["auto_upload"] = self.auto_upload; save_config(cfg)
-        self._log(f"Auto-upload {'enabled' if self.auto_upload else 'disabled'}.")
-
-    def _toggle_autostart(self):
-        want = bool(self.autostart_var.get())
-        ok = set_autostart(want)
-        if not ok:
-            # revert UI checkbox if failed
-            self.autostart_var.set(get_autostart_enabled())
-        cfg = load_config(); cfg["autostart"] = bool(self.autostart_var.get()); save_config(cfg)
-        self._log(f"Start with Windows {'enabled' if self.autostart_var.get() else 'disabled'}.")
-
-    def _toggle_pause(self):
-        self.pause_watching = bool(self.pause_var.get())
-        cfg = load_config(); cfg["pause_watching"] = self.pause_watching; save_config(cfg)
-        self._log(f"Watching {'paused' if self.pause_watching else 'resumed'}.")
-
-    def _toggle_start_minimized(self):
-        self.start_minimized = bool(self.minimized_var.get())
-        cfg = load_config(); cfg["start_minimized"] = self.start_minimized; save_config(cfg)
-        self._log(f"Start minimized {'enabled' if self.start_minimized else 'disabled'}.")
-
-    def _toggle_start_silent(self):
-        self.start_silent = bool(self.silent_var.get())
-        cfg = load_config(); cfg["start_silent"] = self.start_silent; save_config(cfg)
-        self._log(f"Start silently {'enabled' if self.start_silent else 'disabled'}.")
-
-    def _open_sv_folder(self):
-        try:
-            if self._valid_dir(self.sv_dir):
-                os.startfile(self.sv_dir)
-            else:
-                messagebox.showwarning(APP_NAME, "No SavedVariables folder selected yet.")
-        except Exception as e:
-            self._log(f"Open SV folder failed: {e}")
+    @property
+    def uploading(self):
+        return self.scheduler.running
 
-    def _open_log(self):
-        try:
-            _ensure_appdata()
-            if not os.path.exists(LOG_PATH):
-                with open(LOG_PATH, "a", encoding="utf-8"): pass
-            os.startfile(LOG_PATH)
-        except Exception as e:
-            self._log(f"Open log failed: {e}")
-
-    def _cleanup_old_uploads(self):
-        if not self._valid_dir(self.sv_dir):
-            self._log("Select your SavedVariables folder first.")
-            return
-        keep = max(1, int(self.cleanup_keep_files or DEFAULT_CLEANUP_KEEP_FILES))
-        pattern = os.path.join(self.sv_dir, "epochhead_upload*.lua")
-        files = sorted(glob.glob(pattern), key=lambda p: os.path.getmtime(p), reverse=True)
-        old = files[keep:]
-        if not old:
-            self._log(f"Cleanup complete. Nothing to remove (keeping up to {keep} files).")
-            return
-        removed = 0
-        for p in old:
-            try:
-                os.remove(p)
-                removed += 1
-            except Exception as e:
-                self._log(f"Failed to remove {os.path.basename(p)}: {e}")
-        self._log(f"Cleanup removed {removed} old uploaded files (kept newest {keep}).")
+    def log(self, s):
+        logging.info(s)
+        self.notify("log", {"msg": s})
 
     # ---------------- Paths ----------------
     def _valid_dir(self, d): return bool(d) and os.path.isdir(d)
@@ -748,8 +1273,15 @@ class App(tk.Tk):
     def _sv_file_path(self):
         return os.path.join(self.sv_dir, PRIMARY_SV_FILE) if self._valid_dir(self.sv_dir) else None
 
-    def _log_target_files(self):
-        self._log("Target files: " + ", ".join(TARGET_SV_FILES))
+    def set_sv_dir(self, d):
+        self.sv_dir = d
+        cfg = load_config(); cfg["sv_dir"] = d; save_config(cfg)
+        self.log(f"Selected folder: {d}")
+        self.log_target_files()
+        self._forget_sig()
+
+    def log_target_files(self):
+        self.log("Target files: " + ", ".join(TARGET_SV_FILES))
 
     def _watched_file_signatures(self):
         if not self._valid_dir(self.sv_dir):
@@ -774,74 +1306,114 @@ class App(tk.Tk):
         sigs.sort(key=lambda x: x[0])
         return tuple(sigs)
 
-    def _choose_sv_dir(self, initial=False):
-        start_dir = os.path.join(os.path.expanduser("~"), "Documents")
-        title = "Select your SavedVariables folder (e.g. GAMEDIR\\WTF\\Account\\ACCOUNTNAME\\SavedVariables)"
-        d = filedialog.askdirectory(
-            initialdir=start_dir if os.path.isdir(start_dir) else os.path.expanduser("~"),
-            title=title,
-            mustexist=True,
-        )
-        if d:
-            self.sv_dir = d
-            self.path_var.set(d)
-            cfg = load_config(); cfg["sv_dir"] = d; save_config(cfg)
-            self._log(f"Selected folder: {d}")
-            self._log_target_files()
-            self._last_sig = None
-        elif initial and not self.sv_dir:
-            self._log("No folder selected. Use 'Change…' to pick the SavedVariables folder.")
-
-    def _load_market_addon_data(self):
+    def cleanup_old_uploads(self):
         if not self._valid_dir(self.sv_dir):
-            return {}
-        targets = {
-            "aux": ["aux-addon.lua", "aux.lua", "auxhistory.lua", "aux_history.lua"],
-            "auctionator": ["auctionator.lua", "auctionatordata.lua", "auctionatorshoppinglists.lua"],
-        }
-        files_by_lower = {}
+            self.log("Select your SavedVariables folder first.")
+            return
+        keep = max(1, int(self.cleanup_keep_files or DEFAULT_CLEANUP_KEEP_FILES))
+        pattern = os.path.join(self.sv_dir, "epochhead_upload*.lua")
+        files = sorted(glob.glob(pattern), key=lambda p: os.path.getmtime(p), reverse=True)
+        old = files[keep:]
+        if not old:
+            self.log(f"Cleanup complete. Nothing to remove (keeping up to {keep} files).")
+            return
+        removed = 0
+        for p in old:
+            try:
+                os.remove(p)
+                removed += 1
+            except Exception as e:
+                self.log(f"Failed to remove {os.path.basename(p)}: {e}")
+        self.log(f"Cleanup removed {removed} old uploaded files (kept newest {keep}).")
+
+    def _files_by_lower(self):
         try:
-            for name in os.listdir(self.sv_dir):
-                files_by_lower[name.lower()] = name
+            return {name.lower(): name for name in os.listdir(self.sv_dir)}
         except Exception:
             return {}
 
-        out = {}
-        for source, names in targets.items():
-            for lname in names:
-                real = files_by_lower.get(lname)
-                if not real:
-                    continue
-                path = os.path.join(self.sv_dir, real)
-                try:
-                    with open(path, "r", encoding="utf-8", errors="ignore") as f:
-                        raw = f.read()
-                    out[source] = {
-                        "file": real,
-                        "mtime": int(os.path.getmtime(path)),
-                        "size": len(raw),
-                        "raw_lua": raw,
-                    }
-                    break
-                except Exception as e:
-                    self._log(f"{source} read skipped ({real}): {e}")
-                    break
+    def _market_files(self):
+        """``(source, file name, path)`` for each market addon with a SavedVariables file."""
+        if not self._valid_dir(self.sv_dir):
+            return []
+        files_by_lower = self._files_by_lower()
+        out = []
+        for source, names in MARKET_ADDON_FILES.items():
+            real = next((files_by_lower[n] for n in names if n in files_by_lower), None)
+            if real:
+                out.append((source, real, os.path.join(self.sv_dir, real)))
         return out
 
-    def _load_census_addon_data(self):
+    def _census_file(self):
+        """``(file name, path)`` of EpochCensus.lua, or None."""
         if not self._valid_dir(self.sv_dir):
             return None
-        files_by_lower = {}
+        real = self._files_by_lower().get(CENSUS_FILE)
+        return (real, os.path.join(self.sv_dir, real)) if real else None
+
+    def _market_structured(self):
+        return self.market_records and server_accepts_wire(SERVER, epoch_market.MARKET_FORMAT)
+
+    def _load_market_addon_data(self):
+        structured = self._market_structured()
+        out = {}
+        for source, real, path in self._market_files():
+            try:
+                with open(path, "r", encoding="utf-8", errors="ignore") as f:
+                    raw = f.read()
+                info = {
+                    "file": real,
+                    "mtime": int(os.path.getmtime(path)),
+                    "size": len(raw),
+                }
+                if structured:
+                    rec = self._market_records(source, raw, info)
+                    if rec == "unchanged":
+                        continue
+                    if rec is not None:
+                        info.update(rec)
+                        out[source] = info
+                        continue
+                info["raw_lua"] = raw
+                out[source] = info
+            except Exception as e:
+                self.log(f"{source} read skipped ({real}): {e}")
+        return out
+
+    def _market_records(self, source, raw, info):
+        """Price records newer than the last acknowledged upload; "unchanged" when there is nothing
+        new, None to fall back to sending raw_lua."""
+        sig = [info["mtime"], info["size"]]
+        ack = self.market_acks.get(source) or {}
+        if ack.get("sig") == sig:
+            self.log(f"{info['file']} unchanged since last acknowledged upload; skipped.")
+            return "unchanged"
         try:
-            for name in os.listdir(self.sv_dir):
-                files_by_lower[name.lower()] = name
-        except Exception:
+            table = parse_lua_var(raw, epoch_market.ADDON_VARS[source])
+            cursors = dict(ack.get("cursors") or {})
+            scopes = epoch_market.EXTRACTORS[source](table, cursors)
+        except Exception as e:
+            self.log(f"{info['file']}: could not extract price records ({e}); sending raw file.")
             return None
+        cursors.update(epoch_market.scope_cursors(scopes))
+        self._pending_market[source] = {"sig": sig, "cursors": cursors}
+        self.log(f"{info['file']}: {epoch_market.count_records(scopes)} new price record(s) in "
+                 f"{len(scopes)} scope(s) instead of {_fmt_bytes(len(raw))} raw")
+        return {"format": epoch_market.MARKET_FORMAT, "scopes": scopes}
+
+    def _ack_market(self, ok):
+        """Remember what the server acknowledged so the next upload only sends newer records."""
+        pending, self._pending_market = self._pending_market, {}
+        if not ok or not pending:
+            return
+        self.market_acks.update(pending)
+        cfg = load_config(); cfg["market_acks"] = self.market_acks; save_config(cfg)
 
-        real = files_by_lower.get("epochcensus.lua")
-        if not real:
+    def _load_census_addon_data(self):
+        found = self._census_file()
+        if not found:
             return None
-        path = os.path.join(self.sv_dir, real)
+        real, path = found
         try:
             with open(path, "r", encoding="utf-8", errors="ignore") as f:
                 raw = f.read()
@@ -852,93 +1424,312 @@ class App(tk.Tk):
                 "raw_lua": raw,
             }
         except Exception as e:
-            self._log(f"census read skipped ({real}): {e}")
+            self.log(f"census read skipped ({real}): {e}")
             return None
 
     # ---------------- Watch & upload ----------------
     def _watch_loop(self):
         """Poll target SavedVariables files and push an upload when signature changes."""
-        pending_sig   = None
-        pending_since = 0.0
+        pending = (None, 0.0)   # (signature waiting to settle, when it was first seen)
         while self._watcher_running:
             try:
                 if self.pause_watching:
                     time.sleep(POLL_INTERVAL_SEC)
-                    pending_sig = None
+                    pending = (None, 0.0)
                     continue
-                sig = self._watched_file_signatures()
-                if self._last_sig is None:
-                    self._last_sig = sig
-                    pending_sig = None
-                elif sig != self._last_sig:
-                    if sig != pending_sig:
-                        # File just changed (or changed again); reset settle timer.
-                        pending_sig   = sig
-                        pending_since = time.time()
-                    elif time.time() - pending_since >= WRITE_SETTLE_SEC:
-                        # Signature stable for WRITE_SETTLE_SEC — file is done writing.
-                        self._last_sig = sig
-                        pending_sig    = None
-                        now = time.time()
-                        if now >= self._debounce_until:
-                            self._debounce_until = now + DEBOUNCE_SEC
-                            # Auto uploads only if enabled; manual bypasses this check.
-                            if self.auto_upload:
-                                self.queue.put(("upload", {"manual": False}))
+                pending, settled = self._poll_signature(pending)
+                # Auto uploads only if enabled; manual bypasses this check.
+                if settled and self.auto_upload:
+                    self.scheduler.trigger(manual=False, delay=DEBOUNCE_SEC)
             except Exception as e:
                 logging.warning("watch loop error: %s", e)
             time.sleep(POLL_INTERVAL_SEC)
 
+    def _poll_signature(self, pending):
+        """One watcher step: returns ``(pending, settled)``; ``settled`` means the files changed
+        and have stopped changing for WRITE_SETTLE_SEC."""
+        with self._sig_lock:
+            gen = self._sig_gen
+        sig = self._watched_file_signatures()
+        pending_sig, pending_since = pending
+        with self._sig_lock:
+            if gen != self._sig_gen:
+                # Forgotten while we read (rename, new folder): sig may predate it.
+                return (None, 0.0), False
+            if self._last_sig is None:
+                self._last_sig = sig
+                return (None, 0.0), False
+            if sig == self._last_sig:
+                return pending, False
+            if sig != pending_sig:
+                # File just changed (or changed again); reset settle timer.
+                return (sig, time.time()), False
+            if time.time() - pending_since >= WRITE_SETTLE_SEC:
+                # Signature stable for WRITE_SETTLE_SEC — file is done writing.
+                self._last_sig = sig
+                return (None, 0.0), True
+            return pending, False
+
+    def _forget_sig(self):
+        """Make the watcher take the next signature it reads as the new baseline."""
+        with self._sig_lock:
+            self._last_sig = None
+            self._sig_gen += 1
+
     def _requeue_soon(self, secs=RETRY_ON_PARSE_SEC):
-        self._debounce_until = time.time() + secs
-        threading.Timer(secs, lambda: self.queue.put(("upload", {"manual": False}))).start()
+        self.scheduler.trigger(manual=False, delay=secs)
+
+    def request_upload(self, *, manual: bool):
+        """Queue an upload. While one is pending or running, triggers merge into a single follow-up."""
+        if self.scheduler.running and manual:
+            self.log("Upload in progress; another will follow.")
+        return self.scheduler.trigger(manual=manual)
+
+    def cancel_upload(self):
+        """Abort the running upload (it stops at its next check or network wait) and drop a
+        pending one. Returns False when there was nothing to cancel."""
+        if not self.scheduler.running and self.scheduler.pending is None:
+            self.log("No upload to cancel.")
+            return False
+        self.scheduler.cancel()
+        self.log("Cancelling upload…")
+        return True
+
+    def upload_now(self):
+        """Run one upload cycle on the calling thread. Returns True on success."""
+        return bool(self.scheduler.run_now(manual=True))
+
+    def profile_next_upload(self, memory=False):
+        """Run the next upload cycle under cProfile (plus tracemalloc when ``memory``);
+        the report goes to APPDATA_DIR (epoch_profile.py)."""
+        self._profile_next = bool(memory)
+        self.log("The next upload will be profiled" + (" (with memory snapshots)." if memory else "."))
+
+    def _run_upload(self, manual, cancel):
+        self._cancel = cancel
+        memory, self._profile_next = self._profile_next, None
+        if memory is None:
+            return self._do_upload(manual=manual)
+        import epoch_profile
+        return epoch_profile.profile_cycle(self, lambda: self._do_upload(manual=manual), memory=memory)
+
+    def _upload_error(self, e):
+        logging.error("upload failed", exc_info=e)
+        self.log(f"Upload failed: {e}")
+
+    def _cancelled(self, m):
+        if self._cancel.is_set():
+            self.log("Upload cancelled.")
+            self._record_metrics(m.finish(error="cancelled"))
+            return True
+        return False
 
     def _do_upload(self, *, manual: bool):
-        if self._uploading:
-            self._log("Upload already in progress; skipping.")
-            return
         p = self._sv_file_path()
         if not p:
-            self._log("Select the SavedVariables folder first.")
-            return
+            self.log("Select the SavedVariables folder first.")
+            return False
         have_epochhead = os.path.isfile(p)
 
-        # Rate limit successful uploads
-        if self._last_success_at and (time.time() - self._last_success_at) < MIN_SUCCESS_SPACING:
-            wait = MIN_SUCCESS_SPACING - (time.time() - self._last_success_at)
-            time.sleep(max(0.05, wait))
-
+        mode, est, why = self._upload_mode()
+        self.log(f"Upload mode: {'streaming' if mode == 'stream' else 'in memory'} ({why}).")
+        m = UploadMetrics(trace_memory=self.metrics_trace_memory, on_stage=self.on_stage,
+                          manual=bool(manual), mode=mode, mem_estimate=est)
+        if mode == "stream":
+            return self._do_upload_streaming(p, m, manual)
         events = []
         meta = {}
+        source_digest = b""
         if have_epochhead:
             # Read file
             try:
-                with open(p, "r", encoding="utf-8", errors="ignore") as f:
-                    lua = f.read()
+                with m.stage("read"):
+                    with open(p, "r", encoding="utf-8", errors="ignore") as f:
+                        lua = f.read()
+                    source_digest = hashlib.sha256(lua.encode("utf-8")).digest()
+                m.bytes_in += len(lua)
             except Exception as e:
-                self._log(f"Read error: {e}")
+                self.log(f"Read error: {e}")
+                self._record_metrics(m.finish(error="read"))
                 self._requeue_soon()
-                return
+                return False
 
             # Parse
             try:
-                sv = parse_savedvars(lua, VAR_NAME)
+                with m.stage("parse"):
+                    sv = parse_savedvars(lua, VAR_NAME)
             except Exception as e:
-                self._log(f"Parse error (likely mid-write). Retrying soon… ({e})")
+                self.log(f"Parse error (likely mid-write). Retrying soon… ({e})")
+                self._record_metrics(m.finish(error="parse"))
                 self._requeue_soon()
-                return
+                return False
+            del lua
 
             events = list(sv.get("events") or [])
             meta = dict(sv.get("meta") or {})
+            del sv
         else:
-            self._log("epochhead.lua not found; continuing with market addon exports only.")
+            self.log("epochhead.lua not found; continuing with market addon exports only.")
+
+        if self._cancelled(m):
+            return False
+        # Between parse and encode the events live in an EventTable (typed columns, one string pool).
+        from epoch_table import EventTable
+        with m.stage("table"):
+            odd = sum(1 for ev in events if not isinstance(ev, dict))
+            if odd:
+                events = [ev for ev in events if isinstance(ev, dict)]
+            table = EventTable.from_dicts(events, consume=True)
+            del events
+        with m.stage("normalize"):
+            table.normalize(); _normalize_inplace(meta)
+        m.events = len(table) + odd
+        client_dropped = {}
+        if self.validate and (len(table) or odd):
+            with m.stage("validate"):
+                table, vr = epoch_schema.validate_table(table, meta)
+            if odd:
+                vr["dropped_invalid"]["?"] += odd
+            client_dropped = self._log_validation(vr, meta, m)
+        if self.dedupe and len(table):
+            with m.stage("dedupe"):
+                collapse = COLLAPSE_KINDS if server_accepts_wire(SERVER, epoch_wire.WIRE_COLLAPSE) else ()
+                table, dd = dedupe_table(table, collapse_kinds=collapse)
+            if dd["dropped"] or dd["collapsed"]:
+                m.info["dedupe"] = dd
+                self.log(f"Dedupe: dropped {dd['dropped']} duplicate(s), collapsed {dd['collapsed']} repeat(s) "
+                         f"into counts; saved ~{_fmt_bytes(dd['bytes_saved'])}")
+        with m.stage("table"):
+            events = table.to_dicts()
+        del table
+        have_events = bool(events or meta)   # before _stamp_meta adds the uploader's own fields
+        self._stamp_meta(meta, client_dropped)
+
+        self._pending_market = {}
+        with m.stage("market"):
+            market_addons = self._load_market_addon_data()
+        with m.stage("read"):
+            census_addon = self._load_census_addon_data()
+        m.bytes_in += sum(int((v or {}).get("size") or 0) for v in market_addons.values())
+        m.bytes_in += int((census_addon or {}).get("size") or 0)
+        if not have_events and not market_addons and not census_addon:
+            self.log("No uploadable data found (expected epochhead.lua, Auctionator.lua, aux-addon.lua, or EpochCensus.lua).")
+            self._record_metrics(m.finish(error="no_data"))
+            return False
+        payload = {"events": events, "meta": meta}
+        if market_addons:
+            payload["market_addons"] = market_addons
+            self.log("Included market addon data: " + ", ".join(sorted(market_addons.keys())))
+            details = []
+            for addon_key in sorted(market_addons.keys()):
+                info = market_addons.get(addon_key) or {}
+                file_name = info.get("file") or f"{addon_key}.lua"
+                size = info.get("size")
+                if isinstance(size, int):
+                    details.append(f"{file_name} ({size} bytes)")
+                else:
+                    details.append(str(file_name))
+            if details:
+                self.log("Included file stats: " + ", ".join(details))
+        if census_addon:
+            payload["census_addon"] = census_addon
+            file_name = census_addon.get("file") or "EpochCensus.lua"
+            size = census_addon.get("size")
+            if isinstance(size, int):
+                self.log(f"Included census addon data: {file_name} ({size} bytes)")
+            else:
+                self.log(f"Included census addon data: {file_name}")
+
+        key = upload_key(source_digest, {k: v for k, v in payload.items() if k not in ("events", "meta")})
+        m.info["key"] = key
+        if key in self.acked_uploads:
+            self.log(f"This data was already uploaded (key {key[:12]}…); not sending it again.")
+            self._ack_market(True)
+            self._record_metrics(m.finish(error="already_uploaded"))
+            if AUTO_RENAME and have_epochhead:
+                self._rename_uploaded(p)
+            return True
+
+        if self._cancelled(m):
+            return False
+        req_body, ctype = self._encode_payload(payload, m)
+        m.bytes_out = len(req_body)
+        self.log(f"Uploading… ({len(events)} events, {_fmt_bytes(len(req_body))}"
+                 + (", compact format)" if ctype else ")"))
+        shaper = self._shaper(manual)
+        try:
+            with m.stage("send"):
+                code, body = self._net(send_upload(SERVER, TOKEN, req_body, ctype, idempotency_key=key,
+                                                   shaper=shaper))
+                if ctype and int(code or 0) in (400, 415):
+                    # Server no longer takes the compact form; forget it and resend as JSON.
+                    self.log(f"Server rejected compact format (HTTP {code}); resending as JSON.")
+                    forget_server_wire(SERVER)
+                    req_body = self._encode_json(payload)
+                    m.bytes_out += len(req_body)
+                    m.info["wire"] = "json"
+                    code, body = self._net(send_upload(SERVER, TOKEN, req_body, idempotency_key=key,
+                                                       shaper=shaper))
+        except Exception as e:
+            code, body = 0, str(e)
+        del req_body
+        self._log_send(shaper, m)
+
+        job_id = None
+        if body:
+            try:
+                job_id = json.loads(body).get("job_id")
+            except Exception:
+                pass
 
-        _normalize_inplace(events); _normalize_inplace(meta)
+        if job_id and 200 <= int(code or 0) < 400:
+            with m.stage("server"):
+                code, body = self._net(wait_for_job_async(SERVER, job_id, should_stop=self._cancel.is_set))
+
+        self._ack_market(200 <= int(code or 0) < 300)
+        if 200 <= int(code or 0) < 300:
+            self._ack_upload(key)
+        rec = m.finish(code=code, job_id=job_id)
+        self.last_metrics = m.summary()
+        self._record_metrics(rec)
+        self.log("Upload timings: " + ", ".join(f"{k} {_fmt_secs(v)}" for k, v in m.stages.items())
+                 + f"; in {_fmt_bytes(m.bytes_in)}, out {_fmt_bytes(m.bytes_out)}, {m.events} events"
+                 + (f", peak {_fmt_bytes(rec.get('peak_traced') or rec.get('peak_rss'))}"
+                    if rec.get("peak_traced") or rec.get("peak_rss") else ""))
+
+        self._record_events(events, meta, p if have_epochhead else None, code, job_id)
+        return self._finish_upload(p, code, body, have_epochhead=have_epochhead, metrics=rec)
+
+    def _log_validation(self, vr, meta, m):
+        """Log an epoch_schema.validate_events report; returns the ``client_dropped`` counts."""
+        client_dropped = {}
+        if vr["schema_version"] < epoch_schema.SCHEMA_VERSION:
+            self.log(f"Migrated events from schema v{vr['schema_version']} to v{epoch_schema.SCHEMA_VERSION}.")
+        elif vr["schema_version"] > epoch_schema.SCHEMA_VERSION:
+            self.log(f"Addon schema v{vr['schema_version']} is newer than this uploader; skipping validation.")
+        if vr["dropped_by_realm"]:
+            realm = (meta.get("player") or {}).get("realm") or "?"
+            self.log(f"Realm '{realm}' is not allowed; dropped {sum(vr['dropped_by_realm'].values())} event(s) "
+                     f"({epoch_schema.format_counts(vr['dropped_by_realm'])})")
+            client_dropped["by_realm"] = dict(vr["dropped_by_realm"])
+        if vr["dropped_invalid"]:
+            self.log(f"Dropped {sum(vr['dropped_invalid'].values())} malformed event(s) "
+                     f"({epoch_schema.format_counts(vr['dropped_invalid'])}); missing: "
+                     f"{epoch_schema.format_counts(vr['missing'])}")
+            client_dropped["invalid"] = dict(vr["dropped_invalid"])
+        if client_dropped:
+            m.info["validate"] = client_dropped
+        return client_dropped
+
+    def _stamp_meta(self, meta, client_dropped):
+        """Add ``meta._uploader`` and show the player line."""
         meta["_uploader"] = {
             "name": APP_NAME,
             "version": APP_VERSION,
             "upload_tick": int(time.time()),
         }
+        if client_dropped:
+            meta["_uploader"]["client_dropped"] = client_dropped
         if meta:
             try:
                 pmeta = meta.get("player") or {}
@@ -950,49 +1741,250 @@ class App(tk.Tk):
                 if realm: bits.append(f"({realm})")
                 if cls: bits.append(f"— {cls}")
                 if lvl: bits.append(f"lvl {lvl}")
-                self.meta_player_var.set(" ".join(str(b) for b in bits if b))
+                self.notify("player", {"text": " ".join(str(b) for b in bits if b)})
             except Exception:
                 pass
 
-        market_addons = self._load_market_addon_data()
-        census_addon = self._load_census_addon_data()
-        if not events and not meta and not market_addons and not census_addon:
-            self._log("No uploadable data found (expected epochhead.lua, Auctionator.lua, aux-addon.lua, or EpochCensus.lua).")
+    def _record_events(self, events, meta, p, code, job_id):
+        if not self.record_events:
             return
-        payload = {"events": events, "meta": meta}
-        if market_addons:
-            payload["market_addons"] = market_addons
-            self._log("Included market addon data: " + ", ".join(sorted(market_addons.keys())))
-            details = []
-            for addon_key in sorted(market_addons.keys()):
-                info = market_addons.get(addon_key) or {}
-                file_name = info.get("file") or f"{addon_key}.lua"
-                size = info.get("size")
-                if isinstance(size, int):
-                    details.append(f"{file_name} ({size} bytes)")
-                else:
-                    details.append(str(file_name))
-            if details:
-                self._log("Included file stats: " + ", ".join(details))
-        if census_addon:
-            payload["census_addon"] = census_addon
-            file_name = census_addon.get("file") or "EpochCensus.lua"
-            size = census_addon.get("size")
-            if isinstance(size, int):
-                self._log(f"Included census addon data: {file_name} ({size} bytes)")
-            else:
-                self._log(f"Included census addon data: {file_name}")
+        try:
+            store = epoch_store.EventStore(STORE_PATH)
+            store.record_upload(events, meta, file=os.path.basename(p) if p else None,
+                                status=code, ok=200 <= int(code or 0) < 300, job_id=job_id)
+        except Exception as e:
+            logging.warning("event store write failed: %s", e)
 
-        self._log("Uploading…")
-        self._uploading = True
+    def _event_recorder(self, meta, p):
+        """An epoch_store.UploadRecorder fed while a streamed upload is spooled (None when off)."""
+        if not self.record_events:
+            return None
+        try:
+            return epoch_store.EventStore(STORE_PATH).begin_upload(meta, file=os.path.basename(p))
+        except Exception as e:
+            logging.warning("event store write failed: %s", e)
+            return None
 
-        def worker():
+    @staticmethod
+    def _record_event(recorder, ev):
+        """Add ``ev``; a store error drops the recording (not the upload). Returns the recorder or None."""
+        try:
+            recorder.add(ev)
+            return recorder
+        except Exception as e:
+            logging.warning("event store write failed: %s", e)
+            recorder.abort()
+            return None
+
+    @staticmethod
+    def _finish_recording(recorder, code, job_id):
+        try:
+            recorder.finish(status=code, ok=200 <= int(code or 0) < 300, job_id=job_id)
+        except Exception as e:
+            logging.warning("event store write failed: %s", e)
+
+    # ---------------- Memory budget / streaming ----------------
+    def _upload_mode(self):
+        """``(mode, estimated peak bytes, reason)``; mode is "memory" or "stream"."""
+        structured = self._market_structured()
+        market_names = {n for names in MARKET_ADDON_FILES.values() for n in names}
+        est = 0
+        for name, _mtime, size in self._watched_file_signatures():
+            if name == PRIMARY_SV_FILE:
+                est += size * MEM_FACTOR_EVENTS
+            elif name in market_names and structured:
+                est += size * MEM_FACTOR_MARKET
+            else:
+                est += size * MEM_FACTOR_RAW
+        budget = int(self.memory_budget_mb * 1024 * 1024)
+        if self.upload_mode in ("memory", "stream"):
+            return self.upload_mode, est, f"upload_mode set to {self.upload_mode}; estimated peak {_fmt_bytes(est)}"
+        if budget and est > budget:
+            return "stream", est, f"estimated peak {_fmt_bytes(est)} > budget {_fmt_bytes(budget)}"
+        return "memory", est, (f"estimated peak {_fmt_bytes(est)}, budget {_fmt_bytes(budget)}" if budget
+                               else f"estimated peak {_fmt_bytes(est)}, no budget")
+
+    def _stream_events(self, p, meta, report):
+        """Events of ``p`` one at a time after normalize, validation and duplicate removal (exact
+        copies, and repeated keys of DEDUPE_KINDS; nothing is collapsed), run on an EventTable per
+        STREAM_BATCH events (the in-memory path's steps, so the dicts come out the same).
+        ``report`` collects the counts."""
+        import epoch_stream
+        from epoch_table import EventTable
+        seen, seen_keys = set(), set()
+        dd = report["dedupe"]
+
+        def checked(batch):
+            report["parsed"] += len(batch)
+            odd = sum(1 for ev in batch if not isinstance(ev, dict))
+            table = EventTable.from_dicts([ev for ev in batch if isinstance(ev, dict)] if odd else batch)
+            table.normalize()
+            if self.validate:
+                table, vr = epoch_schema.validate_table(table, dict(meta))
+                if odd:
+                    vr["dropped_invalid"]["?"] += odd
+                report["schema_version"] = vr["schema_version"]
+                for k in ("dropped_by_realm", "dropped_invalid", "missing"):
+                    report[k].update(vr[k])
+            if self.dedupe:
+                fps, keys = table.fingerprints(), table.dedupe_keys()
+            else:
+                fps = keys = [None] * len(table)
+            for ev, fp, key in zip(table.to_dicts(), fps, keys):
+                if fp is not None:
+                    by_key = key[0] in DEDUPE_KINDS and key[1] is not None
+                    if fp in seen or (by_key and key in seen_keys):
+                        dd["dropped"] += 1
+                        dd["bytes_saved"] += len(json.dumps(ev)) + 2
+                        continue
+                    seen.add(fp)
+                    if by_key:
+                        seen_keys.add(key)
+                yield ev
+
+        batch = []
+        for ev in epoch_stream.iter_events(p, VAR_NAME):
+            batch.append(ev)
+            if len(batch) >= STREAM_BATCH:
+                yield from checked(batch)
+                batch = []
+        yield from checked(batch)
+
+    @staticmethod
+    def _stream_report(meta):
+        return {"schema_version": epoch_schema.schema_version(meta), "parsed": 0,
+                "dropped_by_realm": collections.Counter(), "dropped_invalid": collections.Counter(),
+                "missing": collections.Counter(),
+                "dedupe": {"dropped": 0, "collapsed": 0, "bytes_saved": 0}}
+
+    def _raw_file_info(self, real, path):
+        """Section info for a file sent as raw_lua, plus the text's sha256 (for the upload key)."""
+        import epoch_stream
+        h = hashlib.sha256()
+        size = sum(len(t) for t in epoch_stream.iter_text(path, h))
+        return {"file": real, "mtime": int(os.path.getmtime(path)), "size": size}, h.hexdigest()
+
+    def _do_upload_streaming(self, p, m, manual=False):
+        """Bounded-memory upload: events are read, parsed, checked and written to a spooled body one
+        at a time, and addon files are copied into it as raw text. Sends plain JSON, byte for byte
+        what the in-memory path would send for the same events with raw market files; repeated
+        loot is dropped, not collapsed."""
+        import epoch_stream
+        have_epochhead = os.path.isfile(p)
+        meta, source_digest = {}, b""
+        if have_epochhead:
             try:
-                code, body = _net_call_with_backoff(
-                    lambda: post_upload(SERVER, TOKEN, payload, endpoint=UPLOAD_ENDPOINT)
-                )
+                with m.stage("parse"):
+                    rest, source_digest = epoch_stream.read_rest(p, VAR_NAME)
+                m.bytes_in += os.path.getsize(p)
             except Exception as e:
-                code, body = 0, str(e)
+                self.log(f"Parse error (likely mid-write). Retrying soon… ({e})")
+                self._record_metrics(m.finish(error="parse"))
+                self._requeue_soon()
+                return False
+            meta = dict(rest.get("meta") or {})
+            del rest
+            _normalize_inplace(meta)
+        else:
+            self.log("epochhead.lua not found; continuing with market addon exports only.")
+
+        self._pending_market = {}
+        market, census, sections = {}, None, {}
+        with m.stage("read"):
+            for source, real, path in self._market_files():
+                try:
+                    info, digest = self._raw_file_info(real, path)
+                except Exception as e:
+                    self.log(f"{source} read skipped ({real}): {e}")
+                    continue
+                market[source] = (info, path)
+                sections.setdefault("market_addons", {})[source] = dict(info, raw_sha256=digest)
+            found = self._census_file()
+            if found:
+                try:
+                    info, digest = self._raw_file_info(*found)
+                    census = (info, found[1])
+                    sections["census_addon"] = dict(info, raw_sha256=digest)
+                except Exception as e:
+                    self.log(f"census read skipped ({found[0]}): {e}")
+        m.bytes_in += sum(info["size"] for info, _ in market.values()) + (census[0]["size"] if census else 0)
+        if not have_epochhead and not market and not census:
+            self.log("No uploadable data found (expected epochhead.lua, Auctionator.lua, aux-addon.lua, or EpochCensus.lua).")
+            self._record_metrics(m.finish(error="no_data"))
+            return False
+        if market:
+            self.log("Included market addon data (raw): " + ", ".join(
+                f"{info['file']} ({info['size']} bytes)" for _, (info, _) in sorted(market.items())))
+        if census:
+            self.log(f"Included census addon data: {census[0]['file']} ({census[0]['size']} bytes)")
+
+        key = upload_key(source_digest, sections)
+        m.info["key"] = key
+        if key in self.acked_uploads:
+            self.log(f"This data was already uploaded (key {key[:12]}…); not sending it again.")
+            self._record_metrics(m.finish(error="already_uploaded"))
+            if AUTO_RENAME and have_epochhead:
+                self._rename_uploaded(p)
+            return True
+
+        if self._cancelled(m):
+            return False
+        recorder = self._event_recorder(meta, p) if have_epochhead else None
+        try:
+            report = self._stream_report(meta)
+            m.info["wire"] = "json"
+            with epoch_stream.BodySpool() as spool:
+                spool.write('{"token": ' + json.dumps(TOKEN) + ', "payload": {"events": [')
+                n = 0
+                with m.stage("stream"):
+                    for ev in (self._stream_events(p, meta, report) if have_epochhead else ()):
+                        spool.write((", " if n else "") + json.dumps(ev))
+                        n += 1
+                        if recorder is not None:
+                            recorder = self._record_event(recorder, ev)
+                        if not n % STREAM_BATCH and self._cancel.is_set():
+                            break
+                if self._cancelled(m):
+                    return False
+                m.events = report["parsed"]
+                client_dropped = {}
+                if self.validate and report["parsed"]:
+                    epoch_schema.migrate([], meta)
+                    client_dropped = self._log_validation(report, meta, m)
+                dd = report["dedupe"]
+                if dd["dropped"]:
+                    m.info["dedupe"] = dd
+                    self.log(f"Dedupe: dropped {dd['dropped']} duplicate(s); saved ~{_fmt_bytes(dd['bytes_saved'])} "
+                             "(repeats are not collapsed when streaming)")
+                self._stamp_meta(meta, client_dropped)
+
+                with m.stage("encode"):
+                    spool.write('], "meta": ')
+                    spool.write_json(meta)
+                    if market:
+                        spool.write(', "market_addons": {')
+                        for i, (source, (info, path)) in enumerate(market.items()):
+                            spool.write((", " if i else "") + json.dumps(source) + ": "
+                                        + json.dumps(info)[:-1] + ', "raw_lua": ')
+                            spool.write_raw_string(path)
+                            spool.write("}")
+                        spool.write("}")
+                    if census:
+                        spool.write(', "census_addon": ' + json.dumps(census[0])[:-1] + ', "raw_lua": ')
+                        spool.write_raw_string(census[1])
+                        spool.write("}")
+                    spool.write("}}")
+                    spool.file.flush()
+                m.bytes_out = spool.size
+                self.log(f"Uploading… ({n} events, {_fmt_bytes(spool.size)}, streamed)")
+                shaper = self._shaper(manual)
+                try:
+                    with m.stage("send"):
+                        code, body = self._net(send_upload(SERVER, TOKEN, spool.file, idempotency_key=key,
+                                                           shaper=shaper))
+                except Exception as e:
+                    code, body = 0, str(e)
+                self._log_send(shaper, m)
 
             job_id = None
             if body:
@@ -1000,34 +1992,111 @@ class App(tk.Tk):
                     job_id = json.loads(body).get("job_id")
                 except Exception:
                     pass
-
             if job_id and 200 <= int(code or 0) < 400:
-                def poll():
-                    while True:
-                        time.sleep(1.0)
-                        try:
-                            scode, sbody = _net_call_with_backoff(
-                                lambda: get_upload_status(SERVER, job_id)
-                            )
-                        except Exception as e2:
-                            scode, sbody = 0, str(e2)
-                        finished = False
-                        if sbody:
-                            try:
-                                sj = json.loads(sbody)
-                                finished = bool(sj.get("finished"))
-                            except Exception:
-                                pass
-                        if finished:
-                            self.queue.put(("upload_result", {"path": p, "code": scode, "body": sbody}))
-                            break
-                threading.Thread(target=poll, daemon=True).start()
-            else:
-                self.queue.put(("upload_result", {"path": p, "code": code, "body": body}))
+                with m.stage("server"):
+                    code, body = self._net(wait_for_job_async(SERVER, job_id, should_stop=self._cancel.is_set))
+
+            if 200 <= int(code or 0) < 300:
+                self._ack_upload(key)
+            rec = m.finish(code=code, job_id=job_id)
+            self.last_metrics = m.summary()
+            self._record_metrics(rec)
+            self.log("Upload timings: " + ", ".join(f"{k} {_fmt_secs(v)}" for k, v in m.stages.items())
+                     + f"; in {_fmt_bytes(m.bytes_in)}, out {_fmt_bytes(m.bytes_out)}, {m.events} events"
+                     + (f", peak {_fmt_bytes(rec.get('peak_traced') or rec.get('peak_rss'))}"
+                        if rec.get("peak_traced") or rec.get("peak_rss") else ""))
+
+            if recorder is not None:
+                self._finish_recording(recorder, code, job_id)
+            return self._finish_upload(p, code, body, have_epochhead=have_epochhead, metrics=rec)
+        finally:
+            if recorder is not None:
+                recorder.abort()   # cancelled or failed before the send: keep nothing
+
+    def _net(self, coro):
+        """Run a network coroutine on the shared loop and wait for it; cancel_upload() aborts it."""
+        fut = self.net.submit(coro)
+        while True:
+            try:
+                return fut.result(0.25)
+            except concurrent.futures.TimeoutError:
+                if self._cancel.is_set():
+                    fut.cancel()
+                    return 0, "cancelled"
+
+    def _encode_payload(self, payload, m):
+        """Request body plus its content type (None for plain JSON)."""
+        wire = self.wire_format
+        if wire == "columnar" or (wire == "auto" and server_accepts_wire(SERVER, epoch_wire.WIRE_COLUMNAR)):
+            try:
+                with m.stage("encode"):
+                    data = epoch_wire.encode_body(TOKEN, payload)
+                m.info["wire"] = epoch_wire.WIRE_COLUMNAR
+                return data, epoch_wire.CONTENT_TYPE_COLUMNAR
+            except Exception as e:
+                logging.warning("compact encoding failed, using JSON: %s", e)
+        with m.stage("encode"):
+            data = self._encode_json(payload, m)
+        m.info["wire"] = "json"
+        return data, None
+
+    def _shaper(self, manual):
+        """Pacing for this upload: automatic uploads get the configured cap and adaptive mode;
+        manual ones run at full speed (still measured) unless manual_full_speed is off."""
+        if manual and self.manual_full_speed:
+            return BandwidthShaper()
+        return BandwidthShaper(self.upload_rate_kbps * 1024 or None, adaptive=self.upload_adaptive)
+
+    def _log_send(self, shaper, m):
+        rep = shaper.report()
+        m.info["send"] = rep
+        if not rep["bytes"]:
+            return
+        bits = [f"sent {_fmt_bytes(rep['bytes'])} in {_fmt_secs(rep['seconds'])}"]
+        if rep["throughput_bps"]:
+            bits[0] += f" ({_fmt_bytes(rep['throughput_bps'])}/s)"
+        if shaper.shaping:
+            if rep["cap_bps"]:
+                bits.append(f"cap {_fmt_bytes(rep['cap_bps'])}/s")
+            if rep["backoffs"]:
+                bits.append(f"backed off {rep['backoffs']}x to {_fmt_bytes(rep['final_rate_bps'])}/s")
+            bits.append(f"queued {_fmt_secs(rep['queue_delay_s'])}")
+        else:
+            bits.append("full speed")
+        if rep["rtt_avg_s"] is not None:
+            bits.append(f"send delay avg {_fmt_secs(rep['rtt_avg_s'])}, max {_fmt_secs(rep['rtt_max_s'])}")
+        self.log("Send: " + ", ".join(bits))
+
+    def _encode_json(self, payload, m=None):
+        """``encode_upload_body(TOKEN, payload)``; large event lists are encoded in a process pool."""
+        if self._encoder is None:
+            self._encoder = epoch_encode.ShardedEncoder(self.encode_workers)
+        if not self._encoder.parallel_for(payload.get("events")):
+            return encode_upload_body(TOKEN, payload)
+        if m is not None:
+            m.info["encode_workers"] = self._encoder.workers
+        return self._encoder.encode_body(TOKEN, payload)
+
+    def _ack_upload(self, key):
+        self.acked_uploads = [k for k in self.acked_uploads if k != key][-(ACKED_UPLOADS_MAX - 1):] + [key]
+        cfg = load_config(); cfg["acked_uploads"] = self.acked_uploads; save_config(cfg)
+
+    def _rename_uploaded(self, p):
+        try:
+            new_name = time.strftime("epochhead_upload%Y%m%d-%H%M%S.lua", time.localtime())
+            new_path = os.path.join(self.sv_dir, new_name)
+            os.replace(p, new_path)
+            self.log(f"Renamed uploaded file -> {new_name}")
+            self._forget_sig()
+            self.cleanup_old_uploads()
+        except Exception as e:
+            self.log(f"Rename failed: {e}")
 
-        threading.Thread(target=worker, daemon=True).start()
+    def _record_metrics(self, rec):
+        if self.metrics_enabled:
+            write_metrics(rec)
 
-    def _finish_upload(self, p, code, body):
+    def _finish_upload(self, p, code, body, *, have_epochhead=True, metrics=None):
         ok = 200 <= int(code or 0) < 300
         self.server_ok = bool(ok)
 
@@ -1059,16 +2128,10 @@ class App(tk.Tk):
             do_warn = bool(av.get("warn"))
             if do_warn and client and target:
                 warn = f"Addon {client} is behind target {target}. Please update."
-        if warn:
-            self._show_banner(warn)
-        else:
-            self._hide_banner()
 
-        # Update status strip
         self._last_upload_ts = int(time.time())
-        self._set_status_line()
 
-        self._log(f"Upload -> {code}")
+        self.log(f"Upload -> {code}")
         summary_bits = []
         if self.created is not None:
             summary_bits.append(f"{self.created} created")
@@ -1081,11 +2144,11 @@ class App(tk.Tk):
         if self.kept is not None:
             summary_bits.append(f"{self.kept} kept")
         if summary_bits:
-            self._log(", ".join(summary_bits).capitalize())
+            self.log(", ".join(summary_bits).capitalize())
         elif body:
             try:
                 preview = (body[:600] + ("…" if len(body) > 600 else "")).replace("\n", " ").strip()
-                self._log(preview)
+                self.log(preview)
             except Exception:
                 pass
 
@@ -1104,31 +2167,130 @@ class App(tk.Tk):
                 else:
                     mf_bits.append(str(file_name))
             if mf_bits:
-                self._log("Market file upload stats: " + ", ".join(mf_bits))
+                self.log("Market file upload stats: " + ", ".join(mf_bits))
 
         if ok and AUTO_RENAME and have_epochhead:
-            try:
-                new_name = time.strftime("epochhead_upload%Y%m%d-%H%M%S.lua", time.localtime())
-                new_path = os.path.join(self.sv_dir, new_name)
-                os.replace(p, new_path)
-                self._log(f"Renamed uploaded file -> {new_name}")
-                self._last_sig = None
-                self._last_success_at = time.time()
-                self._cleanup_old_uploads()
-            except Exception as e:
-                self._log(f"Rename failed: {e}")
-        elif ok:
-            self._last_success_at = time.time()
-
-        self._uploading = False
+            self._rename_uploaded(p)
+
+        self.notify("upload_done", {
+            "code": code, "ok": ok, "warn": warn, "ts": self._last_upload_ts,
+            "created": self.created, "updated": self.updated, "dropped": self.dropped,
+            "duplicates": self.duplicates, "kept": self.kept,
+            "metrics": metrics, "metrics_summary": self.last_metrics,
+        })
+        return ok
+
+# --------------- Headless daemon ---------------
+class _StructuredFormatter(logging.Formatter):
+    """One JSON object per line: ts, level, msg plus any ``event``/``data`` extras."""
+
+    def format(self, record):
+        out = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(record.created)) + f".{int(record.msecs):03d}",
+            "level": record.levelname,
+            "msg": record.getMessage(),
+        }
+        ev = getattr(record, "event", None)
+        if ev:
+            out["event"] = ev
+        data = getattr(record, "data", None)
+        if isinstance(data, dict):
+            out.update({k: v for k, v in data.items() if k not in out})
+        if record.exc_info:
+            out["exc"] = self.formatException(record.exc_info)
+        return json.dumps(out, ensure_ascii=False, default=str)
+
+def _init_headless_log():
+    h = logging.StreamHandler(sys.stdout)
+    h.setFormatter(_StructuredFormatter())
+    logging.getLogger().addHandler(h)
+
+def run_headless(args):
+    """Watch/parse/upload loop without Tk. Exits cleanly on SIGINT/SIGTERM."""
+    import signal
+    t0 = time.perf_counter()
+    _init_headless_log()
+
+    def notify(kind, data):
+        if kind == "upload_done":
+            logging.info("upload finished", extra={"event": kind, "data": data})
+
+    cfg = load_config()
+    if args.sv_dir:
+        cfg["sv_dir"] = args.sv_dir
+    core = UploaderCore(cfg, notify=notify)
+    core.auto_upload = True  # the daemon exists to upload; the GUI toggle doesn't apply here
+    if args.profile_next:
+        core.profile_next_upload(memory=args.profile_memory)
+    if not core._valid_dir(core.sv_dir):
+        logging.error("SavedVariables folder not set or missing; pass --sv-dir",
+                      extra={"event": "config_error", "data": {"sv_dir": core.sv_dir}})
+        return 2
+
+    if args.once:
+        return 0 if core.upload_now() else 1
+
+    stop = threading.Event()
+    def _on_signal(signum, _frame):
+        logging.info("signal received; shutting down", extra={"event": "signal", "data": {"signum": signum}})
+        stop.set()
+    for name in ("SIGINT", "SIGTERM", "SIGBREAK", "SIGHUP"):
+        sig = getattr(signal, name, None)
+        if sig is not None:
+            try: signal.signal(sig, _on_signal)
+            except (ValueError, OSError): pass
+
+    core.start()
+    logging.info("headless uploader ready", extra={"event": "ready", "data": {
+        "sv_dir": core.sv_dir, "startup_ms": round((time.perf_counter() - t0) * 1000, 1), "pid": os.getpid()}})
+    while not stop.wait(0.5):
+        pass
+    clean = core.stop(wait=30.0)
+    logging.info("stopped", extra={"event": "stopped", "data": {"clean": clean}})
+    return 0 if clean else 1
 
 # --------------- Entrypoint ---------------
-def main():
+def main(argv=None):
+    import multiprocessing
+    multiprocessing.freeze_support()  # frozen builds: pool children re-enter here
+    argv = sys.argv[1:] if argv is None else list(argv)
+    if argv and argv[0] == "query":
+        sys.exit(epoch_store.main(argv[1:], default_path=STORE_PATH))
+    if argv and argv[0] == "bulk":
+        import epoch_bulk
+        _init_file_log()
+        sys.exit(epoch_bulk.main(argv[1:], default_manifest=os.path.join(APPDATA_DIR, epoch_bulk.MANIFEST_NAME)))
+
+    import argparse
+    ap = argparse.ArgumentParser(prog="epoch_uploader", description=f"{APP_NAME} {APP_VERSION}")
+    ap.add_argument("--headless", action="store_true", help="run the watcher/uploader without a window")
+    ap.add_argument("--sv-dir", help="SavedVariables folder (overrides config; headless only)")
+    ap.add_argument("--once", action="store_true", help="headless: upload once and exit")
+    ap.add_argument("--silent", action="store_true", help="start minimized to tray without notices")
+    ap.add_argument("--profile-next", action="store_true", help=argparse.SUPPRESS)    # cProfile the next upload
+    ap.add_argument("--profile-memory", action="store_true", help=argparse.SUPPRESS)  # ... with tracemalloc
+    args, _unknown = ap.parse_known_args(argv)
+    _init_file_log()
+
+    if args.headless:
+        sys.exit(run_headless(args))
+
     hMutex, already = _windows_mutex_singleton()
     if already:
         _send_activation_ping()
         return
-    app = App()
+    cfg = load_config()
+    if (args.silent or cfg.get("start_minimized", DEFAULT_START_MINIMIZED)) and os.path.isdir(cfg.get("sv_dir") or ""):
+        # Fast start: watcher + tray now, Tk only once the window is restored.
+        import epoch_tray
+        mode = epoch_tray.TrayMode(cfg, silent=args.silent)
+        if args.profile_next:
+            mode.core.profile_next_upload(memory=args.profile_memory)
+        sys.exit(mode.run())
+    import epoch_uploader_gui  # Tk is only needed for the window
+    app = epoch_uploader_gui.App(silent=args.silent)
+    if args.profile_next:
+        app.core.profile_next_upload(memory=args.profile_memory)
     app.mainloop()
 
 if __name__ == "__main__":
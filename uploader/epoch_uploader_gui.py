@@ -0,0 +1,331 @@
+#!/usr/bin/env python3
+# EpochHead Uploader — Tk front-end
+# - Thin client of epoch_uploader.UploaderCore (watcher, parser and network live there)
+# - Core callbacks arrive on worker threads and are marshalled through self.queue;
+#   log lines go through a ring buffer flushed to the widget in batches (LOG_FLUSH_MS)
+# - Tray icon via pystray/Pillow when available (epoch_tray.py; also the Tk-free fast-start mode)
+
+import os, time, queue
+import tkinter as tk
+from tkinter import ttk, messagebox, filedialog
+
+from epoch_uploader import (
+    APP_NAME, APP_VERSION, LOG_PATH, LOG_MAX_LINES, LOG_FLUSH_MS, LogRing,
+    DEFAULT_START_WITH_WIN, DEFAULT_START_MINIMIZED, DEFAULT_START_SILENT,
+    UploaderCore, load_config, save_config, get_autostart_enabled, set_autostart,
+    _ensure_appdata, _start_activation_listener, report_startup,
+)
+
+from epoch_tray import Tray
+
+class App(tk.Tk):
+    def __init__(self, silent=False, core=None, log_ring=None, tray=None):
+        """``core``/``log_ring``/``tray`` come from a running TrayMode when the
+        window is built on first restore; otherwise the app creates its own."""
+        super().__init__()
+        self.title(f"{APP_NAME}")
+        self.geometry("840x560")
+        self.minsize(760, 500)
+
+        self.queue = queue.Queue()
+        # Log lines skip the event queue: they collect in a ring buffer that
+        # _flush_log writes to the widget in one batch every LOG_FLUSH_MS.
+        self.log_ring = log_ring or LogRing(LOG_MAX_LINES - 1)  # room for the "lines not shown" notice
+        cfg = load_config()
+        adopted = core is not None
+        if adopted:
+            self.core = core
+            self.core.notify = self._on_core_event
+        else:
+            self.core = UploaderCore(cfg, notify=self._on_core_event)
+
+        self.start_with_windows = bool(cfg.get("autostart", DEFAULT_START_WITH_WIN))
+        self.start_minimized = bool(cfg.get("start_minimized", DEFAULT_START_MINIMIZED))
+        self.start_silent = bool(cfg.get("start_silent", DEFAULT_START_SILENT))
+
+        # CLI override for silent/minimized startup (useful from task scheduler).
+        if silent:
+            self.start_minimized = True
+            self.start_silent = True
+
+        self.warn_banner_var = tk.StringVar(value="")
+        self.status_line_var = tk.StringVar(value="Idle")
+        self.meta_player_var = tk.StringVar(value="")
+        self.tray = tray or Tray(on_restore=lambda: self.queue.put(("show", {})),
+                                 on_exit=lambda: self.queue.put(("exit", {})),
+                                 on_cancel=lambda: self.queue.put(("cancel", {})))
+
+        self._build_ui()
+
+        if not self.core._valid_dir(self.core.sv_dir):
+            self.after(250, lambda: self._choose_sv_dir(initial=True))
+
+        self.protocol("WM_DELETE_WINDOW", self._on_close_hide)
+        # Support shortcuts (not in the UI): profile the next upload, optionally with memory snapshots.
+        self.bind_all("<Control-Shift-P>", lambda _e: self.core.profile_next_upload())
+        self.bind_all("<Control-Shift-M>", lambda _e: self.core.profile_next_upload(memory=True))
+        self.after(200, self._pump_queue)
+        self.after(LOG_FLUSH_MS, self._flush_log)
+        if adopted:
+            return  # already watching, listening for activation and showing the tray icon
+        self.core.start()
+        _start_activation_listener(lambda: self.queue.put(("show", {})))
+        self._ensure_tray_icon()
+
+        if self.start_minimized:
+            self.after(50, self.withdraw)
+        self.after_idle(lambda: report_startup("window", record=self.core.metrics_enabled))
+
+        if self.core.sv_dir:
+            self._log(f"Watching folder: {self.core.sv_dir}")
+            self.core.log_target_files()
+        else:
+            self._log("Select your SavedVariables folder (e.g. GAMEDIR\\WTF\\Account\\ACCOUNTNAME\\SavedVariables).")
+
+    # ---------------- UI ----------------
+    def _build_ui(self):
+        root = ttk.Frame(self, padding=12)
+        root.pack(fill="both", expand=True)
+
+        # Banner (hidden until needed)
+        self.banner = ttk.Frame(root)
+        self.banner.pack(fill="x", side="top")
+        self.banner_label = tk.Label(self.banner, textvariable=self.warn_banner_var, fg="#1a1a00",
+                                     bg="#ffec99", padx=10, pady=6, anchor="w", justify="left")
+        self.banner_label.pack(fill="x")
+        self._hide_banner()
+
+        # Path row
+        row = ttk.Frame(root); row.pack(fill="x")
+        ttk.Label(row, text="SavedVariables folder:", font=("Segoe UI", 10, "bold")).pack(side="left")
+        self.path_var = tk.StringVar(value=self.core.sv_dir or "")
+        e = ttk.Entry(row, textvariable=self.path_var, state="readonly")
+        e.pack(side="left", fill="x", expand=True, padx=8)
+        ttk.Button(row, text="Change…", command=self._choose_sv_dir).pack(side="left")
+
+        # Top controls row
+        bar = ttk.Frame(root); bar.pack(fill="x", pady=(10, 8))
+        ttk.Button(bar, text="Upload now", command=lambda: self.queue.put(("upload", {"manual": True}))).pack(side="left")
+        ttk.Button(bar, text="Cancel upload", command=lambda: self.queue.put(("cancel", {}))).pack(side="left", padx=(6,0))
+
+        self.auto_upload_var = tk.BooleanVar(value=self.core.auto_upload)
+        self.autostart_var   = tk.BooleanVar(value=self.start_with_windows)
+        self.pause_var       = tk.BooleanVar(value=self.core.pause_watching)
+        self.minimized_var   = tk.BooleanVar(value=self.start_minimized)
+        self.silent_var      = tk.BooleanVar(value=self.start_silent)
+
+        ttk.Checkbutton(bar, text="Auto-upload", variable=self.auto_upload_var,
+                        command=self._toggle_auto).pack(side="left", padx=(10,0))
+        ttk.Checkbutton(bar, text="Start with Windows", variable=self.autostart_var,
+                        command=self._toggle_autostart).pack(side="left", padx=(10,0))
+        ttk.Checkbutton(bar, text="Start minimized", variable=self.minimized_var,
+                        command=self._toggle_start_minimized).pack(side="left", padx=(10,0))
+        ttk.Checkbutton(bar, text="Start silently", variable=self.silent_var,
+                        command=self._toggle_start_silent).pack(side="left", padx=(10,0))
+        ttk.Checkbutton(bar, text="Pause watching", variable=self.pause_var,
+                        command=self._toggle_pause).pack(side="left", padx=(10,0))
+
+        ttk.Button(bar, text="Open SV Folder", command=self._open_sv_folder).pack(side="left", padx=(10,0))
+        ttk.Button(bar, text="Open Log", command=self._open_log).pack(side="left", padx=(10,0))
+        ttk.Button(bar, text="Clean old uploads", command=self.core.cleanup_old_uploads).pack(side="left", padx=(10,0))
+
+        # Status strip
+        meta = ttk.Frame(root); meta.pack(fill="x", pady=(4, 8))
+        ttk.Label(meta, textvariable=self.status_line_var).pack(side="left")
+        ttk.Label(meta, textvariable=self.meta_player_var, foreground="#56b1ff").pack(side="right")
+
+        # Log area
+        box = ttk.LabelFrame(root, text="Recent activity")
+        box.pack(fill="both", expand=True)
+        self.log = tk.Text(box, height=18, wrap="word")
+        self.log.pack(fill="both", expand=True)
+        self.log.configure(state="disabled")
+
+        # Footer
+        ttk.Label(root, text=f"Close window to minimize to tray (single-instance).  v{APP_VERSION}",
+                  foreground="#888").pack(anchor="w", pady=(8, 0))
+
+        try: self.tk.call("tk", "scaling", 1.15)
+        except Exception: pass
+
+    def _show_banner(self, msg: str):
+        self.warn_banner_var.set(msg or "")
+        self.banner_label.configure(bg="#ffec99")
+        self.banner.pack(fill="x")
+        self.banner_label.update_idletasks()
+
+    def _hide_banner(self):
+        self.warn_banner_var.set("")
+        self.banner.forget()
+
+    def _set_status_line(self):
+        c = self.core
+        t = time.strftime("%H:%M:%S", time.localtime(c._last_upload_ts)) if c._last_upload_ts else "—"
+        created = "—" if c.created is None else str(c.created)
+        updated = "—" if c.updated is None else str(c.updated)
+        dropped = "—" if c.dropped is None else str(c.dropped)
+        server  = "OK" if c.server_ok else ("Error" if c.server_ok is not None else "—")
+        line = f"Last upload: {t} • Created: {created}  Updated: {updated}  Dropped: {dropped} • Server: {server}"
+        if c.last_metrics:
+            line += f" • {c.last_metrics}"
+        self.status_line_var.set(line)
+
+    def _log(self, s):
+        # Goes through the core so the line also reaches the file log; it comes
+        # back through the log ring.
+        self.core.log(s)
+
+    def _on_core_event(self, kind, data):
+        # Called from core threads.
+        if kind == "log":
+            self.log_ring.push(f"[{time.strftime('%H:%M:%S')}] {data.get('msg', '')}")
+        else:
+            self.queue.put((kind, data))
+
+    def _flush_log(self):
+        # While hidden the ring keeps the newest lines; they are shown on restore.
+        if self.state() != "withdrawn":
+            lines, dropped = self.log_ring.drain()
+            if lines:
+                if dropped:
+                    lines.insert(0, f"[…] {dropped} earlier line(s) not shown; see the log file.")
+                self.log.configure(state="normal")
+                self.log.insert("end", "\n".join(lines) + "\n")
+                try:
+                    excess = int(self.log.index("end-1c").split(".")[0]) - 1 - LOG_MAX_LINES
+                    if excess > 0:
+                        self.log.delete("1.0", f"{excess + 1}.0")
+                except Exception:
+                    pass
+                self.log.see("end"); self.log.configure(state="disabled")
+        self.after(LOG_FLUSH_MS, self._flush_log)
+
+    def _ensure_tray_icon(self):
+        msg = self.tray.start()
+        if msg:
+            self._log(msg)
+
+    def _stop_tray_icon(self):
+        self.tray.stop()
+
+    # ---------------- Events/queue ----------------
+    def _on_close_hide(self):
+        # Keep app running background and show tray icon.
+        self._ensure_tray_icon()
+        if not self.start_silent:
+            try:
+                messagebox.showinfo(APP_NAME, "Uploader is still running in the system tray.")
+            except Exception:
+                pass
+        self.withdraw()
+
+    def _exit_app(self):
+        self.core.stop()
+        self._stop_tray_icon()
+        self.destroy()
+
+    def _on_upload_done(self, info):
+        if info.get("warn"):
+            self._show_banner(info["warn"])
+        else:
+            self._hide_banner()
+        self._set_status_line()
+
+    def _pump_queue(self):
+        try:
+            while True:
+                item = self.queue.get_nowait()
+                if isinstance(item, tuple):
+                    kind, payload = item
+                else:
+                    kind, payload = item, {}
+                if kind == "upload":
+                    self.core.request_upload(manual=bool(payload.get("manual")))
+                elif kind == "cancel":
+                    self.core.cancel_upload()
+                elif kind == "upload_done":
+                    self._on_upload_done(payload)
+                elif kind == "player":
+                    self.meta_player_var.set(payload.get("text") or "")
+                elif kind == "show":
+                    self.deiconify()
+                    try: self.lift(); self.focus_force()
+                    except Exception: pass
+                elif kind == "exit":
+                    self._exit_app()
+                    return
+        except queue.Empty:
+            pass
+        self.after(200, self._pump_queue)
+
+    # ---------------- Toggles ----------------
+    def _toggle_auto(self):
+        self.core.auto_upload = bool(self.auto_upload_var.get())
+        cfg = load_config(); cfg["auto_upload"] = self.core.auto_upload; save_config(cfg)
+        self._log(f"Auto-upload {'enabled' if self.core.auto_upload else 'disabled'}.")
+
+    def _toggle_autostart(self):
+        want = bool(self.autostart_var.get())
+        ok = set_autostart(want)
+        if not ok:
+            # revert UI checkbox if failed
+            self.autostart_var.set(get_autostart_enabled())
+        cfg = load_config(); cfg["autostart"] = bool(self.autostart_var.get()); save_config(cfg)
+        self._log(f"Start with Windows {'enabled' if self.autostart_var.get() else 'disabled'}.")
+
+    def _toggle_pause(self):
+        self.core.pause_watching = bool(self.pause_var.get())
+        cfg = load_config(); cfg["pause_watching"] = self.core.pause_watching; save_config(cfg)
+        self._log(f"Watching {'paused' if self.core.pause_watching else 'resumed'}.")
+
+    def _toggle_start_minimized(self):
+        self.start_minimized = bool(self.minimized_var.get())
+        cfg = load_config(); cfg["start_minimized"] = self.start_minimized; save_config(cfg)
+        self._log(f"Start minimized {'enabled' if self.start_minimized else 'disabled'}.")
+
+    def _toggle_start_silent(self):
+        self.start_silent = bool(self.silent_var.get())
+        cfg = load_config(); cfg["start_silent"] = self.start_silent; save_config(cfg)
+        self._log(f"Start silently {'enabled' if self.start_silent else 'disabled'}.")
+
+    def _open_sv_folder(self):
+        try:
+            if self.core._valid_dir(self.core.sv_dir):
+                os.startfile(self.core.sv_dir)
+            else:
+                messagebox.showwarning(APP_NAME, "No SavedVariables folder selected yet.")
+        except Exception as e:
+            self._log(f"Open SV folder failed: {e}")
+
+    def _open_log(self):
+        try:
+            _ensure_appdata()
+            if not os.path.exists(LOG_PATH):
+                with open(LOG_PATH, "a", encoding="utf-8"): pass
+            os.startfile(LOG_PATH)
+        except Exception as e:
+            self._log(f"Open log failed: {e}")
+
+    # ---------------- Paths ----------------
+    def _choose_sv_dir(self, initial=False):
+        start_dir = os.path.join(os.path.expanduser("~"), "Documents")
+        title = "Select your SavedVariables folder (e.g. GAMEDIR\\WTF\\Account\\ACCOUNTNAME\\SavedVariables)"
+        d = filedialog.askdirectory(
+            initialdir=start_dir if os.path.isdir(start_dir) else os.path.expanduser("~"),
+            title=title,
+            mustexist=True,
+        )
+        if d:
+            self.path_var.set(d)
+            self.core.set_sv_dir(d)
+        elif initial and not self.core.sv_dir:
+            self._log("No folder selected. Use 'Change…' to pick the SavedVariables folder.")
+
+# --------------- Entrypoint ---------------
+def main():
+    # Same CLI as epoch_uploader.py (this file is the PyInstaller entry point).
+    import epoch_uploader
+    epoch_uploader.main()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+# EpochHead compact wire format ("eh-columnar/1")
+# - Events grouped by kind, one array per field instead of one object per event
+# - Per-upload key dictionary and string pool; strings are sent once and referenced by index
+# - Integer columns are delta-encoded (timestamps shrink to small numbers)
+# - Lossless round trip via decode_events(); None values count as absent (Lua tables cannot hold nil)
+#
+# Negotiation: every plain-JSON upload carries WIRE_OFFER_HEADER; a server that can read the compact
+# form answers with WIRE_ACCEPT_HEADER listing it, and later uploads switch over. A 400/415 answer to
+# a compact body makes the client fall back to JSON. WIRE_COLLAPSE is negotiated the same way: only a
+# server that lists it gets repeated loot folded into one event with "count"/"tLast".
+
+import json
+from itertools import accumulate, chain, repeat
+from operator import sub
+
+WIRE_COLUMNAR      = "eh-columnar/1"
+WIRE_COLLAPSE      = "eh-collapse/1"  # events may carry "count" and "tLast"
+CONTENT_TYPE_JSON  = "application/json"
+CONTENT_TYPE_COLUMNAR = "application/vnd.epochhead.columnar+json"
+WIRE_OFFER_HEADER  = "X-Epoch-Wire-Offer"
+WIRE_ACCEPT_HEADER = "X-Epoch-Wire-Accept"
+
+_EMPTY = {}
+_NONE = type(None)
+
+def _ref(pool, s):
+    # Pools are dicts in insertion order, so the index is the size before inserting.
+    return pool.setdefault(s, len(pool))
+
+# --------------- Encoding ---------------
+def _encode_columns(rows, keys, strings, skip=None):
+    """Columns for a list of dict-or-None rows, in first-seen key order."""
+    rows = [r or _EMPTY for r in rows]
+    order = dict.fromkeys(chain.from_iterable(rows))
+    order.pop(skip, None)
+    cols = []
+    for k in order:
+        vals = list(map(dict.get, rows, repeat(k)))
+        if isinstance(k, str):
+            cols.append(_encode_column(_ref(keys, k), vals, keys, strings))
+        else:
+            # Non-string keys (numeric Lua keys) are rare; keep them verbatim.
+            cols.append({"rk": k, "t": "v", "d": vals})
+    return cols
+
+def _encode_column(kidx, vals, keys, strings):
+    types = set(map(type, vals))
+    types.discard(_NONE)
+    if not types:
+        return {"k": kidx, "t": "v", "d": vals}
+    if types == {str}:
+        for v in dict.fromkeys(vals):
+            if v is not None and v not in strings:
+                strings[v] = len(strings)
+        return {"k": kidx, "t": "s", "d": list(map(strings.get, vals))}
+    if types == {int}:
+        if None not in vals:
+            return {"k": kidx, "t": "i", "d": list(map(sub, vals, [0] + vals[:-1]))}
+        out, prev = [], 0
+        for v in vals:
+            if v is None:
+                out.append(None)
+            else:
+                out.append(v - prev); prev = v
+        return {"k": kidx, "t": "i", "d": out}
+    present = [v for v in vals if v is not None]
+    if types == {dict} and all(present):
+        return {"k": kidx, "t": "o", "c": _encode_columns(vals, keys, strings)}
+    if types == {list}:
+        flat = [e for v in present for e in v]
+        if set(map(type, flat)) <= {dict} and all(flat):
+            return {"k": kidx, "t": "l", "d": [None if v is None else len(v) for v in vals],
+                    "c": _encode_columns(flat, keys, strings)}
+    return {"k": kidx, "t": "v", "d": vals}
+
+def encode_events(events):
+    """Columnar document for a list of event dicts. Raises ValueError for anything else."""
+    keys, strings = {}, {}
+    groups, by_kind, order = [], {}, []
+    for ev in events:
+        if not isinstance(ev, dict):
+            raise ValueError("columnar encoding needs dict events")
+        kind = ev.get("type")
+        kind = kind if isinstance(kind, str) else None
+        gi = by_kind.get(kind)
+        if gi is None:
+            gi = by_kind[kind] = len(groups)
+            groups.append((kind, []))
+        groups[gi][1].append(ev)
+        # Run-length encoded group sequence: [group, run, group, run, ...]
+        if order and order[-2] == gi:
+            order[-1] += 1
+        else:
+            order += [gi, 1]
+    out_groups = []
+    for kind, rows in groups:
+        out_groups.append({"kind": None if kind is None else _ref(strings, kind), "n": len(rows),
+                           "cols": _encode_columns(rows, keys, strings, skip="type" if kind is not None else None)})
+    return {"v": 1, "n": len(events), "keys": list(keys), "strings": list(strings),
+            "groups": out_groups, "order": order}
+
+def encode_body(token, payload):
+    """Request body for the compact format: payload["events"] replaced by the columnar document."""
+    body = dict(payload)
+    body["events"] = encode_events(payload.get("events") or [])
+    return json.dumps({"token": token, "format": WIRE_COLUMNAR, "payload": body},
+                      separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+# --------------- Decoding ---------------
+def _decode_columns(cols, n, keys, strings):
+    rows = [{} for _ in range(n)]
+    for c in cols:
+        name = keys[c["k"]] if "k" in c else c["rk"]
+        for row, v in zip(rows, _decode_column(c, n, keys, strings)):
+            if v is not None:
+                row[name] = v
+    return rows
+
+def _decode_column(c, n, keys, strings):
+    t = c["t"]
+    if t == "s":
+        return [None if i is None else strings[i] for i in c["d"]] if None in c["d"] else \
+               list(map(strings.__getitem__, c["d"]))
+    if t == "i":
+        if None not in c["d"]:
+            return list(accumulate(c["d"]))
+        out, prev = [], 0
+        for d in c["d"]:
+            if d is None:
+                out.append(None)
+            else:
+                prev += d; out.append(prev)
+        return out
+    if t == "o":
+        return [r or None for r in _decode_columns(c["c"], n, keys, strings)]
+    if t == "l":
+        lens = c["d"]
+        flat = _decode_columns(c["c"], sum(x for x in lens if x), keys, strings)
+        out, pos = [], 0
+        for ln in lens:
+            if ln is None:
+                out.append(None)
+            else:
+                out.append(flat[pos:pos + ln]); pos += ln
+        return out
+    return c["d"]
+
+def decode_events(doc):
+    """Inverse of encode_events(): the original event dicts, in the original order."""
+    keys, strings = doc["keys"], doc["strings"]
+    decoded = []
+    for g in doc["groups"]:
+        kind = None if g["kind"] is None else strings[g["kind"]]
+        rows = _decode_columns(g["cols"], g["n"], keys, strings)
+        if kind is not None:
+            rows = [dict({"type": kind}, **r) for r in rows]
+        decoded.append(iter(rows))
+    order = doc["order"]
+    out = []
+    for i in range(0, len(order), 2):
+        it = decoded[order[i]]
+        out.extend(next(it) for _ in range(order[i + 1]))
+    return out
+
+def decode_body(data):
+    """Parse a request body in either format; returns ``(token, payload)`` with plain event dicts."""
+    doc = json.loads(data)
+    payload = doc.get("payload") or {}
+    if doc.get("format") == WIRE_COLUMNAR:
+        payload = dict(payload)
+        payload["events"] = decode_events(payload.get("events") or {"keys": [], "strings": [], "groups": [], "order": []})
+    return doc.get("token"), payload
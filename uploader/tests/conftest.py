@@ -0,0 +1,42 @@
+# Shared setup: the modules live flat in uploader/, and APPDATA_DIR must point at a scratch
+# directory before epoch_uploader is imported (config, metrics and the event store go there).
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ["APPDATA"] = tempfile.mkdtemp(prefix="epoch_tests_")
+
+import pytest
+
+import epoch_uploader as core
+import epoch_fixtures as fx
+
+@pytest.fixture
+def stub_server():
+    with fx.StubServer() as srv:
+        yield srv
+
+@pytest.fixture
+def sv_dir(tmp_path):
+    """A SavedVariables folder with a small epochhead.lua and market files."""
+    fx.write_fixtures(str(tmp_path), n_events=300, n_market_items=100)
+    return str(tmp_path)
+
+@pytest.fixture
+def clean_config():
+    """Start each test from an empty config.json."""
+    if os.path.exists(core.CONFIG_PATH):
+        os.remove(core.CONFIG_PATH)
+    yield
+    if os.path.exists(core.CONFIG_PATH):
+        os.remove(core.CONFIG_PATH)
+
+@pytest.fixture
+def upload_core(sv_dir, stub_server, monkeypatch):
+    """An UploaderCore reading ``sv_dir`` and uploading to the stub server."""
+    monkeypatch.setattr(core, "SERVER", stub_server.url)
+    monkeypatch.setattr(core, "AUTO_RENAME", False)
+    uc = core.UploaderCore({"sv_dir": sv_dir, "metrics": False, "record_events": False})
+    yield uc
+    uc.stop()
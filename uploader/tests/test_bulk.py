@@ -0,0 +1,129 @@
+import json
+import os
+import threading
+
+import epoch_uploader as core
+import epoch_bulk
+import epoch_fixtures as fx
+
+def _archive(tmp_path, seeds, n_events=120):
+    d = tmp_path / "archive"
+    d.mkdir()
+    for i, seed in enumerate(seeds):
+        db = fx.make_epochhead_db(n_events, seed=seed, t0=1_700_000_000 + seed * 1_000_000)
+        (d / f"epochhead_{i:02d}.lua").write_text(fx.to_lua({"epochheadDB": db}), encoding="utf-8")
+    return epoch_bulk.expand_inputs([str(d)])
+
+class FakeSend:
+    """Stands in for core.send_upload; fails the uploads whose index is in ``fail``."""
+
+    def __init__(self, fail=(), delay=0.0, gate=None):
+        self.fail = set(fail)
+        self.delay = delay
+        self.gate = gate        # threading.Event the first upload waits for
+        self.calls = 0
+        self.done = 0
+        self.lock = threading.Lock()
+
+    async def __call__(self, server, token, body, content_type=None, idempotency_key=None, shaper=None):
+        import asyncio
+        with self.lock:
+            n = self.calls; self.calls += 1
+        if self.gate is not None and n == 0:
+            await asyncio.get_running_loop().run_in_executor(None, self.gate.wait, 10)
+        await asyncio.sleep(self.delay)
+        with self.lock:
+            self.done += 1
+        return (400, "rejected") if n in self.fail else (200, "{}")
+
+def _fps_on_disk(manifest_path):
+    with open(os.path.splitext(manifest_path)[0] + ".fp", "rb") as f:
+        data = f.read()
+    return {data[i:i + 8] for i in range(0, len(data), 8)}
+
+def test_bulk_end_to_end_and_resume(tmp_path, stub_server):
+    paths = _archive(tmp_path, [1, 2])
+    man = str(tmp_path / "manifest.json")
+    assert epoch_bulk.run_bulk(paths, manifest_path=man, jobs=1, server=stub_server.url, token="t")
+    assert stub_server.requests == 2
+    files = json.load(open(man))["files"]
+    assert {r["status"] for r in files.values()} == {"uploaded"}
+    assert len(_fps_on_disk(man)) == sum(r["events"] for r in files.values())
+
+    assert epoch_bulk.run_bulk(paths, manifest_path=man, jobs=1, server=stub_server.url, token="t")
+    assert stub_server.requests == 2
+
+def test_duplicate_file_is_empty(tmp_path, monkeypatch):
+    send = FakeSend()
+    monkeypatch.setattr(core, "send_upload", send)
+    paths = _archive(tmp_path, [3, 3])
+    man = str(tmp_path / "manifest.json")
+    assert epoch_bulk.run_bulk(paths, manifest_path=man, jobs=1, server="http://x", token="t")
+    assert send.calls == 1
+    assert sorted(r["status"] for r in json.load(open(man))["files"].values()) == ["empty", "uploaded"]
+
+def test_failed_upload_does_not_mark_events_seen(tmp_path, monkeypatch):
+    # File 1 is a copy of file 0 and skips its events while file 0's upload is in flight; when
+    # that upload fails, both files stay not done and the next run sends the events.
+    second_parsed = threading.Event()
+    send = FakeSend(fail={0}, gate=second_parsed)
+    monkeypatch.setattr(core, "send_upload", send)
+    real_mark = epoch_bulk.Manifest.mark
+    def mark(self, path, sig, status, *a, **kw):
+        if status == "empty":
+            second_parsed.set()
+        return real_mark(self, path, sig, status, *a, **kw)
+    monkeypatch.setattr(epoch_bulk.Manifest, "mark", mark)
+    paths = _archive(tmp_path, [4, 4])
+    man = str(tmp_path / "manifest.json")
+    assert not epoch_bulk.run_bulk(paths, manifest_path=man, jobs=1, connections=1,
+                                   server="http://x", token="t")
+    assert send.calls == 1
+    assert [json.load(open(man))["files"][p]["status"] for p in paths] == ["failed", "failed"]
+    assert epoch_bulk.Manifest(man).fingerprints == set()
+
+    assert epoch_bulk.run_bulk(paths, manifest_path=man, jobs=1, connections=1,
+                               server="http://x", token="t")
+    assert send.calls == 2
+    files = json.load(open(man))["files"]
+    assert [files[p]["status"] for p in paths] == ["uploaded", "empty"]
+    assert len(epoch_bulk.Manifest(man).fingerprints) == files[paths[0]]["events"]
+
+def test_encoded_bodies_are_bounded_by_connections(tmp_path, monkeypatch):
+    send = FakeSend(delay=0.1)
+    monkeypatch.setattr(core, "send_upload", send)
+    peak = []
+    real_encode = core.encode_upload_body
+    def encode(token, payload):
+        peak.append(len(peak) - send.done + 1)  # bodies encoded but not yet answered
+        return real_encode(token, payload)
+    monkeypatch.setattr(core, "encode_upload_body", encode)
+    paths = _archive(tmp_path, range(10, 18), n_events=40)
+    assert epoch_bulk.run_bulk(paths, manifest_path=str(tmp_path / "m.json"), jobs=1, connections=1,
+                               server="http://x", token="t")
+    assert send.calls == 8
+    assert max(peak) <= 2
+
+def test_manifest_flush_is_batched(tmp_path):
+    man = str(tmp_path / "m.json")
+    m = epoch_bulk.Manifest(man)
+    m.mark("a", [1, 2], "uploaded", [b"12345678"], events=1)
+    assert not os.path.exists(man)
+    m.flush(min_interval=3600)
+    assert not os.path.exists(man)
+    m.flush()
+    again = epoch_bulk.Manifest(man)
+    assert again.is_done("a", [1, 2])
+    assert again.fingerprints == {b"12345678"}
+
+def test_version_1_fingerprints_are_discarded(tmp_path):
+    man = tmp_path / "m.json"
+    man.write_text(json.dumps({"version": 1, "files": {"a": {"sig": [1, 2], "status": "uploaded"}}}))
+    (tmp_path / "m.fp").write_bytes(b"oldprint" * 3)
+    m = epoch_bulk.Manifest(str(man))
+    assert m.is_done("a", [1, 2]) and m.fingerprints == set()
+    m.mark("b", [3, 4], "uploaded", [b"newprint"])
+    m.flush()
+    again = epoch_bulk.Manifest(str(man))
+    assert again.fingerprints == {b"newprint"}
+    assert json.load(open(man))["version"] == epoch_bulk.Manifest.VERSION
@@ -0,0 +1,94 @@
+import copy
+
+import epoch_uploader as core
+import epoch_fixtures as fx
+import epoch_wire
+
+def _loot_repeats(n=4):
+    db = fx.make_epochhead_db(200, seed=7)
+    loot = next(ev for ev in db["events"] if ev["type"] == "loot" and ev.get("sourceKey"))
+    out = []
+    for i in range(n):
+        ev = copy.deepcopy(loot)
+        ev["t"] = loot["t"] - loot["t"] % core.DEDUPE_BUCKET_SEC + i
+        ev["guid"] = f"Creature-0-{i}"
+        out.append(ev)
+    return db, out
+
+def test_exact_copies_are_dropped():
+    _db, evs = _loot_repeats(2)
+    evs[1]["t"] += core.DEDUPE_BUCKET_SEC          # its own key
+    kept, stats = core.dedupe_events([evs[0], dict(evs[0]), evs[1]])
+    assert kept == [evs[0], evs[1]]
+    assert stats["dropped"] == 1 and stats["collapsed"] == 0 and stats["bytes_saved"] > 0
+
+def test_repeats_are_dropped_unless_collapsed():
+    _db, evs = _loot_repeats()
+    kept, stats = core.dedupe_events(copy.deepcopy(evs))
+    assert kept == evs[:1] and stats["dropped"] == 3 and stats["collapsed"] == 0
+    assert not any("count" in ev or "tLast" in ev for ev in kept)
+    kept, _ = core.dedupe_events(copy.deepcopy(evs), dedupe_kinds=())
+    assert kept == evs
+
+def test_same_key_kills_at_different_times():
+    kills = [{"type": "kill", "t": 600 + i, "session": "s", "sourceKey": "12", "guid": f"g{i}"} for i in range(3)]
+    later = dict(kills[0], t=660, guid="g9")       # next time bucket
+    no_key = [{"type": "kill", "t": 600 + i, "session": "s"} for i in range(2)]
+    kept, stats = core.dedupe_events(kills + [later] + no_key)
+    assert kept == [kills[0], later] + no_key
+    assert stats["dropped"] == 2 and stats["bytes_saved"] > 0
+
+def test_loot_repeats_collapse_into_count():
+    _db, evs = _loot_repeats()
+    kept, stats = core.dedupe_events(copy.deepcopy(evs), collapse_kinds=core.COLLAPSE_KINDS)
+    assert len(kept) == 1 and stats["collapsed"] == 3
+    assert kept[0]["count"] == 4 and kept[0]["tLast"] == evs[-1]["t"]
+
+def test_gather_attempts_are_never_collapsed():
+    assert "gather_attempt" not in core.COLLAPSE_KINDS
+    attempts = [{"type": "gather_attempt", "t": 100 + i, "session": "s", "sourceKey": "node:1",
+                 "attemptKey": f"s:{i}"} for i in range(3)]
+    kept, stats = core.dedupe_events(attempts, collapse_kinds=core.COLLAPSE_KINDS)
+    assert kept == attempts and stats["collapsed"] == 0
+
+def _upload_twice(tmp_path, monkeypatch, wire_formats):
+    db, evs = _loot_repeats()
+    db["events"] = evs
+    (tmp_path / "epochhead.lua").write_text(fx.to_lua({"epochheadDB": db}), encoding="utf-8")
+    monkeypatch.setattr(core, "AUTO_RENAME", False)
+    with fx.StubServer(wire_formats=wire_formats, record=True) as srv:
+        monkeypatch.setattr(core, "SERVER", srv.url)
+        uc = core.UploaderCore({"sv_dir": str(tmp_path), "metrics": False, "record_events": False})
+        try:
+            assert uc.upload_now()
+            uc.acked_uploads = []
+            assert uc.upload_now()
+        finally:
+            uc.stop()
+    return [payload["events"] for _ctype, payload in srv.uploads]
+
+def test_collapse_only_after_server_accepts_it(tmp_path, monkeypatch):
+    first, second = _upload_twice(tmp_path, monkeypatch, (epoch_wire.WIRE_COLUMNAR, epoch_wire.WIRE_COLLAPSE))
+    assert len(first) == 1 and "count" not in first[0]   # wire formats not known yet: dropped
+    assert len(second) == 1 and second[0]["count"] == 4
+
+def test_no_collapse_for_a_server_without_it(tmp_path, monkeypatch):
+    first, second = _upload_twice(tmp_path, monkeypatch, (epoch_wire.WIRE_COLUMNAR,))
+    assert len(first) == len(second) == 1
+    assert not any("count" in ev or "tLast" in ev for ev in first + second)
+
+def test_streamed_upload_drops_repeats(tmp_path, monkeypatch):
+    db, evs = _loot_repeats()
+    db["events"] = evs + [copy.deepcopy(evs[0])]
+    (tmp_path / "epochhead.lua").write_text(fx.to_lua({"epochheadDB": db}), encoding="utf-8")
+    monkeypatch.setattr(core, "AUTO_RENAME", False)
+    with fx.StubServer(record=True) as srv:
+        monkeypatch.setattr(core, "SERVER", srv.url)
+        uc = core.UploaderCore({"sv_dir": str(tmp_path), "metrics": False, "record_events": False,
+                                "upload_mode": "stream"})
+        try:
+            assert uc.upload_now()
+        finally:
+            uc.stop()
+    (_ctype, payload), = srv.uploads
+    assert len(payload["events"]) == 1 and "count" not in payload["events"][0]
@@ -0,0 +1,43 @@
+import json
+
+import pytest
+
+import epoch_uploader as core
+import epoch_fixtures as fx
+import epoch_encode
+
+@pytest.fixture
+def payload():
+    db = fx.make_epochhead_db(500, seed=7)
+    return {"meta": db["meta"], "events": db["events"], "market_addons": {"aux": {"raw_lua": "x = { \"é\" }"}}}
+
+def test_parallel_for_thresholds():
+    enc = epoch_encode.ShardedEncoder(workers=2, min_events=10)
+    assert enc.parallel_for([{}] * 10)
+    assert not enc.parallel_for([{}] * 9)
+    assert not enc.parallel_for(None)
+    assert not epoch_encode.ShardedEncoder(workers=1, min_events=0).parallel_for([{}] * 100)
+    assert epoch_encode.ShardedEncoder(workers=0).workers == epoch_encode.default_workers()
+
+def test_sharded_body_is_byte_identical(payload):
+    enc = epoch_encode.ShardedEncoder(workers=2, shard_events=64, min_events=0)
+    try:
+        assert enc.parallel_for(payload["events"])
+        assert enc.encode_body("tok", payload) == core.encode_upload_body("tok", payload)
+        assert enc._pool is not None               # kept for the next upload
+        assert enc.encode_events(payload["events"]) == json.dumps(payload["events"]).encode("utf-8")
+    finally:
+        enc.close()
+    assert enc._pool is None
+
+def test_small_payload_skips_the_pool(payload):
+    enc = epoch_encode.ShardedEncoder(workers=2)
+    assert enc.encode_body("tok", payload) == core.encode_upload_body("tok", payload)
+    assert enc._pool is None
+
+def test_pool_failure_falls_back(payload, monkeypatch):
+    enc = epoch_encode.ShardedEncoder(workers=2, min_events=0)
+    def broken():
+        raise OSError("no processes here")
+    monkeypatch.setattr(enc, "_get_pool", broken)
+    assert enc.encode_body("tok", payload) == core.encode_upload_body("tok", payload)
@@ -0,0 +1,60 @@
+import json
+import os
+
+import epoch_uploader as core
+import epoch_fixtures as fx
+import epoch_schema
+import epoch_bench
+import epoch_net
+
+def test_fixtures_are_deterministic_and_parse_back(tmp_path):
+    db = fx.make_epochhead_db(200, seed=5)
+    assert db == fx.make_epochhead_db(200, seed=5)
+    assert db != fx.make_epochhead_db(200, seed=6)
+    assert core.parse_savedvars(fx.to_lua({"epochheadDB": db}), "epochheadDB") == db
+
+def test_fixture_events_pass_validation():
+    db = fx.make_epochhead_db(500, seed=2)
+    events, meta = db["events"], db["meta"]
+    core._normalize_inplace(events); core._normalize_inplace(meta)
+    kept, report = epoch_schema.validate_events(events, meta)
+    assert len(kept) == 500
+    assert not report["dropped_invalid"] and not report["dropped_by_realm"]
+
+def test_write_fixtures(tmp_path):
+    paths = fx.write_fixtures(str(tmp_path), n_events=20, n_market_items=10)
+    assert sorted(paths) == ["Auctionator.lua", "aux-addon.lua", "epochhead.lua"]
+    assert all(os.path.getsize(p) > 0 for p in paths.values())
+    assert sorted(fx.write_fixtures(str(tmp_path / "ev"), 20, 0)) == ["epochhead.lua"]
+    assert core.parse_savedvars(open(paths["aux-addon.lua"], encoding="utf-8").read(), "aux")
+
+def test_stub_server_round_trip(stub_server):
+    code, resp = core.post_upload(stub_server.url, "t", {"events": [{"type": "kill", "t": 1}], "meta": {}})
+    assert code == 202
+    code, resp = core.get_upload_status(stub_server.url, json.loads(resp)["job_id"])
+    assert json.loads(resp) == {"finished": True, "result": {"created": 1, "updated": 0, "kept": 1}}
+    assert core.get_upload_status(stub_server.url, "job999")[0] == 404
+
+def test_stub_server_rejects_bad_digest(stub_server):
+    res = epoch_net.run(epoch_net.request("POST", stub_server.url + "/upload", b'{"token":"t","payload":{}}',
+                                          {epoch_net.DIGEST_HEADER: "sha-256=:AAAA:"}))
+    assert res.status == 400
+
+def test_bench_size_cases(tmp_path, stub_server):
+    results = epoch_bench.bench_size(50, 1, stub_server.url, str(tmp_path), n_market_items=10)
+    names = {r["name"] for r in results}
+    assert {"parse_savedvars", "normalize", "json_encode", "columnar_encode", "json_decode", "columnar_decode",
+            "post_upload", "post_upload_columnar", "parse_aux", "parse_AUCTIONATOR_PRICE_DATABASE"} <= names
+    by = {r["name"]: r for r in results}
+    assert by["post_upload"]["status_codes"] == [202] and by["post_upload_columnar"]["status_codes"] == [202]
+    assert all(r["median_s"] >= 0 and r["repeat"] == 1 for r in results)
+
+def test_bench_compare_flags_slower_cases():
+    old = {"results": [{"name": "json_encode", "size": 10, "median_s": 1.0},
+                       {"name": "normalize", "size": 10, "median_s": 1.0}]}
+    new = {"results": [{"name": "json_encode", "size": 10, "median_s": 1.5},
+                       {"name": "normalize", "size": 10, "median_s": 0.5},
+                       {"name": "columnar_encode", "size": 10, "median_s": 0.5}]}
+    lines = epoch_bench.compare(new, old).splitlines()
+    assert len(lines) == 2
+    assert "slower" in lines[0] and "faster" in lines[1]
@@ -0,0 +1,64 @@
+import argparse
+import json
+import logging
+import os
+import signal
+import subprocess
+import sys
+
+import pytest
+
+import epoch_uploader as core
+
+HERE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def _args(**kw):
+    return argparse.Namespace(**dict({"sv_dir": None, "once": False, "profile_next": False,
+                                      "profile_memory": False}, **kw))
+
+@pytest.fixture
+def headless_log():
+    before = list(logging.getLogger().handlers)
+    yield
+    for h in logging.getLogger().handlers[:]:
+        if h not in before:
+            logging.getLogger().removeHandler(h)
+
+def test_once_uploads_and_exits(sv_dir, stub_server, monkeypatch, clean_config, headless_log, capsys):
+    monkeypatch.setattr(core, "SERVER", stub_server.url)
+    monkeypatch.setattr(core, "AUTO_RENAME", False)
+    assert core.run_headless(_args(sv_dir=sv_dir, once=True)) == 0
+    assert stub_server.requests == 1
+
+def test_missing_folder_is_a_config_error(tmp_path, clean_config, headless_log, capsys):
+    assert core.run_headless(_args(sv_dir=str(tmp_path / "nope"), once=True)) == 2
+    line = json.loads(capsys.readouterr().out.strip().splitlines()[-1])
+    assert line["level"] == "ERROR" and line["event"] == "config_error"
+
+def test_daemon_runs_without_tk_and_stops_on_sigterm(tmp_path):
+    sv = tmp_path / "sv"
+    sv.mkdir()
+    proc = subprocess.Popen([sys.executable, os.path.join(HERE, "epoch_uploader.py"), "--headless",
+                             "--sv-dir", str(sv)], cwd=HERE, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                            text=True, env=dict(os.environ))
+    try:
+        for line in proc.stdout:
+            rec = json.loads(line)
+            if rec.get("event") == "ready":
+                break
+        proc.send_signal(signal.SIGTERM)
+        out, _err = proc.communicate(timeout=40)
+    finally:
+        proc.kill()
+    events = [json.loads(l).get("event") for l in out.splitlines() if l.startswith("{")]
+    assert "signal" in events and "stopped" in events
+    assert proc.returncode == 0
+    assert rec["sv_dir"] == str(sv) and "startup_ms" in rec
+
+def test_headless_never_imports_tk(tmp_path):
+    code = ("import sys, epoch_uploader as m\n"
+            "try:\n    m.main(['--headless', '--once', '--sv-dir', sys.argv[1]])\n"
+            "except SystemExit as e:\n    print(e.code, 'tkinter' in sys.modules)\n")
+    out = subprocess.run([sys.executable, "-c", code, str(tmp_path / "missing")], cwd=HERE,
+                         capture_output=True, text=True, timeout=60).stdout
+    assert out.strip().splitlines()[-1] == "2 False"
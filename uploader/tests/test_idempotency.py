@@ -0,0 +1,113 @@
+import asyncio
+import json
+import os
+
+import pytest
+
+import epoch_uploader as core
+import epoch_fixtures as fx
+import epoch_net
+
+def _core(sv, monkeypatch, server, mode):
+    monkeypatch.setattr(core, "SERVER", server)
+    monkeypatch.setattr(core, "AUTO_RENAME", False)
+    uc = core.UploaderCore({"sv_dir": sv, "metrics": False, "record_events": False})
+    uc.upload_mode = mode
+    return uc
+
+def _crlf_with_trailer(sv):
+    for name in os.listdir(sv):
+        p = os.path.join(sv, name)
+        text = open(p, encoding="utf-8").read().replace("\n", "\r\n")
+        with open(p, "w", encoding="utf-8", newline="") as f:
+            f.write(text + "-- written by the client after the table\r\n")
+
+@pytest.mark.parametrize("crlf", [False, True])
+def test_streaming_and_memory_send_the_same_key(sv_dir, monkeypatch, clean_config, crlf):
+    if crlf:
+        _crlf_with_trailer(sv_dir)
+    with fx.StubServer(wire_formats=()) as srv:   # raw market files in both modes
+        keys = []
+        for mode in ("memory", "stream"):
+            uc = _core(sv_dir, monkeypatch, srv.url, mode)
+            try:
+                assert uc.upload_now()
+                keys.append(uc.acked_uploads[-1])
+            finally:
+                uc.stop()
+            core.save_config(dict(core.load_config(), acked_uploads=[]))  # let the second mode send
+        assert keys[0] == keys[1]
+        assert len(srv.keys) == 1 and srv.replayed == 1
+
+def test_key_ignores_mtime_but_not_content(sv_dir):
+    sec = {"market_addons": {"aux": {"file": "aux-addon.lua", "mtime": 1, "size": 3, "raw_lua": "abc"}}}
+    moved = {"market_addons": {"aux": dict(sec["market_addons"]["aux"], mtime=2)}}
+    edited = {"market_addons": {"aux": dict(sec["market_addons"]["aux"], raw_lua="abd")}}
+    assert core.upload_key(b"x", sec) == core.upload_key(b"x", moved)
+    assert core.upload_key(b"x", sec) != core.upload_key(b"x", edited)
+    assert core.upload_key(b"x", sec) != core.upload_key(b"y", sec)
+
+def test_acknowledged_data_is_not_sent_again(sv_dir, monkeypatch, clean_config):
+    with fx.StubServer(wire_formats=()) as srv:
+        uc = _core(sv_dir, monkeypatch, srv.url, "memory")
+        try:
+            assert uc.upload_now()
+            assert uc.upload_now()
+        finally:
+            uc.stop()
+        assert srv.requests == 1
+
+def test_resend_after_lost_response_is_replayed(stub_server):
+    body = core.encode_upload_body("t", {"events": [], "meta": {}})
+    a = core.post_upload(stub_server.url, "t", None, body=body, idempotency_key="k1")
+    b = core.post_upload(stub_server.url, "t", None, body=body, idempotency_key="k1")
+    assert json.loads(a[1])["job_id"] == json.loads(b[1])["job_id"]
+    assert stub_server.replayed == 1
+
+# --------------- Retry policy ---------------
+def _calls(*replies):
+    seen = []
+    async def call():
+        seen.append(1)
+        return replies[len(seen) - 1]
+    return seen, call
+
+@pytest.fixture
+def no_sleep(monkeypatch):
+    waits = []
+    async def sleep(s):
+        waits.append(s)
+    monkeypatch.setattr(core.asyncio, "sleep", sleep)
+    return waits
+
+@pytest.mark.parametrize("status", [0, 429, 503])
+def test_retryable_answers_are_retried(no_sleep, status):
+    seen, call = _calls(core._Reply(status, "busy"), core._Reply(status, "busy"), core._Reply(202, "ok"))
+    assert asyncio.run(core._net_call_with_backoff(call)) == (202, "ok")
+    assert len(seen) == 3 and no_sleep == [0.5, 1.0]
+
+@pytest.mark.parametrize("status", [400, 401, 413, 415, 500, 502])
+def test_other_answers_return_at_once(no_sleep, status):
+    seen, call = _calls(core._Reply(status, "no"))
+    assert asyncio.run(core._net_call_with_backoff(call))[0] == status
+    assert len(seen) == 1 and no_sleep == []
+
+def test_retry_after_is_honoured_and_capped(no_sleep):
+    seen, call = _calls(core._Reply(429, "", retry_after=7), core._Reply(503, "", retry_after=1e6),
+                        core._Reply(200, ""))
+    asyncio.run(core._net_call_with_backoff(call))
+    assert no_sleep == [7, core.MAX_RETRY_AFTER]
+
+def test_gives_up_after_attempts(no_sleep):
+    seen, call = _calls(*[core._Reply(503, "")] * 3)
+    assert asyncio.run(core._net_call_with_backoff(call, attempts=3))[0] == 503
+    assert len(seen) == 3
+
+def test_retry_after_header_forms():
+    class R:
+        def __init__(self, v): self.v = v
+        def getheader(self, k): return self.v
+    assert epoch_net.retry_after(R("12")) == 12.0
+    assert epoch_net.retry_after(R(None)) is None
+    assert epoch_net.retry_after(R("Wed, 21 Oct 2015 07:28:00 GMT")) == 0.0
+    assert epoch_net.retry_after(R("soon")) is None
@@ -0,0 +1,50 @@
+import json
+
+import epoch_loadtest as lt
+import epoch_fixtures as fx
+
+def test_percentile_nearest_rank():
+    vals = list(range(1, 101))
+    assert lt.percentile(vals, 50) == 50
+    assert lt.percentile(vals, 99) == 99
+    assert lt.percentile(vals, 100) == 100
+    assert lt.percentile([3], 90) == 3
+    assert lt.percentile([], 50) is None
+
+def test_load_bodies_from_files_and_synthetic(tmp_path):
+    paths = fx.write_fixtures(str(tmp_path), n_events=50, n_market_items=0)
+    bodies = lt.load_bodies([paths["epochhead.lua"]], synthetic=20, variants=2, token="t")
+    assert [(name, n) for name, n, _ in bodies] == [("epochhead.lua", 50), ("synthetic-0", 20), ("synthetic-1", 20)]
+    assert all(json.loads(b)["token"] == "t" for _, _, b in bodies)
+
+def test_run_against_stub_counts_errors():
+    bodies = lt.load_bodies(synthetic=10, variants=1, token="t")
+    with fx.StubServer(error_rate=0.5, seed=3) as srv:
+        report = lt.LoadTest(srv.url, bodies, rate=200, concurrency=8, poll_interval=0.01).run(
+            requests=40, progress=None)
+    assert report["issued"] == report["completed"] == 40
+    codes = report["status_codes"]
+    assert set(codes) <= {"202", "503"} and sum(codes.values()) == 40
+    assert report["error_rate"] == codes.get("503", 0) / 40
+    assert report["job_completion_s"]["count"] == codes.get("202", 0)
+    assert "requests in" in lt.format_report(report)
+
+def test_concurrent_connections_are_not_refused():
+    bodies = lt.load_bodies(synthetic=5, variants=1, token="t")
+    with fx.StubServer(latency=0.05) as srv:
+        report = lt.LoadTest(srv.url, bodies, rate=1000, concurrency=32, poll_interval=0.01).run(
+            requests=64, progress=None)
+    assert report["status_codes"] == {"202": 64}
+
+def test_unfinished_jobs_time_out_on_the_loop_thread():
+    import threading
+    bodies = lt.load_bodies(synthetic=5, variants=1, token="t")
+    with fx.StubServer(job_delay=30) as srv:
+        before = threading.active_count()
+        report = lt.LoadTest(srv.url, bodies, rate=100, concurrency=4, poll_interval=0.05,
+                             job_timeout=0.3).run(requests=8, progress=None)
+        assert threading.active_count() <= before + 1   # at most the shared network loop thread
+    assert report["status_codes"] == {"202": 8}
+    assert report["job_errors"] == {"timeout": 8}
+    assert report["job_completion_s"] == {"count": 0}
+    assert report["elapsed_s"] < 5
@@ -0,0 +1,69 @@
+import logging
+import logging.handlers
+import threading
+
+import pytest
+
+import epoch_uploader as core
+
+def test_log_ring_drains_in_order():
+    ring = core.LogRing(5)
+    for i in range(3):
+        ring.push(f"line {i}")
+    assert ring.drain() == (["line 0", "line 1", "line 2"], 0)
+    assert ring.drain() == ([], 0)
+
+def test_log_ring_counts_dropped_lines():
+    ring = core.LogRing(3)
+    for i in range(10):
+        ring.push(i)
+    assert ring.drain() == ([7, 8, 9], 7)
+    ring.push("next")
+    assert ring.drain() == (["next"], 0)
+
+def test_log_ring_from_many_threads():
+    ring = core.LogRing(10000)
+    def push(n):
+        for i in range(500):
+            ring.push((n, i))
+    threads = [threading.Thread(target=push, args=(n,)) for n in range(8)]
+    for t in threads: t.start()
+    for t in threads: t.join()
+    lines, dropped = ring.drain()
+    assert dropped == 0 and len(lines) == 4000
+    for n in range(8):
+        assert [i for m, i in lines if m == n] == list(range(500))
+
+@pytest.fixture
+def file_log(tmp_path, monkeypatch):
+    path = tmp_path / "uploader.log"
+    monkeypatch.setattr(core, "LOG_PATH", str(path))
+    root = logging.getLogger()
+    handlers, level = root.handlers[:], root.level
+    core._init_file_log()
+    yield path
+    core._stop_file_log()
+    root.handlers[:] = handlers
+    root.setLevel(level)
+
+def _queue_handlers():
+    return [h for h in logging.getLogger().handlers if isinstance(h, logging.handlers.QueueHandler)]
+
+def test_file_log_writes_through_the_listener(file_log):
+    assert len(_queue_handlers()) == 1
+    assert core._log_listener is not None
+    logging.info("hello from a test")
+    core._stop_file_log()
+    assert core._log_listener is None
+    text = file_log.read_text(encoding="utf-8")
+    assert f"{core.APP_NAME} {core.APP_VERSION} starting" in text
+    assert "INFO hello from a test" in text
+
+def test_file_log_restart_replaces_listener(file_log):
+    first = core._log_listener
+    core._init_file_log()
+    assert core._log_listener is not first
+    assert len(_queue_handlers()) == 1
+    logging.warning("after restart")
+    core._stop_file_log()
+    assert "WARNING after restart" in file_log.read_text(encoding="utf-8")
@@ -0,0 +1,84 @@
+import json
+import os
+
+import pytest
+
+import epoch_uploader as core
+
+def test_stages_accumulate_and_finish():
+    m = core.UploadMetrics(mode="memory")
+    with m.stage("parse"):
+        pass
+    with m.stage("parse"):
+        sum(range(10000))
+    m.bytes_in, m.bytes_out, m.events = 100, 2048, 7
+    rec = m.finish(code=202)
+    assert set(rec["stages"]) == {"parse"} and rec["stages"]["parse"] >= 0
+    assert (rec["bytes_in"], rec["bytes_out"], rec["events"], rec["mode"], rec["code"]) == (100, 2048, 7, "memory", 202)
+    assert rec["total_s"] >= rec["stages"]["parse"]
+    assert rec["peak_rss"] is None or rec["peak_rss"] > 0
+
+def test_stage_time_counts_even_when_it_raises():
+    m = core.UploadMetrics()
+    try:
+        with m.stage("read"):
+            raise OSError("gone")
+    except OSError:
+        pass
+    assert "read" in m.stages
+
+def test_trace_memory_reports_python_peak():
+    m = core.UploadMetrics(trace_memory=True)
+    with m.stage("encode"):
+        blob = [bytes(1000) for _ in range(1000)]
+    rec = m.finish()
+    del blob
+    assert rec["peak_traced"] >= 1_000_000
+
+def test_summary_names_the_slowest_stage():
+    m = core.UploadMetrics()
+    m.stages = {"parse": 2.0, "send": 0.5}
+    m.bytes_out = 812 * 1024
+    s = m.summary()
+    assert s.split(" · ")[0].endswith(f"(parse {core._fmt_secs(2.0)})")
+    assert f"{core._fmt_bytes(812 * 1024)}↑" in s
+
+def test_write_metrics_appends_and_rotates(tmp_path, monkeypatch):
+    path = str(tmp_path / "metrics.jsonl")
+    monkeypatch.setattr(core, "METRICS_MAX_BYTES", 200)
+    for i in range(10):
+        core.write_metrics({"i": i, "pad": "x" * 40}, path)
+    assert os.path.exists(path + ".1")
+    lines = [json.loads(l) for l in open(path, encoding="utf-8")]
+    assert lines[-1]["i"] == 9 and len(lines) < 10
+
+def test_upload_cycle_writes_a_metrics_record(sv_dir, stub_server, monkeypatch, tmp_path):
+    path = str(tmp_path / "metrics.jsonl")
+    monkeypatch.setattr(core, "METRICS_PATH", path)
+    monkeypatch.setattr(core, "SERVER", stub_server.url)
+    monkeypatch.setattr(core, "AUTO_RENAME", False)
+    uc = core.UploaderCore({"sv_dir": sv_dir, "metrics": True, "record_events": False})
+    try:
+        assert uc.upload_now()
+    finally:
+        uc.stop()
+    rec = json.loads(open(path, encoding="utf-8").read().splitlines()[-1])
+    assert {"read", "parse", "normalize", "encode", "send"} <= set(rec["stages"])
+    assert rec["events"] > 0 and rec["bytes_out"] > 0 and rec["bytes_in"] > 0
+    assert rec["manual"] is True and uc.last_metrics
+
+@pytest.mark.parametrize("mode", ["memory", "stream"])
+def test_empty_folder_still_writes_a_metrics_record(tmp_path, monkeypatch, mode):
+    path = tmp_path / "metrics.jsonl"
+    monkeypatch.setattr(core, "METRICS_PATH", str(path))
+    monkeypatch.setattr(core, "AUTO_RENAME", False)
+    empty = tmp_path / "SavedVariables"
+    empty.mkdir()
+    uc = core.UploaderCore({"sv_dir": str(empty), "metrics": True, "record_events": False, "upload_mode": mode})
+    monkeypatch.setattr(core, "SERVER", "http://127.0.0.1:1")   # must not be contacted
+    try:
+        assert not uc.upload_now()
+    finally:
+        uc.stop()
+    rec = json.loads(path.read_text(encoding="utf-8").splitlines()[-1])
+    assert rec["error"] == "no_data" and rec["events"] == 0 and "send" not in rec["stages"]
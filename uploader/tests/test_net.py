@@ -0,0 +1,92 @@
+import asyncio
+import json
+import tempfile
+import threading
+import time
+
+import pytest
+
+import epoch_uploader as core
+import epoch_net
+
+def _body(n=3):
+    return core.encode_upload_body("t", {"events": [{"type": "kill", "t": i} for i in range(n)], "meta": {}})
+
+def test_upload_and_poll(stub_server):
+    code, resp = core.post_upload(stub_server.url, "t", None, body=_body())
+    assert code == 202
+    job_id = json.loads(resp)["job_id"]
+    code, resp = epoch_net.run(core.wait_for_job_async(stub_server.url, job_id, interval=0.01))
+    assert code == 200 and json.loads(resp)["finished"]
+    code, resp = core.get_upload_status(stub_server.url, job_id)
+    assert code == 200
+
+def test_file_body_is_sent_like_bytes(stub_server):
+    body = _body(50)
+    with tempfile.TemporaryFile() as f:
+        f.write(body)
+        code, _ = core.post_upload(stub_server.url, "t", None, body=f)
+    assert code == 202
+    assert stub_server.bytes_received == len(body)
+
+def test_concurrent_uploads_share_the_loop_thread(stub_server):
+    net = epoch_net.shared_loop()
+    futs = [net.submit(core.post_upload_async(stub_server.url, "t", None, body=_body()))
+            for _ in range(20)]
+    assert [f.result(30)[0] for f in futs] == [202] * 20
+    assert len([t for t in threading.enumerate() if t.name == net.name]) == 1
+
+def test_connection_error_is_status_0():
+    code, text = core.post_upload("http://127.0.0.1:1", "t", None, body=b"{}", timeout=(2, 2))
+    assert code == 0 and text
+
+def test_run_from_the_loop_thread_raises():
+    net = epoch_net.shared_loop()
+    async def inner():
+        return net.run(asyncio.sleep(0))
+    with pytest.raises(RuntimeError):
+        net.run(inner())
+
+def test_chunked_response():
+    async def parse():
+        r = asyncio.StreamReader()
+        r.feed_data(b"HTTP/1.1 200 OK\r\nTransfer-Encoding: chunked\r\n\r\n"
+                    b"5\r\nhello\r\n6\r\n world\r\n0\r\n\r\n")
+        r.feed_eof()
+        return await epoch_net._read_response(r, "GET")
+    resp = asyncio.run(parse())
+    assert resp.status == 200 and resp.text() == "hello world"
+
+def _job(server):
+    code, resp = core.post_upload(server.url, "t", None, body=_body())
+    assert code == 202
+    return json.loads(resp)["job_id"]
+
+def test_job_wait_gives_up_after_max_wait(stub_server):
+    stub_server.job_delay = 60
+    job_id = _job(stub_server)
+    code, resp = epoch_net.run(core.wait_for_job_async(stub_server.url, job_id, interval=0.05, max_wait=0.5))
+    assert code == 0 and "timed out" in resp
+
+def test_job_wait_stops_when_asked(stub_server):
+    stub_server.job_delay = 60
+    job_id = _job(stub_server)
+    stop = threading.Event()
+    threading.Timer(0.3, stop.set).start()
+    t0 = time.monotonic()
+    code, resp = epoch_net.run(core.wait_for_job_async(stub_server.url, job_id, interval=5,
+                                                       should_stop=stop.is_set))
+    assert (code, resp) == (0, "stopped")
+    assert time.monotonic() - t0 < 1.5
+
+def test_job_wait_backs_off(monkeypatch):
+    waits = []
+    async def sleep(secs):
+        waits.append(secs)
+    async def status(server, job_id, timeout=30):
+        return core._Reply(200, json.dumps({"finished": len(waits) >= 6}))
+    monkeypatch.setattr(core.asyncio, "sleep", sleep)
+    monkeypatch.setattr(core, "get_upload_status_async", status)
+    code, _ = asyncio.run(core.wait_for_job_async("http://x", "j", interval=1.0, max_interval=3.0))
+    assert code == 200
+    assert waits == [1.0, 1.5, 2.25, 3.0, 3.0, 3.0]
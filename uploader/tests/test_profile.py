@@ -0,0 +1,29 @@
+import glob
+import os
+import types
+
+import epoch_uploader as core
+import epoch_profile
+
+def test_profiled_cycle_writes_report(upload_core, tmp_path):
+    upload_core.profile_next_upload(memory=True)
+    assert upload_core.upload_now()
+    assert upload_core.on_stage is None
+    reports = glob.glob(os.path.join(core.APPDATA_DIR, "profile-*.txt"))
+    assert reports
+    text = open(max(reports, key=os.path.getmtime), encoding="utf-8").read()
+    assert "==== top" in text and "after parse" in text
+
+def test_stage_hook_goes_through_the_core_instance(upload_core, tmp_path, monkeypatch):
+    # Run as `python epoch_uploader.py`, the core class lives in __main__ and epoch_profile's
+    # `core` is a second copy of the module; the hook must not depend on that module.
+    stand_in = types.SimpleNamespace(APPDATA_DIR=str(tmp_path), APP_NAME="x", APP_VERSION="0",
+                                     _fmt_secs=core._fmt_secs, _fmt_bytes=core._fmt_bytes)
+    monkeypatch.setattr(epoch_profile, "core", stand_in)
+    stages = []
+    real = epoch_profile._Snapshots.__call__
+    monkeypatch.setattr(epoch_profile._Snapshots, "__call__", lambda self, s: (stages.append(s), real(self, s)))
+    assert epoch_profile.profile_cycle(upload_core, lambda: upload_core._do_upload(manual=True),
+                                       memory=True, out_dir=str(tmp_path))
+    assert "read" in stages and "send" in stages
+    assert glob.glob(str(tmp_path / "profile-*.pstats"))
@@ -0,0 +1,213 @@
+import threading
+import time
+
+import epoch_uploader as core
+
+class Job:
+    """``run`` for UploadScheduler: records calls, can be held open and made to fail."""
+
+    def __init__(self, result=True):
+        self.result = result
+        self.calls = []
+        self.release = threading.Event()
+        self.release.set()
+        self.started = threading.Event()
+
+    def __call__(self, manual, cancel):
+        self.calls.append(manual)
+        self.started.set()
+        self.release.wait(5)
+        return self.result
+
+def _until(pred, timeout=3.0):
+    deadline = time.monotonic() + timeout
+    while not pred():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.005)
+    return True
+
+def _scheduler(job, rate=1000.0):
+    s = core.UploadScheduler(job, core.TokenBucket(rate, 1.0))
+    s.start()
+    return s
+
+def test_triggers_during_a_run_coalesce_into_one_follow_up():
+    job = Job()
+    job.release.clear()
+    s = _scheduler(job)
+    s.trigger(manual=True)
+    assert job.started.wait(2)
+    for _ in range(5):
+        s.trigger(manual=False)
+    s.trigger(manual=True)
+    assert s.coalesced == 6 and s.pending == "manual"
+    job.release.set()
+    assert _until(lambda: len(job.calls) == 2 and not s.running)
+    time.sleep(0.05)
+    assert job.calls == [True, True]
+    s.stop(1)
+
+def test_auto_trigger_waits_for_its_delay():
+    job = Job()
+    s = _scheduler(job)
+    t0 = time.monotonic()
+    s.trigger(manual=False, delay=0.2)
+    assert _until(lambda: job.calls)
+    assert time.monotonic() - t0 >= 0.19
+    s.stop(1)
+
+def test_restart_while_a_job_runs_keeps_one_worker():
+    job = Job()
+    job.release.clear()
+    s = _scheduler(job)
+    s.trigger(manual=True)
+    assert job.started.wait(2)
+    worker = s._thread
+    assert s.stop() is False
+    assert s.trigger(manual=True) is False
+    s.start()
+    assert s._thread is worker
+    job.release.set()
+    assert _until(lambda: not s.running)
+    s.trigger(manual=True)
+    assert _until(lambda: len(job.calls) == 2)
+    assert s._thread is worker
+    assert s.stop(1) and not worker.is_alive()
+
+def test_start_after_worker_exit_makes_a_new_one():
+    job = Job()
+    s = _scheduler(job)
+    first = s._thread
+    assert s.stop(1) and not first.is_alive()
+    s.start()
+    assert s._thread is not first and s._thread.is_alive()
+    s.trigger(manual=True)
+    assert _until(lambda: job.calls == [True])
+    s.stop(1)
+
+def test_run_now_respects_stop():
+    job = Job()
+    s = _scheduler(job)
+    s.stop(1)
+    assert s.run_now() is None
+    assert job.calls == []
+
+def test_manual_runs_do_not_spend_the_bucket():
+    job = Job()
+    s = _scheduler(job, rate=0.001)   # one token, then ~17 minutes per token
+    assert s.run_now(manual=True)
+    assert s.run_now(manual=True)
+    s.trigger(manual=False)
+    assert _until(lambda: len(job.calls) == 3)
+    # That successful auto run spent the token: the next auto trigger has to wait.
+    s.trigger(manual=False)
+    time.sleep(0.2)
+    assert len(job.calls) == 3 and s.pending == "auto"
+    s.stop(1)
+
+def test_retry_after_failed_run_uses_its_own_delay():
+    job = Job(result=False)
+    s = _scheduler(job, rate=0.001)
+    s.trigger(manual=False)
+    assert _until(lambda: job.calls)
+    s.trigger(manual=False, delay=0.05)
+    assert _until(lambda: len(job.calls) == 2, timeout=1.0)
+    s.stop(1)
+
+def test_errors_go_to_on_error():
+    errors = []
+    def boom(manual, cancel):
+        raise RuntimeError("x")
+    s = core.UploadScheduler(boom, core.TokenBucket(1000.0), on_error=errors.append)
+    s.start()
+    s.trigger(manual=True)
+    assert _until(lambda: errors)
+    assert isinstance(errors[0], RuntimeError) and not s.running
+    s.stop(1)
+
+def test_core_starts_its_scheduler_once(upload_core):
+    worker = upload_core.scheduler._thread
+    assert worker is not None and worker.is_alive()
+    upload_core.start()
+    upload_core.request_upload(manual=False)
+    assert upload_core.scheduler._thread is worker
+
+def test_stop_cancels_the_running_job():
+    seen = []
+    def job(manual, cancel):
+        seen.append(cancel)
+        return cancel.wait(5)
+    s = _scheduler(job)
+    s.trigger(manual=True)
+    assert _until(lambda: s.running)
+    t0 = time.monotonic()
+    assert s.stop(wait=2)
+    assert time.monotonic() - t0 < 1
+    assert seen[0].is_set()
+
+def test_cancel_upload_aborts_a_slow_send(sv_dir, monkeypatch, clean_config):
+    import epoch_fixtures as fx
+    with fx.StubServer(latency=5) as srv:
+        monkeypatch.setattr(core, "SERVER", srv.url)
+        monkeypatch.setattr(core, "AUTO_RENAME", False)
+        uc = core.UploaderCore({"sv_dir": sv_dir, "metrics": False, "record_events": False})
+        try:
+            assert not uc.cancel_upload()          # nothing running
+            assert uc.request_upload(manual=True)
+            assert _until(lambda: srv.requests == 1, 5)
+            t0 = time.monotonic()
+            assert uc.cancel_upload()
+            assert _until(lambda: not uc.scheduler.running, 3)
+            assert time.monotonic() - t0 < 2
+            assert uc.acked_uploads == []
+        finally:
+            uc.stop()
+
+def test_cancel_upload_stops_the_job_wait(sv_dir, monkeypatch, clean_config):
+    import epoch_fixtures as fx
+    with fx.StubServer(job_delay=60) as srv:
+        monkeypatch.setattr(core, "SERVER", srv.url)
+        monkeypatch.setattr(core, "AUTO_RENAME", False)
+        waits = []
+        real = core.wait_for_job_async
+        def wait(*a, **kw):
+            waits.append(kw.get("should_stop"))
+            return real(*a, **kw)
+        monkeypatch.setattr(core, "wait_for_job_async", wait)
+        uc = core.UploaderCore({"sv_dir": sv_dir, "metrics": False, "record_events": False})
+        try:
+            assert uc.request_upload(manual=True)
+            assert _until(lambda: waits, 5)
+            assert waits[0] == uc._cancel.is_set
+            assert uc.cancel_upload()
+            assert _until(lambda: not uc.scheduler.running, 2)
+            assert uc.acked_uploads == []
+        finally:
+            uc.stop()
+
+def test_watcher_drops_a_signature_read_across_a_forget(sv_dir, monkeypatch):
+    monkeypatch.setattr(core, "AUTO_RENAME", False)
+    monkeypatch.setattr(core, "WRITE_SETTLE_SEC", 0)
+    uc = core.UploaderCore({"sv_dir": sv_dir, "metrics": False, "record_events": False})
+    try:
+        assert uc._poll_signature((None, 0.0)) == ((None, 0.0), False)   # baseline
+        base = uc._last_sig
+        real = uc._watched_file_signatures
+        def renamed_meanwhile():
+            sig = real()
+            uc._forget_sig()                     # e.g. the worker renamed the uploaded file
+            return sig
+        monkeypatch.setattr(uc, "_watched_file_signatures", renamed_meanwhile)
+        assert uc._poll_signature((None, 0.0)) == ((None, 0.0), False)
+        assert uc._last_sig is None              # the stale read did not become the baseline
+        monkeypatch.setattr(uc, "_watched_file_signatures", real)
+        assert uc._poll_signature((None, 0.0)) == ((None, 0.0), False)   # new baseline
+        assert uc._last_sig == base
+        monkeypatch.setattr(uc, "_watched_file_signatures", lambda: ("changed",))
+        pending, settled = uc._poll_signature((None, 0.0))
+        assert pending[0] == ("changed",) and not settled
+        assert uc._poll_signature(pending) == ((None, 0.0), True)
+        assert uc._last_sig == ("changed",) != base
+    finally:
+        uc.stop()
@@ -0,0 +1,82 @@
+from collections import Counter
+
+import pytest
+
+import epoch_uploader as core
+import epoch_fixtures as fx
+import epoch_schema as sch
+
+def _meta(version=2, realm="Kezan", **kw):
+    return dict({"schemaVersion": version, "player": {"name": "X", "realm": realm}}, **kw)
+
+def test_v1_events_are_migrated():
+    events = [{"type": "loot", "t": 1, "items": [{"id": 5, "count": 3}], "source": {"key": "mob:1"}},
+              {"type": "kill", "t": 2, "sourceKey": "mob:2", "source": {"key": "mob:9"}}]
+    meta = {"player": {"realm": "Kezan"}}
+    kept, report = sch.validate_events(events, meta)
+    assert report["schema_version"] == 1 and meta["schemaVersion"] == sch.SCHEMA_VERSION
+    assert kept[0]["items"] == [{"id": 5, "qty": 3}] and kept[0]["sourceKey"] == "mob:1"
+    assert kept[1]["sourceKey"] == "mob:2"
+
+def test_current_schema_is_not_migrated():
+    events = [{"type": "loot", "t": 1, "items": [{"id": 5, "count": 3}]}]
+    sch.validate_events(events, _meta())
+    assert events[0]["items"] == [{"id": 5, "count": 3}]
+
+def test_invalid_events_are_dropped_and_counted():
+    events = [
+        {"type": "kill", "t": 1, "sourceKey": "mob:1", "source": {"key": "mob:1"}},
+        {"type": "kill", "t": 2},
+        {"type": "loot", "t": 3, "money": 50},
+        {"type": "loot", "t": 4},
+        {"type": "quest", "t": 5, "subtype": "accept", "title": "Wolves"},
+        {"type": "quest", "t": "soon", "subtype": "accept", "id": 1},
+        {"t": 7},
+        "junk",
+    ]
+    kept, report = sch.validate_events(events, _meta())
+    assert [ev["t"] for ev in kept] == [1, 3, 5]
+    assert report["dropped_invalid"] == {"kill": 1, "loot": 1, "quest": 1, "?": 2}
+    assert report["missing"]["kill.sourceKey"] == 1 and report["missing"]["loot.items|money"] == 1
+    assert report["missing"]["quest.t"] == 1 and report["missing"]["?.type"] == 1
+
+def test_disallowed_realm_drops_everything():
+    events = [{"type": "kill", "t": 1, "sourceKey": "a", "source": {}}, {"type": "loot", "t": 2, "money": 1}]
+    kept, report = sch.validate_events(events, _meta(realm="Stormrage"))
+    assert kept == [] and report["dropped_by_realm"] == {"kill": 1, "loot": 1}
+
+@pytest.mark.parametrize("meta, ok", [
+    (_meta(realm="GURUBASHI"), True),
+    (_meta(realm="Other", allowedRealms=["other"]), True),
+    (_meta(realm="Kezan", allowedRealms={"other": True, "kezan": False}), False),
+    ({"realmAllowed": False}, False),
+    ({}, True),
+])
+def test_realm_rule(meta, ok):
+    assert sch.realm_allowed(meta) is ok
+
+def test_newer_schema_passes_through():
+    events = [{"weird": True}]
+    kept, report = sch.validate_events(events, _meta(version=sch.SCHEMA_VERSION + 1))
+    assert kept == events and not report["dropped_invalid"]
+
+def test_format_counts():
+    assert sch.format_counts(Counter({"loot": 3, "kill": 1})) == "loot 3, kill 1"
+
+@pytest.mark.parametrize("mode", ["memory", "stream"])
+def test_uploader_sends_only_valid_events(tmp_path, monkeypatch, mode):
+    db = fx.make_epochhead_db(30, seed=3)
+    db["events"] += [{"type": "kill", "t": 5}, {"type": "loot", "t": 6}]
+    (tmp_path / "epochhead.lua").write_text(fx.to_lua({"epochheadDB": db}), encoding="utf-8")
+    monkeypatch.setattr(core, "AUTO_RENAME", False)
+    with fx.StubServer(wire_formats=(), record=True) as srv:
+        monkeypatch.setattr(core, "SERVER", srv.url)
+        uc = core.UploaderCore({"sv_dir": str(tmp_path), "metrics": False, "record_events": False})
+        uc.upload_mode = mode
+        try:
+            assert uc.upload_now()
+        finally:
+            uc.stop()
+    (_ctype, payload), = srv.uploads
+    assert len(payload["events"]) == 30
+    assert payload["meta"]["_uploader"]["client_dropped"] == {"invalid": {"kill": 1, "loot": 1}}
@@ -0,0 +1,167 @@
+import asyncio
+
+import pytest
+
+import epoch_uploader as core
+import epoch_net
+
+class FakeClock:
+    def __init__(self):
+        self.t = 100.0
+
+    def __call__(self):
+        return self.t
+
+@pytest.fixture
+def clock(monkeypatch):
+    c = FakeClock()
+    async def sleep(secs):
+        c.t += secs
+    monkeypatch.setattr(core.asyncio, "sleep", sleep)
+    return c
+
+def test_token_bucket_refills_at_rate(clock):
+    b = core.TokenBucket(2.0, capacity=1.0, clock=clock)
+    assert b.delay() == 0.0
+    b.take()
+    assert b.delay() == pytest.approx(0.5)
+    clock.t += 0.25
+    assert b.delay() == pytest.approx(0.25)
+    clock.t += 10
+    assert b.delay() == 0.0
+    b.take(3)                      # may go negative
+    assert b.delay() == pytest.approx(1.5)
+
+def test_token_bucket_set_rate_keeps_earned_tokens(clock):
+    b = core.TokenBucket(1.0, capacity=4.0, clock=clock)
+    b.take(4)
+    clock.t += 1                   # one token at the old rate
+    b.set_rate(10.0)
+    assert b.delay(2) == pytest.approx(0.1)
+
+def test_cap_paces_the_body(clock):
+    s = core.BandwidthShaper(rate=64 * 1024, clock=clock)
+    assert s.shaping and s.chunk_size(64 * 1024) == 8 * 1024
+    async def send():
+        for _ in range(16):
+            await s.before_send(8192)
+            s.after_send(8192, 0.001)
+    asyncio.run(send())
+    rep = s.report()
+    assert rep["bytes"] == 16 * 8192
+    assert rep["seconds"] == pytest.approx(15 * 8192 / (64 * 1024), rel=0.01)  # first chunk is burst
+    assert rep["queue_delay_s"] > 0 and rep["backoffs"] == 0
+    assert rep["cap_bps"] == 64 * 1024 and rep["final_rate_bps"] == 64 * 1024
+
+def test_adaptive_cuts_on_rising_delay_and_grows_back(clock):
+    s = core.BandwidthShaper(adaptive=True, clock=clock)
+    assert s.shaping and s.rate is None
+    asyncio.run(s.before_send(0))
+    for secs in (0.01, 0.01, 0.3):
+        clock.t += secs
+        s.after_send(100_000, secs)
+    assert s.backoffs == 1
+    cut = s.rate
+    measured = 300_000 / 0.32
+    assert cut == pytest.approx(measured * 0.7)
+    clock.t += 0.01
+    s.after_send(1000, 0.01)
+    assert s.rate == pytest.approx(cut * 1.05)
+    assert s.report()["final_rate_bps"] == round(s.rate)
+
+def test_uncapped_growth_stops_at_the_link_rate(clock):
+    s = core.BandwidthShaper(adaptive=True, clock=clock)
+    asyncio.run(s.before_send(0))
+    assert s.chunk_size(1 << 20) == 1 << 20
+    for secs in (0.01, 0.01, 0.3):
+        clock.t += secs
+        s.after_send(100_000, secs)
+    link = 300_000 / 0.32
+    assert s.link_rate == pytest.approx(link)
+    assert s.chunk_size(1 << 20) == int(s.rate / 8)     # the new rate shrinks the chunks
+    for _ in range(200):
+        clock.t += 0.01
+        s.after_send(1000, 0.01)
+    assert s.rate == pytest.approx(link)
+
+def test_adaptive_never_drops_below_min_rate(clock):
+    s = core.BandwidthShaper(adaptive=True, clock=clock)
+    asyncio.run(s.before_send(0))
+    clock.t += 0.001
+    s.after_send(10, 0.001)
+    clock.t += 5
+    s.after_send(10, 5)
+    assert s.rate == s.MIN_RATE
+
+def test_measure_only_shaper():
+    s = core.BandwidthShaper()
+    assert not s.shaping and s.rate is None
+    assert s.chunk_size(65536) == 65536
+    assert s.report()["throughput_bps"] is None
+
+def test_shaper_choice(sv_dir, monkeypatch):
+    monkeypatch.setattr(core, "AUTO_RENAME", False)
+    uc = core.UploaderCore({"sv_dir": sv_dir, "metrics": False, "record_events": False,
+                            "upload_rate_kbps": 100, "upload_adaptive": True})
+    try:
+        auto = uc._shaper(manual=False)
+        assert auto.cap == 100 * 1024 and auto.adaptive
+        assert not uc._shaper(manual=True).shaping
+        uc.manual_full_speed = False
+        assert uc._shaper(manual=True).cap == 100 * 1024
+    finally:
+        uc.stop()
+
+def test_capped_upload_to_stub(stub_server):
+    body = core.encode_upload_body("t", {"events": [{"type": "kill", "t": i} for i in range(4000)]})
+    shaper = core.BandwidthShaper(rate=len(body) * 2)
+    status, _text = epoch_net.run(core.send_upload(stub_server.url, "t", body, shaper=shaper))
+    assert status in (200, 202)
+    rep = shaper.report()
+    assert rep["bytes"] == len(body)
+    assert rep["seconds"] >= 0.3
+
+class _Recorder:
+    """Stands in for a BandwidthShaper: records chunk sizes; ``rate`` appears after ``at`` chunks."""
+    SNDBUF = 4096
+    shaping = True
+
+    def __init__(self, at):
+        self.at, self.sizes, self.rate = at, [], None
+
+    def chunk_size(self, default):
+        return 1000 if self.rate else default
+
+    async def before_send(self, n):
+        self.sizes.append(n)
+
+    def after_send(self, n, secs):
+        if len(self.sizes) == self.at:
+            self.rate = 8000.0
+
+@pytest.mark.parametrize("as_file", [False, True])
+def test_chunks_follow_a_rate_set_mid_send(stub_server, monkeypatch, as_file):
+    import tempfile
+    sndbuf = []
+    monkeypatch.setattr(epoch_net, "_set_sndbuf", lambda writer, size: sndbuf.append(size) or True)
+    body = core.encode_upload_body("t", {"events": [{"type": "kill", "t": i} for i in range(2000)]})
+    shaper = _Recorder(at=1)
+    with tempfile.TemporaryFile() as f:
+        f.write(body)
+        status, _text = epoch_net.run(core.post_upload_async(stub_server.url, "t", None, body=f if as_file else body,
+                                                             chunk_size=8192, shaper=shaper))
+    assert status in (200, 202)
+    assert shaper.sizes[0] == 8192 and set(shaper.sizes[1:-1]) == {1000}
+    assert sum(shaper.sizes) == len(body)
+    assert sndbuf == [4096]                     # once, when the rate appeared
+
+def test_no_small_buffer_without_a_rate(stub_server, monkeypatch):
+    sndbuf = []
+    monkeypatch.setattr(epoch_net, "_set_sndbuf", lambda writer, size: sndbuf.append(size) or True)
+    body = core.encode_upload_body("t", {"events": [{"type": "kill", "t": i} for i in range(2000)]})
+    for shaper in (core.BandwidthShaper(), core.BandwidthShaper(adaptive=True)):
+        status, _text = epoch_net.run(core.send_upload(stub_server.url, "t", body, shaper=shaper))
+        assert status in (200, 202) and shaper.backoffs == 0
+    assert sndbuf == []
+    epoch_net.run(core.send_upload(stub_server.url, "t", body, shaper=core.BandwidthShaper(rate=10 ** 7)))
+    assert sndbuf == [core.BandwidthShaper.SNDBUF]
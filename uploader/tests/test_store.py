@@ -0,0 +1,106 @@
+import json
+
+import epoch_uploader as core
+import epoch_store
+from epoch_store import EventStore
+
+EVENTS = [
+    {"type": "loot", "t": 100, "session": "s1", "zone": "Elwynn Forest", "sourceKey": "mob:299",
+     "source": {"kind": "mob", "key": "mob:299"}, "items": [{"id": 2589, "qty": 2}, {"id": 118, "count": 1}]},
+    {"type": "kill", "t": 110, "session": "s1", "source": {"kind": "mob", "key": "mob:299", "zone": "Elwynn Forest"}},
+    {"type": "loot", "t": 120, "session": "s2", "zone": "Westfall", "sourceKey": "node:1731",
+     "items": [{"id": 2770, "qty": 3}]},
+    "not an event",
+]
+META = {"player": {"name": "Fixture", "realm": "Kezan"}}
+
+def _store(tmp_path):
+    store = EventStore(str(tmp_path / "db" / "events.sqlite"))
+    store.record_upload(EVENTS, META, file="epochhead.lua", status=200, ok=True, job_id="job1", ts=1000)
+    return store
+
+def test_record_and_query(tmp_path):
+    store = _store(tmp_path)
+    up = store.uploads()[0]
+    assert (up["events"], up["player"], up["realm"], up["ok"], up["job_id"]) == (3, "Fixture", "Kezan", 1, "job1")
+    assert [r["t"] for r in store.query()] == [120, 110, 100]
+    assert [r["t"] for r in store.query(kind="loot")] == [120, 100]
+    assert [r["t"] for r in store.query(zone="Elwynn Forest")] == [110, 100]
+    assert [r["t"] for r in store.query(source_key="mob:299", kind="kill")] == [110]
+    assert [r["t"] for r in store.query(item_id=2589)] == [100]
+    assert [r["t"] for r in store.query(session="s2")] == [120]
+    assert [r["t"] for r in store.query(since=105, until=120)] == [110]
+    assert json.loads(store.query(item_id=2770)[0]["body"]) == EVENTS[2]
+
+def test_uploaded_only_and_generator_input(tmp_path):
+    store = _store(tmp_path)
+    store.record_upload((dict(ev, t=ev["t"] + 1000) for ev in EVENTS[:3]), META, status=503, ok=False)
+    assert store.uploads()[0]["events"] == 3
+    assert len(store.query(limit=0)) == 6
+    assert len(store.query(uploaded_only=True, limit=0)) == 3
+    assert len(store.query(limit=2)) == 2
+
+def test_query_cli(tmp_path, capsys):
+    store = _store(tmp_path)
+    assert epoch_store.main(["--db", store.path, "--item", "2589"]) == 0
+    out = capsys.readouterr().out
+    assert "mob:299" in out and "2589x2" in out and "upload #1 OK" in out
+    assert epoch_store.main(["--db", store.path, "--uploads"]) == 0
+    assert "3 events" in capsys.readouterr().out
+    assert epoch_store.main(["--db", str(tmp_path / "missing.sqlite")]) == 1
+
+def test_parse_when():
+    assert epoch_store._parse_when("1700000000") == 1700000000
+    assert epoch_store._parse_when("2023-11-14") > 0
+
+def test_uploader_records_each_upload(sv_dir, stub_server, tmp_path, monkeypatch):
+    path = str(tmp_path / "events.sqlite3")
+    monkeypatch.setattr(core, "STORE_PATH", path)
+    monkeypatch.setattr(core, "SERVER", stub_server.url)
+    monkeypatch.setattr(core, "AUTO_RENAME", False)
+    uc = core.UploaderCore({"sv_dir": sv_dir, "metrics": False, "record_events": True})
+    try:
+        assert uc.upload_now()
+    finally:
+        uc.stop()
+    up = EventStore(path).uploads()[0]
+    assert up["ok"] == 1 and up["file"] == "epochhead.lua" and 0 < up["events"] <= 300
+    assert len(EventStore(path).query(limit=0)) == up["events"]
+
+def test_recorder_commits_only_on_finish(tmp_path):
+    store = EventStore(str(tmp_path / "events.sqlite"))
+    with store.begin_upload(META, file="epochhead.lua") as rec:
+        for ev in EVENTS:
+            rec.add(ev)
+        assert store.uploads() == []                  # not visible mid-upload
+    assert store.uploads() == []                      # left without finish(): discarded
+    rec = store.begin_upload(META)
+    for ev in EVENTS:
+        rec.add(ev)
+    assert rec.finish(status=202, ok=True, job_id="j") == store.uploads()[0]["id"]
+    up = store.uploads()[0]
+    assert (up["events"], up["status"], up["ok"], up["job_id"]) == (3, 202, 1, "j")
+    assert [r["t"] for r in store.query(item_id=2589)] == [100]
+    rec.abort()                                       # no-op after finish
+    assert len(store.uploads()) == 1
+
+def test_streamed_upload_records_in_one_pass(sv_dir, stub_server, tmp_path, monkeypatch):
+    path = str(tmp_path / "events.sqlite3")
+    monkeypatch.setattr(core, "STORE_PATH", path)
+    monkeypatch.setattr(core, "SERVER", stub_server.url)
+    monkeypatch.setattr(core, "AUTO_RENAME", False)
+    passes = []
+    real = core.UploaderCore._stream_events
+    def counted(self, *a):
+        passes.append(1)
+        return real(self, *a)
+    monkeypatch.setattr(core.UploaderCore, "_stream_events", counted)
+    uc = core.UploaderCore({"sv_dir": sv_dir, "metrics": False, "record_events": True, "upload_mode": "stream"})
+    try:
+        assert uc.upload_now()
+    finally:
+        uc.stop()
+    assert passes == [1]
+    up = EventStore(path).uploads()[0]
+    assert up["ok"] == 1 and up["file"] == "epochhead.lua" and 0 < up["events"] <= 300
+    assert len(EventStore(path).query(limit=0)) == up["events"]
@@ -0,0 +1,99 @@
+import hashlib
+import json
+import re
+
+import pytest
+
+import epoch_uploader as core
+import epoch_fixtures as fx
+import epoch_stream
+
+TRICKY = '''-- header {
+epochheadDB = {
+  ["meta"] = { ["player"] = { ["name"] = "Bob}", ["realm"] = "Kezan" }, ["schemaVersion"] = 2 },
+  ["events"] = {
+    { ["type"] = "kill", ["t"] = 1, ["sourceKey"] = "mob:12", ["note"] = 'it\\'s {' }, -- [1] }
+    --[[ block { ]]
+    { ["type"] = "loot", ["t"] = 2, ["items"] = { { ["id"] = 3, ["qty"] = 1 } } }, -- [2]
+  },
+  ["version"] = "1.0",
+}
+-- written after the table
+'''
+
+@pytest.fixture
+def tricky(tmp_path):
+    p = tmp_path / "epochhead.lua"
+    p.write_text(TRICKY, encoding="utf-8")
+    return str(p)
+
+def test_scanner_matches_the_full_parser(tricky):
+    full = core.parse_savedvars(TRICKY)
+    assert list(epoch_stream.iter_events(tricky)) == full["events"]
+    rest, digest = epoch_stream.read_rest(tricky)
+    assert rest["meta"] == full["meta"] and rest["version"] == "1.0"
+    assert not rest["events"]
+    assert digest == hashlib.sha256(TRICKY.encode("utf-8")).digest()
+    assert epoch_stream.raw_length(tricky) == len(TRICKY)
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 7, 64])
+def test_scanner_across_chunk_boundaries(tricky, chunk_size):
+    chunks = list(epoch_stream.iter_text(tricky, chunk_size=chunk_size))
+    got = [epoch_stream._parse(text) for kind, text in epoch_stream._scan(chunks, core.VAR_NAME, True)
+           if kind == "event"]
+    assert got == core.parse_savedvars(TRICKY)["events"]
+
+def test_missing_table_raises(tmp_path):
+    p = tmp_path / "other.lua"
+    p.write_text("somethingElse = {}\n", encoding="utf-8")
+    with pytest.raises(ValueError):
+        epoch_stream.read_rest(str(p))
+
+def test_body_spool_raw_string(tricky):
+    with epoch_stream.BodySpool() as spool:
+        spool.write_raw_string(tricky)
+        spool.file.seek(0)
+        data = spool.file.read()
+    assert data == json.dumps(TRICKY).encode("utf-8")
+    assert spool.size == len(data)
+
+class _Capture(fx.StubServer):
+    def __init__(self, **kw):
+        super().__init__(**kw)
+        self.bodies = []
+
+    def handle_upload(self, path, headers, body):
+        self.bodies.append(bytes(body))
+        return super().handle_upload(path, headers, body)
+
+def test_stream_and_memory_send_the_same_body(sv_dir, monkeypatch, clean_config):
+    monkeypatch.setattr(core, "AUTO_RENAME", False)
+    cfg = {"sv_dir": sv_dir, "metrics": False, "record_events": False, "dedupe": False,
+           "wire_format": "json", "market_records": False}
+    with _Capture(wire_formats=()) as srv:
+        monkeypatch.setattr(core, "SERVER", srv.url)
+        for mode in ("memory", "stream"):
+            uc = core.UploaderCore(dict(cfg, upload_mode=mode))
+            try:
+                assert uc.upload_now()
+            finally:
+                uc.stop()
+            core.save_config(dict(core.load_config(), acked_uploads=[]))
+    memory, stream = [re.sub(rb'"upload_tick": \d+', b"", b) for b in srv.bodies]
+    assert memory == stream
+    assert b'"raw_lua": ' in memory
+
+def test_auto_mode_streams_over_the_memory_budget(sv_dir, monkeypatch):
+    monkeypatch.setattr(core, "AUTO_RENAME", False)
+    def mode(**cfg):
+        uc = core.UploaderCore(dict({"sv_dir": sv_dir, "metrics": False, "record_events": False}, **cfg))
+        try:
+            return uc._upload_mode()
+        finally:
+            uc.stop()
+    m, est, _why = mode(upload_mode="auto", memory_budget_mb=0.001)
+    assert m == "stream" and est > 1024
+    assert mode(upload_mode="auto", memory_budget_mb=10_000)[0] == "memory"
+    assert mode(upload_mode="auto", memory_budget_mb=0)[0] == "memory"   # 0 = no budget
+    assert mode(upload_mode="memory", memory_budget_mb=0.001)[0] == "memory"
+    assert mode(upload_mode="stream")[0] == "stream"
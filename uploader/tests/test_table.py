@@ -0,0 +1,123 @@
+import pickle
+
+import pytest
+
+import epoch_fixtures as fx
+import epoch_uploader as core
+from epoch_table import EventTable
+
+SOURCE = {"kind": "mob", "id": 299, "zone": "Elwynn Forest", "subzone": "Goldshire", "x": 0.5, "y": 0.25}
+ITEM = {"id": 2589, "qty": 2, "quality": 1, "name": "Linen Cloth", "link": "|cff|Hitem:2589|h"}
+
+@pytest.mark.parametrize("ev", [
+    {"type": "loot", "t": 8, "source": dict(SOURCE), "items": [dict(ITEM)]},   # 4 keys, 2 non-column
+    {"type": "kill", "t": 8, "zone": "Elwynn Forest", "source": {"kind": "mob"}},
+    {"type": "loot", "t": 8, "session": "s", "sourceKey": "299"},              # all columns
+    {"type": "loot", "t": 8, "session": "s", "guid": "x"},
+    {"type": None, "t": "late", "session": 3, "sourceKey": "299"},             # unstorable values
+    {"source": {"kind": "mob", "id": 1, "zone": "z", "subzone": "s", "x": 1.0, "key": "k"}},
+    {"items": [{"id": 1, "qty": 1, "quality": 2, "name": "n", "bonus": [1, 2]}]},
+    {"items": [], "money": {"copper": 5}},
+    {},
+])
+def test_round_trip_keeps_every_key(ev):
+    assert EventTable.from_dicts([ev]).to_dicts() == [ev]
+
+def test_round_trip_fixture_events_and_pickle():
+    events = fx.make_epochhead_db(500)["events"]
+    core._normalize_inplace(events)
+    tbl = EventTable.from_dicts(events)
+    assert len(tbl) == len(events)
+    assert tbl.to_dicts() == events
+    assert list(tbl.iter_dicts(chunk=64)) == events
+    assert pickle.loads(pickle.dumps(tbl)).to_dicts() == events
+
+def test_consume_empties_the_source_list():
+    events = fx.make_epochhead_db(100)["events"]
+    source = list(events)
+    tbl = EventTable.from_dicts(source, consume=True)
+    assert source == [] and tbl.to_dicts() == events
+
+def test_select_keeps_rows_in_given_order():
+    events = fx.make_epochhead_db(50)["events"]
+    tbl = EventTable.from_dicts(events)
+    rows = [7, 3, 3, 40]
+    assert tbl.select(rows).to_dicts() == [events[i] for i in rows]
+
+def test_rejects_non_dict_events():
+    with pytest.raises(ValueError):
+        EventTable.from_dicts([1])
+
+ODD = [
+    {"type": "kill", "t": 10, "session": "s", "sourceKey": "mob:299", "source": dict(SOURCE, mob_guid="g")},
+    {"type": "kill", "t": 10, "session": "s", "source": {"kind": "Mob", "id": "300", "key": "mob:300"}},
+    {"type": "loot", "t": 70, "session": "s", "sourceKey": "mob:299", "items": [dict(ITEM)],
+     "money": {"copper": 12}, "instance": {"id": 1}},
+    {"type": "loot", "t": 71.5, "session": 4, "kind": "mob", "id": 7, "items": [{"id": "9", "count": 3}]},
+    {"type": "quest", "t": 80, "subtype": "accept", "id": 12},
+    {"type": "quest", "t": 81, "subtype": "accept", "title": ""},
+    {"type": "", "t": "x"},
+    {"kind": "loot", "t": 90, "items": []},
+]
+
+def _events():
+    import copy
+    return copy.deepcopy(fx.make_epochhead_db(300, seed=5)["events"] + ODD)
+
+def test_normalize_matches_dict_normalize():
+    events = _events()
+    tbl = EventTable.from_dicts(events).normalize()
+    core._normalize_inplace(events)
+    assert tbl.to_dicts() == events
+
+def test_where_and_kind_counts():
+    events = _events()
+    tbl = EventTable.from_dicts(events)
+    assert tbl.where(kinds=["quest"]) == [i for i, ev in enumerate(events) if ev.get("type") == "quest"]
+    assert tbl.where(kinds=["nope"]) == []
+    zone = SOURCE["zone"]
+    assert tbl.where(zones=[zone], since=10, until=11) == [300]
+    assert tbl.kind_counts()["kill"] == sum(1 for ev in events if ev.get("type") == "kill")
+    assert sum(tbl.kind_counts().values()) == len(events)
+
+def test_fingerprints_are_equal_only_for_equal_events():
+    events = _events()
+    a = EventTable.from_dicts(events).fingerprints()
+    b = EventTable.from_dicts(list(reversed(events))).fingerprints()
+    assert a == list(reversed(b))          # string pools differ, digests don't
+    by_fp = {}
+    for fp, ev in zip(a, events):
+        by_fp.setdefault(fp, ev)
+        assert by_fp[fp] == ev
+    changed = dict(events[0], t=events[0]["t"] + 1)
+    assert EventTable.from_dicts([changed]).fingerprints()[0] != a[0]
+
+def test_dedupe_keys_match_dict_keys():
+    events = _events()
+    tbl = EventTable.from_dicts(events)
+    assert tbl.dedupe_keys() == [core.dedupe_key(ev) for ev in events]
+    assert tbl.dedupe_keys(bucket=0) == [core.dedupe_key(ev, 0) for ev in events]
+
+def test_validate_table_matches_validate_events():
+    import epoch_schema
+    for meta in ({"schemaVersion": 2}, {"schemaVersion": 2, "player": {"realm": "Elsewhere"}}, {}):
+        events = _events()
+        kept, want = epoch_schema.validate_events(events, dict(meta))
+        tbl, got = epoch_schema.validate_table(EventTable.from_dicts(_events()), dict(meta))
+        assert tbl.to_dicts() == kept
+        assert got == want
+
+@pytest.mark.parametrize("collapse", [(), ("loot",)])
+def test_dedupe_table_matches_dedupe_events(collapse):
+    events = _events()
+    events += [dict(ev) for ev in events[:40]]                        # exact copies
+    events += [dict(ev, t=ev["t"] + 1) for ev in events[:40] if isinstance(ev.get("t"), int)]
+    kept, want = core.dedupe_events(_copy(events), collapse_kinds=collapse)
+    tbl, got = core.dedupe_table(EventTable.from_dicts(_copy(events)), collapse_kinds=collapse)
+    assert tbl.to_dicts() == kept
+    assert got == want
+    assert got["dropped"] >= 40
+
+def _copy(events):
+    import copy
+    return copy.deepcopy(events)
@@ -0,0 +1,61 @@
+import json
+import sys
+
+import epoch_uploader as core
+import epoch_bench
+import epoch_tray
+
+def test_cold_start_does_not_load_tk():
+    r = epoch_bench.bench_cold_start(1)
+    assert r["name"] == "cold_start_tray"
+    assert r["tk_loaded"] is False
+    assert r["ready_s"] > 0
+
+def test_report_startup_records_metrics(tmp_path, monkeypatch):
+    path = tmp_path / "metrics.jsonl"
+    monkeypatch.setattr(core, "METRICS_PATH", str(path))
+    rec = core.report_startup("test")
+    assert rec["event"] == "startup" and rec["mode"] == "test"
+    assert rec["tk_loaded"] == ("tkinter" in sys.modules)
+    assert json.loads(path.read_text(encoding="utf-8").splitlines()[-1]) == rec
+    core.report_startup("test", record=False)
+    assert len(path.read_text(encoding="utf-8").splitlines()) == 1
+
+def _tray_mode(sv_dir, monkeypatch):
+    monkeypatch.setattr(core, "AUTO_RENAME", False)
+    monkeypatch.setattr(core, "_start_activation_listener", lambda on_activate: None)
+    monkeypatch.setattr(epoch_tray.Tray, "start", lambda self: "no tray in tests")
+    return epoch_tray.TrayMode({"sv_dir": sv_dir, "metrics": False, "record_events": False})
+
+def test_tray_mode_keeps_log_and_latest_status(sv_dir, monkeypatch):
+    tm = _tray_mode(sv_dir, monkeypatch)
+    try:
+        tm._notify("log", {"msg": "first"})
+        tm._notify("status", {"text": "old"})
+        tm._notify("status", {"text": "new"})
+        lines, dropped = tm.log_ring.drain()
+        assert dropped == 0 and lines[-1].endswith("] first")
+        assert tm._latest == {"status": {"text": "new"}}
+    finally:
+        tm.core.stop()
+
+def test_tray_mode_exit_before_restore_never_builds_the_window(sv_dir, monkeypatch):
+    tm = _tray_mode(sv_dir, monkeypatch)
+    monkeypatch.setitem(sys.modules, "epoch_uploader_gui", None)  # importing it would fail
+    tm.exit()
+    assert tm.run() == 0
+    assert tm.app is None
+    lines, _ = tm.log_ring.drain()
+    assert any("no tray in tests" in line for line in lines)
+    assert any(f"Watching folder: {sv_dir}" in line for line in lines)
+
+def test_tray_cancel_before_the_window_goes_to_the_core(sv_dir, monkeypatch):
+    tm = _tray_mode(sv_dir, monkeypatch)
+    calls = []
+    monkeypatch.setattr(tm.core, "cancel_upload", lambda: calls.append(1))
+    try:
+        assert tm.tray.on_cancel == tm.cancel
+        tm.cancel()
+        assert calls == [1]
+    finally:
+        tm.core.stop()
@@ -0,0 +1,84 @@
+import copy
+import json
+
+import pytest
+
+import epoch_uploader as core
+import epoch_fixtures as fx
+import epoch_wire
+
+def _events(n=400, seed=1):
+    evs = fx.make_epochhead_db(n, seed=seed)["events"]
+    core._normalize_inplace(evs)
+    return evs
+
+def test_round_trip_fixture_events():
+    evs = _events()
+    doc = epoch_wire.encode_events(copy.deepcopy(evs))
+    assert epoch_wire.decode_events(json.loads(json.dumps(doc))) == evs
+
+@pytest.mark.parametrize("evs", [
+    [],
+    [{"type": "kill", "t": 5}, {"type": "kill", "t": 3}, {"type": "kill", "t": -2}],
+    [{"t": 1, "x": 1.5}, {"type": "loot", "t": 2, "ok": True}, {"t": 3, "x": "a"}],
+    [{"type": "loot", "t": 1, "name": "Ünïcødé \"q\"", "items": [{"id": 1, "qty": 2}], "pos": [0.5, 0.25]},
+     {"type": "loot", "t": 2, "items": []}, {"type": "loot", "t": 3, "nested": {"a": {"b": [1, "c"]}}}],
+    [{"type": "kill", "t": 1, "big": 2 ** 62}, {"type": "kill", "t": 2, "big": -(2 ** 62)}],
+    [{"type": 5, "t": 1}, {"t": 2}],
+])
+def test_round_trip_shapes(evs):
+    assert epoch_wire.decode_events(epoch_wire.encode_events(evs)) == evs
+
+def test_none_values_count_as_absent():
+    assert epoch_wire.decode_events(epoch_wire.encode_events([{"type": "kill", "t": 1, "x": None}])) == \
+        [{"type": "kill", "t": 1}]
+
+def test_non_dict_events_are_rejected():
+    with pytest.raises(ValueError):
+        epoch_wire.encode_events([{"type": "kill"}, "x"])
+
+def test_bodies_decode_to_the_same_payload_and_columnar_is_smaller():
+    payload = {"events": _events(2000), "meta": {"schemaVersion": 2}}
+    plain = core.encode_upload_body("t", payload)
+    compact = epoch_wire.encode_body("t", payload)
+    assert epoch_wire.decode_body(plain) == epoch_wire.decode_body(compact) == ("t", payload)
+    assert len(compact) < len(plain) * 0.6
+
+def _uploads(sv_dir, monkeypatch, srv, n, between=None, wire_format="auto"):
+    monkeypatch.setattr(core, "SERVER", srv.url)
+    monkeypatch.setattr(core, "AUTO_RENAME", False)
+    uc = core.UploaderCore({"sv_dir": sv_dir, "metrics": False, "record_events": False, "wire_format": wire_format})
+    try:
+        for i in range(n):
+            uc.acked_uploads = []
+            assert uc.upload_now()
+            if between:
+                between()
+    finally:
+        uc.stop()
+    return [ctype for ctype, _payload in srv.uploads]
+
+def test_switches_to_columnar_after_the_server_accepts_it(sv_dir, monkeypatch):
+    with fx.StubServer(record=True) as srv:
+        got = _uploads(sv_dir, monkeypatch, srv, 2)
+    assert got == [epoch_wire.CONTENT_TYPE_JSON, epoch_wire.CONTENT_TYPE_COLUMNAR]
+    assert epoch_wire.WIRE_COLUMNAR in core._upload_headers()[epoch_wire.WIRE_OFFER_HEADER]
+
+def test_stays_on_json_for_a_json_only_server(sv_dir, monkeypatch):
+    with fx.StubServer(wire_formats=(), record=True) as srv:
+        got = _uploads(sv_dir, monkeypatch, srv, 2)
+    assert got == [epoch_wire.CONTENT_TYPE_JSON] * 2
+
+def test_falls_back_to_json_when_columnar_is_rejected(sv_dir, monkeypatch):
+    with fx.StubServer(record=True) as srv:
+        def downgrade():
+            srv.wire_formats = ()
+        got = _uploads(sv_dir, monkeypatch, srv, 3, between=downgrade)
+    # 1: JSON (learns columnar), 2: columnar -> 415 -> JSON resend, 3: JSON.
+    assert got == [epoch_wire.CONTENT_TYPE_JSON, epoch_wire.CONTENT_TYPE_COLUMNAR,
+                   epoch_wire.CONTENT_TYPE_JSON, epoch_wire.CONTENT_TYPE_JSON]
+
+def test_wire_format_json_never_sends_columnar(sv_dir, monkeypatch):
+    with fx.StubServer(record=True) as srv:
+        got = _uploads(sv_dir, monkeypatch, srv, 2, wire_format="json")
+    assert got == [epoch_wire.CONTENT_TYPE_JSON] * 2